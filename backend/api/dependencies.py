@@ -1,4 +1,5 @@
-from fastapi import Header, HTTPException, Depends
+import hashlib
+from fastapi import Header, HTTPException, Depends, Query
 from typing import Optional
 from ..core.config import Settings, get_settings
 
@@ -11,4 +12,30 @@ async def require_api_key(
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Invalid authorization")
     if authorization.split(" ", 1)[1].strip() != settings.api_key:
-        raise HTTPException(status_code=401, detail="Invalid API key")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid API key")
+
+async def require_cluster_key(
+    authorization: Optional[str] = Header(None),
+    settings: Settings = Depends(get_settings)
+) -> None:
+    # Registered nodes receive prompts and the cluster key, so registration is never open.
+    key = settings.cluster_api_key or settings.api_key
+    if not key:
+        raise HTTPException(status_code=403, detail="Node registration requires CLUSTER_API_KEY or API_KEY")
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authorization")
+    if authorization.split(" ", 1)[1].strip() != key:
+        raise HTTPException(status_code=401, detail="Invalid cluster key")
+
+async def client_key(authorization: Optional[str] = Header(None)) -> str:
+    if not authorization or not authorization.startswith("Bearer "):
+        return "anonymous"
+    token = authorization.split(" ", 1)[1].strip()
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()[:16]
+
+
+async def profile_requested(
+    x_profile: Optional[str] = Header(None),
+    profile: bool = Query(False),
+) -> bool:
+    return profile or (x_profile or "").strip().lower() in ("1", "true", "yes")
\ No newline at end of file
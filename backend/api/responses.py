@@ -0,0 +1,106 @@
+import io
+import json
+import uuid
+from typing import Optional, Dict, Any, List, Iterator, Union
+from fastapi.responses import Response, StreamingResponse
+from PIL import Image
+
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+MEDIA_JSON = "application/json"
+MEDIA_PNG = "image/png"
+MEDIA_MULTIPART = "multipart/mixed"
+MEDIA_MSGPACK = "application/msgpack"
+
+_ALIASES = {"application/x-msgpack": MEDIA_MSGPACK}
+
+
+def encode_png_buffer(img: Image.Image) -> memoryview:
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=True)
+    # A view over the encoder's buffer; no copy is made until the bytes hit the socket.
+    return buffer.getbuffer()
+
+
+def negotiate(accept: Optional[str], batch: bool) -> str:
+    supported = [MEDIA_MULTIPART if batch else MEDIA_PNG]
+    if HAS_MSGPACK:
+        supported.append(MEDIA_MSGPACK)
+
+    ranked = []
+    for position, part in enumerate((accept or "").split(",")):
+        fields = [f.strip() for f in part.split(";")]
+        media = _ALIASES.get(fields[0].lower(), fields[0].lower())
+        quality = 1.0
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media and quality > 0:
+            ranked.append((-quality, position, media))
+
+    for _, _, media in sorted(ranked):
+        if media == MEDIA_JSON:
+            return MEDIA_JSON
+        if media in supported:
+            return media
+    return MEDIA_JSON
+
+
+def png_response(data: memoryview, meta: Dict[str, Any]) -> StreamingResponse:
+    return StreamingResponse(
+        iter([data]),
+        media_type=MEDIA_PNG,
+        headers={
+            "Content-Length": str(data.nbytes),
+            "X-Result-Meta": json.dumps(meta, ensure_ascii=True, default=str),
+        },
+    )
+
+
+def _multipart_body(boundary: str, meta: Dict[str, Any], results: List[Dict[str, Any]]) -> Iterator[Union[bytes, memoryview]]:
+    dash = f"--{boundary}\r\n".encode("ascii")
+    head = json.dumps({**meta, "results": [_strip_image(r) for r in results]}, default=str).encode("utf-8")
+    yield dash
+    yield f"Content-Type: {MEDIA_JSON}\r\nContent-Length: {len(head)}\r\n\r\n".encode("ascii")
+    yield head
+    yield b"\r\n"
+    for r in results:
+        data: memoryview = r["image_data"]
+        yield dash
+        yield (
+            f"Content-Type: {MEDIA_PNG}\r\n"
+            f'Content-Disposition: attachment; filename="img_{r["index"]:04d}.png"\r\n'
+            f"X-Index: {r['index']}\r\n"
+            f"Content-Length: {data.nbytes}\r\n\r\n"
+        ).encode("ascii")
+        yield data
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def _strip_image(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in result.items() if k != "image_data"}
+
+
+def batch_response(media: str, meta: Dict[str, Any], results: List[Dict[str, Any]]) -> Response:
+    if media == MEDIA_MSGPACK:
+        return msgpack_response({**meta, "results": results})
+    boundary = uuid.uuid4().hex
+    return StreamingResponse(
+        _multipart_body(boundary, meta, results),
+        media_type=f"{MEDIA_MULTIPART}; boundary={boundary}",
+    )
+
+
+def msgpack_response(payload: Dict[str, Any]) -> Response:
+    return Response(
+        content=msgpack.packb(payload, use_bin_type=True, default=str),
+        media_type=MEDIA_MSGPACK,
+    )
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from typing import Dict, Any
+
+from ...models.schemas import NodeRegistration
+from ..dependencies import require_cluster_key
+from ...services.cluster import coordinator
+
+router = APIRouter(prefix="/api/cluster", tags=["cluster"])
+
+
+@router.get("/nodes", dependencies=[Depends(require_cluster_key)])
+async def list_nodes() -> Dict[str, Any]:
+    return coordinator.stats()
+
+
+@router.post("/nodes", dependencies=[Depends(require_cluster_key)])
+async def register_node(registration: NodeRegistration) -> Dict[str, Any]:
+    node = coordinator.registry.register(registration.url)
+    return {"ok": True, "node": node.stats()}
+
+
+@router.delete("/nodes", dependencies=[Depends(require_cluster_key)])
+async def unregister_node(registration: NodeRegistration) -> Dict[str, Any]:
+    if not coordinator.registry.unregister(registration.url):
+        raise HTTPException(status_code=404, detail="Node not registered")
+    return {"ok": True}
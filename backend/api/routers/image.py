@@ -1,53 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict, Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request
+from starlette.requests import ClientDisconnect
+from fastapi.responses import StreamingResponse, Response
+from typing import Dict, Any, List, Optional, Union
 import base64
-import io
+import json
+import math
 import os
+import random
 import time
+import uuid
 import asyncio
 from collections import defaultdict
+from contextlib import aclosing, nullcontext
 from PIL import Image
 
-from ...models.schemas import ImageGenerationRequest, ArtStyle, BatchImageRequest
-from ...core.exceptions import GenerationError
-from ..dependencies import require_api_key
+from ...models.schemas import (
+    ImageGenerationRequest, BatchImageRequest, BatchOptions, VariationRequest, DraftRequest, RefineRequest,
+)
+from ...core.exceptions import GenerationError, GenerationCancelled, AdmissionRejected
+from ..dependencies import require_api_key, client_key, profile_requested
+from ..responses import (
+    MEDIA_JSON, MEDIA_PNG,
+    encode_png_buffer, negotiate, png_response, batch_response, msgpack_response,
+)
 from ...core.state import image_manager
 from ...core.logging import get_logger
 from ...core.config import get_settings
-from ...services.job_service import job_service, JobStatus
+from ...core import profiling
+from ...services.job_service import job_service, JobStatus, TERMINAL_STATUSES
+from ...services.archive_service import BatchArchiver
+from ...services.blob_store import job_result_store, draft_store
+from ...services.bucketing import bucket_for, fit_to_size, scaled_size
+from ...services.prompts import DEFAULT_NEGATIVE, enhance_prompt
+from ...services.cost_model import cost_model, admission
+from ...services.cluster import coordinator
+from ...services.manifest import ManifestFeed, iter_manifest
+from ...models.sd3_ops import cfg_steps
 
 router = APIRouter(prefix="/api/image", tags=["image"])
 logger = get_logger("image-api")
 settings = get_settings()
 
-STYLE_PROMPTS = {
-    ArtStyle.CINEMATIC: "cinematic lighting, movie still, dramatic atmosphere",
-    ArtStyle.PHOTOGRAPHIC: "professional photography, ultra realistic, 8k",
-    ArtStyle.ANIME: "anime art style, studio quality, vibrant colors",
-    ArtStyle.FANTASY: "fantasy art, magical atmosphere, ethereal lighting",
-    ArtStyle.DIGITAL: "digital painting, concept art, highly detailed",
-    ArtStyle.MODEL_3D: "3d render, octane render, volumetric lighting",
-    ArtStyle.NEON_PUNK: "cyberpunk, neon lights, futuristic",
-    ArtStyle.OIL_PAINTING: "oil painting, traditional art, textured brushstrokes",
-    ArtStyle.WATERCOLOR: "watercolor painting, soft edges, flowing colors",
-    ArtStyle.FREESTYLE: "",
-}
+MANIFEST_MAX_ITEMS = 100_000
+MANIFEST_MAX_ERRORS = 100
+MANIFEST_LINGER_S = 2.0
 
-DEFAULT_NEGATIVE = "low quality, blurry, distorted, watermark, text, error"
 
-
-def _enhance_prompt(prompt: str, style: ArtStyle) -> str:
-    style_prompt = STYLE_PROMPTS.get(style, "")
-    if style_prompt:
-        return f"{prompt}, {style_prompt}, masterpiece, best quality"
-    return prompt
+def _data_url(data: Union[bytes, memoryview]) -> str:
+    return f"data:image/png;base64,{base64.b64encode(data).decode('utf-8')}"
 
 
 def _encode_png(img: Image.Image) -> str:
-    buffer = io.BytesIO()
-    img.save(buffer, format="PNG", optimize=True)
-    encoded = base64.b64encode(buffer.getvalue()).decode("utf-8")
-    return f"data:image/png;base64,{encoded}"
+    return _data_url(encode_png_buffer(img))
 
 
 def _save_png(img: Image.Image, out_dir: str, filename: str) -> str:
@@ -58,40 +62,195 @@ def _save_png(img: Image.Image, out_dir: str, filename: str) -> str:
     return f"/files/{rel}"
 
 
+def _group_key(options: BatchOptions, it: ImageGenerationRequest) -> tuple:
+    w, h = bucket_for(it.width, it.height) if options.bucketing else (it.width, it.height)
+    return (w, h, min(it.num_inference_steps, 120), float(it.guidance_scale))
+
+
+def _group_items(request: BatchImageRequest) -> Dict[tuple, List[tuple[int, ImageGenerationRequest]]]:
+    groups: Dict[tuple, List[tuple[int, ImageGenerationRequest]]] = defaultdict(list)
+    for idx, it in enumerate(request.items):
+        groups[_group_key(request, it)].append((idx, it))
+    if request.bucketing:
+        logger.info("Bucketing: %d items -> %d groups", len(request.items), len(groups))
+    return groups
+
+
+def _group_inputs(
+    request: Union[BatchOptions, DraftRequest],
+    pairs: List[tuple[int, ImageGenerationRequest]],
+) -> tuple[List[str], List[str], List[Optional[int]], List[int], List[float]]:
+    prompts, negs, seeds, indices, cutoffs = [], [], [], [], []
+    for idx, it in pairs:
+        indices.append(idx)
+        cutoffs.append(it.guidance_cutoff)
+        prompts.append(enhance_prompt(it.prompt, it.style))
+        negs.append(it.negative_prompt or DEFAULT_NEGATIVE)
+        if it.seed is not None:
+            seeds.append(it.seed)
+        elif request.start_seed is not None:
+            seeds.append(request.start_seed + idx)
+        else:
+            seeds.append(None)
+    return prompts, negs, seeds, indices, cutoffs
+
+
+def _cfg_fraction(steps: int, guidance_scale: float, cutoffs: List[float]) -> float:
+    if guidance_scale <= 1 or not cutoffs:
+        return 1.0
+    return sum(cfg_steps(steps, guidance_scale, c) for c in cutoffs) / (len(cutoffs) * steps)
+
+
+def _estimate_groups(groups: Dict[tuple, List[tuple[int, ImageGenerationRequest]]], micro_batch_size: int) -> Dict[tuple, float]:
+    return {
+        (w, h, steps, guide): cost_model.estimate(
+            w, h, steps, guide, len(pairs), micro_batch_size,
+            _cfg_fraction(steps, guide, [it.guidance_cutoff for _, it in pairs]),
+        )
+        for (w, h, steps, guide), pairs in groups.items()
+    }
+
+
+def _admit(
+    ticket: str, key: str, estimate: float, deadline: Optional[float], parallelism: int = 1
+) -> Dict[str, float]:
+    try:
+        return admission.admit(ticket, key, estimate, deadline, parallelism)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.message,
+            headers={"Retry-After": str(math.ceil(e.details["retry_after"]))},
+        )
+
+
+def _observe(outs: List[Dict[str, Any]], width: int, height: int, steps: int, guidance_scale: float) -> float:
+    # Every output of a micro-batch carries the same timing record; count each batch once.
+    timings = {o["timing"]["batch_start"]: o["timing"] for o in outs if o.get("timing")}
+    guided: Dict[int, List[float]] = defaultdict(list)
+    for o in outs:
+        if o.get("timing") and o.get("cfg_steps") is not None:
+            guided[o["timing"]["batch_start"]].append(o["cfg_steps"] / steps)
+    # Feature-cached runs are cheaper than their features predict, so they would bias the fit.
+    cached = any(o.get("feature_cache") for o in outs)
+    for start, t in ([] if cached else timings.items()):
+        fraction = sum(guided[start]) / len(guided[start]) if guided[start] else 1.0
+        cost_model.observe(width, height, steps, guidance_scale, t["batch_size"], t["seconds"], fraction)
+    seconds = sum(t["seconds"] for t in timings.values())
+    # Continuous-batching outputs share device steps with other requests and carry no timing; charge the prediction.
+    untimed = sum(1 for o in outs if not o.get("timing"))
+    if untimed:
+        seconds += cost_model.predict_micro_batch(width, height, steps, guidance_scale, untimed)
+    return seconds
+
+
+def _write_manifest(out_dir: str, batch_id: str, results: List[Dict[str, Any]]) -> None:
+    items = [
+        {
+            "index": r["index"],
+            "file": os.path.basename(r["file_url"]),
+            "seed": r.get("seed"),
+            "prompt": r.get("prompt"),
+            "negative_prompt": r.get("negative_prompt"),
+        }
+        for r in results if r.get("file_url")
+    ]
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"batch_id": batch_id, "count": len(items), "items": items}, f, indent=2)
+
+
 @router.get("/status")
 async def status() -> Dict[str, Any]:
     loaded = getattr(image_manager, "pipe", None) is not None
-    return {"loaded": loaded, "pool": {"size": 1, "active": 0, "available": 1}}
+    text_encoders = getattr(image_manager, "text_encoders", None)
+    backend_stats = getattr(image_manager, "stats", None)
+    return {
+        "loaded": loaded,
+        "text_encoders": text_encoders.stats() if text_encoders is not None else None,
+        "backend": backend_stats() if backend_stats is not None else None,
+        "cost_model": cost_model.stats(),
+        "backlog_seconds": round(admission.backlog_seconds(), 2),
+        "pool": {"size": 1, "active": 0, "available": 1},
+    }
 
 
 @router.post("/generate", dependencies=[Depends(require_api_key)])
-async def generate_image(request: ImageGenerationRequest) -> Dict[str, Any]:
-    enhanced_prompt = _enhance_prompt(request.prompt, request.style)
+async def generate_image(
+    request: ImageGenerationRequest,
+    accept: Optional[str] = Header(None),
+    cache_interval: int = Query(1, ge=1, le=8),
+    cache_depth: float = Query(0.5, ge=0.1, le=0.9),
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Union[Dict[str, Any], Response]:
+    enhanced_prompt = enhance_prompt(request.prompt, request.style)
     negative = request.negative_prompt or DEFAULT_NEGATIVE
+    steps = min(request.num_inference_steps, 120)
     
     logger.info(
         "Image request: %dx%d steps=%d guidance=%.2f seed=%s | prompt=%r",
-        request.width, request.height, min(request.num_inference_steps, 120),
+        request.width, request.height, steps,
         request.guidance_scale, request.seed, enhanced_prompt
     )
-    
-    try:
-        out = await image_manager.infer(
-            prompt=enhanced_prompt,
-            negative_prompt=negative,
-            num_inference_steps=min(request.num_inference_steps, 120),
-            guidance_scale=request.guidance_scale,
-            width=request.width,
-            height=request.height,
-            seed=request.seed
-        )
-    except Exception as e:
-        logger.error("Single generation error: %s", e)
-        raise GenerationError(f"Generation failed: {e}")
+
+    ticket = uuid.uuid4().hex
+    estimate = cost_model.estimate(
+        request.width, request.height, steps, request.guidance_scale, 1, 1,
+        _cfg_fraction(steps, request.guidance_scale, [request.guidance_cutoff]),
+    )
+    _admit(ticket, key, estimate, deadline)
+    actual = 0.0
+    profile = profiling.start_profile("generate", profile_flag)
+    with profile or nullcontext():
+        try:
+            out = await image_manager.infer(
+                prompt=enhanced_prompt,
+                negative_prompt=negative,
+                num_inference_steps=steps,
+                guidance_scale=request.guidance_scale,
+                width=request.width,
+                height=request.height,
+                seed=request.seed,
+                guidance_cutoff=request.guidance_cutoff,
+                cache_interval=cache_interval,
+                cache_depth=cache_depth,
+            )
+            actual = _observe([out], request.width, request.height, steps, request.guidance_scale)
+        except Exception as e:
+            logger.error("Single generation error: %s", e)
+            raise GenerationError(f"Generation failed: {e}")
+        finally:
+            admission.release(ticket, key, actual)
+        with profiling.span("png_encode"):
+            data = encode_png_buffer(out["image"])
+    profile_info = await profiling.finish_profile(profile)
+
+    media = negotiate(accept, batch=False)
+    if media != MEDIA_JSON:
+        meta = {
+            "model_used": image_manager.repo_id,
+            "width": request.width,
+            "height": request.height,
+            "num_inference_steps": request.num_inference_steps,
+            "seed": out.get("seed"),
+            "prompt": out.get("prompt"),
+            "negative_prompt": out.get("negative_prompt"),
+            "warnings": out.get("warnings", []),
+            "attention_backend": out.get("attention_backend"),
+            "feature_cache": out.get("feature_cache"),
+            "cfg_steps": out.get("cfg_steps"),
+            "estimated_seconds": round(estimate, 2),
+            "profile": profile_info,
+        }
+        if media == MEDIA_PNG:
+            return png_response(data, meta)
+        return msgpack_response({"success": True, **meta, "image": data})
 
     return {
         "success": True,
-        "image_url": _encode_png(out["image"]),
+        "image_url": _data_url(data),
         "model_used": image_manager.repo_id,
         "width": request.width,
         "height": request.height,
@@ -100,83 +259,428 @@ async def generate_image(request: ImageGenerationRequest) -> Dict[str, Any]:
         "negative_prompt": out.get("negative_prompt"),
         "token_info": out.get("token_info", []),
         "warnings": out.get("warnings", []),
+        "attention_backend": out.get("attention_backend"),
+        "feature_cache": out.get("feature_cache"),
+        "cfg_steps": out.get("cfg_steps"),
+        "estimated_seconds": round(estimate, 2),
+        "profile": profile_info,
         "pool": {"size": 1, "active": 0, "available": 1},
     }
 
 
 @router.post("/generate-batch", dependencies=[Depends(require_api_key)])
-async def generate_batch(request: BatchImageRequest) -> Dict[str, Any]:
+async def generate_batch(
+    request: BatchImageRequest,
+    accept: Optional[str] = Header(None),
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Union[Dict[str, Any], Response]:
     if not request.items:
         return {"success": False, "error": "No items provided"}
 
+    media = MEDIA_JSON if request.save_to_disk else negotiate(accept, batch=True)
+
     batch_id = request.prefix or f"batch_{int(time.time())}"
     out_dir = os.path.join(settings.output_dir, "batches", batch_id)
     micro_bsz = request.micro_batch_size
 
-    groups: Dict[tuple, List[tuple[int, ImageGenerationRequest]]] = defaultdict(list)
-    for idx, it in enumerate(request.items):
-        groups[(it.width, it.height, min(it.num_inference_steps, 120), float(it.guidance_scale))].append((idx, it))
+    groups = _group_items(request)
+    estimates = _estimate_groups(groups, micro_bsz)
+    remaining = sum(estimates.values())
+    ticket = uuid.uuid4().hex
+    _admit(ticket, key, remaining, deadline)
+    actual = 0.0
 
     results: List[Optional[Dict[str, Any]]] = [None] * len(request.items)
 
+    profile = profiling.start_profile("generate_batch", profile_flag)
     try:
-        for (w, h, steps, guide), pairs in groups.items():
-            prompts, negs, seeds, indices = [], [], [], []
-            for idx, it in pairs:
-                indices.append(idx)
-                prompts.append(_enhance_prompt(it.prompt, it.style))
-                negs.append(it.negative_prompt or DEFAULT_NEGATIVE)
-                if it.seed is not None:
-                    seeds.append(it.seed)
-                elif request.start_seed is not None:
-                    seeds.append(request.start_seed + idx)
-                else:
-                    seeds.append(None)
-
-            outs = await image_manager.infer_batch_same_shape(
-                prompts=prompts,
-                negative_prompts=negs,
-                num_inference_steps=int(steps),
-                guidance_scale=float(guide),
-                width=int(w),
-                height=int(h),
-                seeds=seeds,
-                micro_batch_size=micro_bsz,
-            )
+        with profile or nullcontext():
+            for (w, h, steps, guide), pairs in groups.items():
+                prompts, negs, seeds, indices, cutoffs = _group_inputs(request, pairs)
+
+                chunks = image_manager.iter_batch_same_shape(
+                    prompts=prompts,
+                    negative_prompts=negs,
+                    num_inference_steps=int(steps),
+                    guidance_scale=float(guide),
+                    width=int(w),
+                    height=int(h),
+                    seeds=seeds,
+                    micro_batch_size=micro_bsz,
+                    guidance_cutoffs=cutoffs,
+                    cache_interval=request.cache_interval,
+                    cache_depth=request.cache_depth,
+                )
+                done = 0
+                async with aclosing(chunks):
+                    async for outs in chunks:
+                        actual += _observe(outs, w, h, steps, guide)
+                        remaining -= estimates[(w, h, steps, guide)] * len(outs) / len(pairs)
+                        admission.progress(ticket, remaining)
+
+                        # Encoded as each micro-batch arrives, so raw images never outlive their chunk.
+                        with profiling.span("encode_results"):
+                            for i, o in enumerate(outs, done):
+                                item = pairs[i][1]
+                                image = fit_to_size(o["image"], item.width, item.height)
+                                if request.save_to_disk:
+                                    url = _save_png(image, out_dir, f"img_{indices[i]:04d}.png")
+                                    ref = {"file_url": url}
+                                elif media != MEDIA_JSON:
+                                    ref = {"image_data": encode_png_buffer(image)}
+                                else:
+                                    ref = {"image_url": _encode_png(image)}
+                                results[indices[i]] = {
+                                    **ref,
+                                    "index": indices[i],
+                                    "seed": o.get("seed"),
+                                    "prompt": o.get("prompt"),
+                                    "negative_prompt": o.get("negative_prompt"),
+                                    "token_info": o.get("token_info", []),
+                                    "warnings": o.get("warnings", []),
+                                    "attention_backend": o.get("attention_backend"),
+                                    "generated_size": [int(w), int(h)],
+                                    "feature_cache": o.get("feature_cache"),
+                                    "cfg_steps": o.get("cfg_steps"),
+                                }
+                        done += len(outs)
 
-            for i, o in enumerate(outs):
-                if request.save_to_disk:
-                    url = _save_png(o["image"], out_dir, f"img_{indices[i]:04d}.png")
-                    ref = {"file_url": url}
-                else:
-                    ref = {"image_url": _encode_png(o["image"])}
-                results[indices[i]] = {
-                    **ref,
-                    "index": indices[i],
-                    "seed": o.get("seed"),
-                    "prompt": o.get("prompt"),
-                    "negative_prompt": o.get("negative_prompt"),
-                    "token_info": o.get("token_info", []),
-                    "warnings": o.get("warnings", []),
-                }
+        profile_info = await profiling.finish_profile(profile)
 
         packed = [r for r in results if r is not None]
-        return {
+        if request.save_to_disk:
+            _write_manifest(out_dir, batch_id, packed)
+        meta = {
             "success": True,
             "count": len(packed),
             "model_used": image_manager.repo_id,
             "batch_id": batch_id,
             "saved_to_disk": bool(request.save_to_disk),
+            "estimated_seconds": round(sum(estimates.values()), 2),
+            "profile": profile_info,
+        }
+        if media != MEDIA_JSON:
+            return batch_response(media, meta, packed)
+        return {
+            **meta,
             "results": packed,
             "pool": {"size": 1, "active": 0, "available": 1},
         }
     except Exception as e:
         logger.error("Batch generation error: %s", e)
         raise GenerationError(f"Batch generation failed: {e}")
+    finally:
+        admission.release(ticket, key, actual)
 
 
-async def _run_batch_job(job_id: str, request: BatchImageRequest) -> None:
+@router.post("/variations", dependencies=[Depends(require_api_key)])
+async def generate_variations(
+    request: VariationRequest,
+    accept: Optional[str] = Header(None),
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Union[Dict[str, Any], Response]:
+    steps = min(request.num_inference_steps, 120)
+    shared_steps = int(round(steps * request.shared_fraction))
+    ticket = uuid.uuid4().hex
+    # Upper bound: the shared prefix is only denoised once, but the model is fitted on independent samples.
+    estimate = cost_model.estimate(
+        request.width, request.height, steps, request.guidance_scale, request.count, request.micro_batch_size,
+        _cfg_fraction(steps, request.guidance_scale, [request.guidance_cutoff]),
+    )
+    _admit(ticket, key, estimate, deadline)
+    # The shared prefix makes per-batch timings incomparable, so a successful run keeps its estimate.
+    actual: Optional[float] = 0.0
+    profile = profiling.start_profile("variations", profile_flag)
+    with profile or nullcontext():
+        try:
+            outs = await image_manager.infer_variations(
+                prompt=enhance_prompt(request.prompt, request.style),
+                negative_prompt=request.negative_prompt or DEFAULT_NEGATIVE,
+                num_inference_steps=steps,
+                guidance_scale=request.guidance_scale,
+                width=request.width,
+                height=request.height,
+                seed=request.seed,
+                count=request.count,
+                shared_steps=shared_steps,
+                strength=request.variation_strength,
+                micro_batch_size=request.micro_batch_size,
+                guidance_cutoff=request.guidance_cutoff,
+            )
+            actual = None
+        except Exception as e:
+            logger.error("Variation generation error: %s", e)
+            raise GenerationError(f"Variation generation failed: {e}")
+        finally:
+            admission.release(ticket, key, actual)
+
+        media = negotiate(accept, batch=True)
+        with profiling.span("encode_results"):
+            encoded = [encode_png_buffer(o["image"]) for o in outs]
+    profile_info = await profiling.finish_profile(profile)
+
+    results = []
+    for o, data in zip(outs, encoded):
+        if media != MEDIA_JSON:
+            ref = {"image_data": data}
+        else:
+            ref = {"image_url": _data_url(data)}
+        results.append({
+            **ref,
+            "index": o["variation"],
+            "seed": o.get("seed"),
+            "shared_steps": o.get("shared_steps"),
+            "prompt": o.get("prompt"),
+            "negative_prompt": o.get("negative_prompt"),
+            "token_info": o.get("token_info", []),
+            "warnings": o.get("warnings", []),
+            "attention_backend": o.get("attention_backend"),
+        })
+
+    meta = {
+        "success": True,
+        "count": len(results),
+        "model_used": image_manager.repo_id,
+        "base_seed": outs[0]["seed"] if outs else request.seed,
+        "shared_steps": shared_steps,
+        "num_inference_steps": steps,
+        "profile": profile_info,
+    }
+    if media != MEDIA_JSON:
+        return batch_response(media, meta, results)
+    return {**meta, "results": results}
+
+
+@router.post("/draft", dependencies=[Depends(require_api_key)])
+async def generate_drafts(
+    request: DraftRequest,
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Dict[str, Any]:
+    micro_bsz = request.micro_batch_size
+    groups: Dict[tuple, List[tuple[int, ImageGenerationRequest]]] = defaultdict(list)
+    for idx, it in enumerate(request.items):
+        w, h = scaled_size(it.width, it.height, request.draft_scale)
+        steps = min(request.draft_steps, it.num_inference_steps, 120)
+        groups[(w, h, steps, float(it.guidance_scale))].append((idx, it))
+    estimates = _estimate_groups(groups, micro_bsz)
+    remaining = sum(estimates.values())
+    ticket = uuid.uuid4().hex
+    _admit(ticket, key, remaining, deadline)
+    actual = 0.0
+
+    draft_id = f"draft_{uuid.uuid4().hex[:12]}"
+    results: List[Optional[Dict[str, Any]]] = [None] * len(request.items)
+
+    profile = profiling.start_profile("draft", profile_flag)
+    try:
+        with profile or nullcontext():
+            for (w, h, steps, guide), pairs in groups.items():
+                prompts, negs, seeds, indices, cutoffs = _group_inputs(request, pairs)
+                # Refinement re-noises with the draft's seed, so every draft needs a concrete one.
+                seeds = [s if s is not None else random.randrange(2 ** 31) for s in seeds]
+
+                chunks = image_manager.iter_batch_same_shape(
+                    prompts=prompts,
+                    negative_prompts=negs,
+                    num_inference_steps=int(steps),
+                    guidance_scale=float(guide),
+                    width=int(w),
+                    height=int(h),
+                    seeds=seeds,
+                    micro_batch_size=micro_bsz,
+                    guidance_cutoffs=cutoffs,
+                    return_latents=True,
+                )
+                done = 0
+                async with aclosing(chunks):
+                    async for outs in chunks:
+                        actual += _observe(outs, w, h, steps, guide)
+                        remaining -= estimates[(w, h, steps, guide)] * len(outs) / len(pairs)
+                        admission.progress(ticket, remaining)
+
+                        with profiling.span("store_results"):
+                            for i, o in enumerate(outs, done):
+                                item = pairs[i][1]
+                                entry = {
+                                    **draft_store.put_image(draft_id, indices[i], o["image"]),
+                                    "latents": draft_store.put_latents(draft_id, indices[i], o["latents"]),
+                                    "index": indices[i],
+                                    "seed": o.get("seed"),
+                                    "prompt": o.get("prompt"),
+                                    "negative_prompt": o.get("negative_prompt"),
+                                    "width": item.width,
+                                    "height": item.height,
+                                    "num_inference_steps": min(item.num_inference_steps, 120),
+                                    "guidance_scale": float(guide),
+                                    "draft_size": [int(w), int(h)],
+                                    "draft_steps": int(steps),
+                                }
+                                draft_store.append(draft_id, entry)
+                                results[indices[i]] = entry
+                        done += len(outs)
+        profile_info = await profiling.finish_profile(profile)
+    except Exception as e:
+        logger.error("Draft generation error: %s", e)
+        draft_store.delete(draft_id)
+        raise GenerationError(f"Draft generation failed: {e}")
+    finally:
+        admission.release(ticket, key, actual)
+
+    packed = [{k: v for k, v in r.items() if k != "latents"} for r in results if r is not None]
+    return {
+        "success": True,
+        "draft_id": draft_id,
+        "count": len(packed),
+        "model_used": image_manager.repo_id,
+        "estimated_seconds": round(sum(estimates.values()), 2),
+        "results": packed,
+        "profile": profile_info,
+    }
+
+
+@router.post("/refine", dependencies=[Depends(require_api_key)])
+async def refine_drafts(
+    request: RefineRequest,
+    accept: Optional[str] = Header(None),
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Union[Dict[str, Any], Response]:
+    draft_id = request.draft_id
+    if os.path.basename(draft_id) != draft_id or not draft_store.exists(draft_id):
+        raise HTTPException(status_code=404, detail="Draft not found")
+    entries = {e["index"]: e for e in draft_store.entries(draft_id)}
+    missing = [i for i in request.indices if i not in entries]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Unknown draft indices: {missing}")
+
+    groups: Dict[tuple, List[Dict[str, Any]]] = defaultdict(list)
+    for i in dict.fromkeys(request.indices):
+        e = entries[i]
+        steps = min(request.num_inference_steps or e["num_inference_steps"], 120)
+        groups[(e["width"], e["height"], steps, e["guidance_scale"])].append(e)
+    # Only the last `strength` share of each schedule is denoised.
+    estimates = {
+        (w, h, steps, guide): cost_model.estimate(
+            w, h, max(1, round(steps * request.strength)), guide, len(es), request.micro_batch_size
+        )
+        for (w, h, steps, guide), es in groups.items()
+    }
+    remaining = sum(estimates.values())
+    ticket = uuid.uuid4().hex
+    _admit(ticket, key, remaining, deadline)
+    actual = 0.0
+
+    media = negotiate(accept, batch=True)
+    loop = asyncio.get_running_loop()
+    results: List[Dict[str, Any]] = []
+    profile = profiling.start_profile("refine", profile_flag)
+    try:
+        with profile or nullcontext():
+            for (w, h, steps, guide), es in groups.items():
+                latents = await loop.run_in_executor(
+                    None, lambda: [draft_store.load_latents(draft_id, e["latents"]) for e in es]
+                )
+                outs = await image_manager.refine(
+                    latents=latents,
+                    prompts=[e["prompt"] for e in es],
+                    negative_prompts=[e["negative_prompt"] for e in es],
+                    seeds=[e["seed"] for e in es],
+                    num_inference_steps=int(steps),
+                    guidance_scale=float(guide),
+                    width=int(w),
+                    height=int(h),
+                    strength=request.strength,
+                    micro_batch_size=request.micro_batch_size,
+                )
+                actual += _observe(outs, w, h, outs[0]["refine_steps"], guide)
+                remaining -= estimates[(w, h, steps, guide)]
+                admission.progress(ticket, remaining)
+
+                with profiling.span("encode_results"):
+                    for e, o in zip(es, outs):
+                        data = encode_png_buffer(o["image"])
+                        ref = {"image_data": data} if media != MEDIA_JSON else {"image_url": _data_url(data)}
+                        results.append({
+                            **ref,
+                            "index": e["index"],
+                            "seed": o.get("seed"),
+                            "prompt": o.get("prompt"),
+                            "negative_prompt": o.get("negative_prompt"),
+                            "width": int(w),
+                            "height": int(h),
+                            "refine_steps": o.get("refine_steps"),
+                            "token_info": o.get("token_info", []),
+                            "warnings": o.get("warnings", []),
+                            "attention_backend": o.get("attention_backend"),
+                        })
+        profile_info = await profiling.finish_profile(profile)
+    except Exception as e:
+        logger.error("Refinement error: %s", e)
+        raise GenerationError(f"Refinement failed: {e}")
+    finally:
+        admission.release(ticket, key, actual)
+
+    meta = {
+        "success": True,
+        "count": len(results),
+        "model_used": image_manager.repo_id,
+        "draft_id": draft_id,
+        "strength": request.strength,
+        "estimated_seconds": round(sum(estimates.values()), 2),
+        "profile": profile_info,
+    }
+    if media != MEDIA_JSON:
+        return batch_response(media, meta, results)
+    return {**meta, "results": results}
+
+
+def _store_job_result(
+    job_id: str,
+    request: BatchOptions,
+    out_dir: str,
+    index: int,
+    item: ImageGenerationRequest,
+    o: Dict[str, Any],
+    w: int,
+    h: int,
+) -> None:
+    image = fit_to_size(o["image"], item.width, item.height)
+    if request.save_to_disk:
+        ref = {"file_url": _save_png(image, out_dir, f"img_{index:04d}.png")}
+    else:
+        ref = job_result_store.put_image(job_id, index, image)
+    job_result_store.append(job_id, {
+        **ref,
+        "index": index,
+        "seed": o.get("seed"),
+        "prompt": o.get("prompt"),
+        "negative_prompt": o.get("negative_prompt"),
+        "token_info": o.get("token_info", []),
+        "warnings": o.get("warnings", []),
+        "attention_backend": o.get("attention_backend"),
+        "generated_size": [int(w), int(h)],
+        "feature_cache": o.get("feature_cache"),
+        "cfg_steps": o.get("cfg_steps"),
+    })
+    job_service.clear_preview(job_id, str(index))
+
+
+async def _run_batch_job(
+    job_id: str,
+    request: BatchImageRequest,
+    ticket: str,
+    key: str,
+    profile_flag: bool = False,
+) -> None:
     job_service.update_job(job_id, status=JobStatus.LOADING, progress=0.0)
+    actual = 0.0
     
     try:
         total = len(request.items)
@@ -188,81 +692,424 @@ async def _run_batch_job(job_id: str, request: BatchImageRequest) -> None:
         out_dir = os.path.join(settings.output_dir, "batches", batch_id)
         micro_bsz = request.micro_batch_size
 
-        groups: Dict[tuple, List[tuple[int, ImageGenerationRequest]]] = defaultdict(list)
-        for idx, it in enumerate(request.items):
-            groups[(it.width, it.height, min(it.num_inference_steps, 120), float(it.guidance_scale))].append((idx, it))
+        groups = _group_items(request)
+        estimates = _estimate_groups(groups, micro_bsz)
+        remaining = sum(estimates.values())
 
-        results: List[Optional[Dict[str, Any]]] = [None] * total
         processed = 0
 
-        job_service.update_job(job_id, status=JobStatus.GENERATING, progress=0.0, metadata={"batch_id": batch_id})
-
-        for (w, h, steps, guide), pairs in groups.items():
-            prompts, negs, seeds, indices = [], [], [], []
-            for idx, it in pairs:
-                indices.append(idx)
-                prompts.append(_enhance_prompt(it.prompt, it.style))
-                negs.append(it.negative_prompt or DEFAULT_NEGATIVE)
-                if it.seed is not None:
-                    seeds.append(it.seed)
-                elif request.start_seed is not None:
-                    seeds.append(request.start_seed + idx)
-                else:
-                    seeds.append(None)
-
-            outs = await image_manager.infer_batch_same_shape(
-                prompts=prompts,
-                negative_prompts=negs,
-                num_inference_steps=int(steps),
-                guidance_scale=float(guide),
-                width=int(w),
-                height=int(h),
-                seeds=seeds,
-                micro_batch_size=micro_bsz,
-            )
+        job_service.update_job(
+            job_id,
+            status=JobStatus.GENERATING,
+            progress=0.0,
+            metadata={"batch_id": batch_id},
+            eta_at=time.time() + remaining,
+        )
 
-            for i, o in enumerate(outs):
-                if request.save_to_disk:
-                    url = _save_png(o["image"], out_dir, f"img_{indices[i]:04d}.png")
-                    ref = {"file_url": url}
-                else:
-                    ref = {"image_url": _encode_png(o["image"])}
-                results[indices[i]] = {
-                    **ref,
-                    "index": indices[i],
-                    "seed": o.get("seed"),
-                    "prompt": o.get("prompt"),
-                    "negative_prompt": o.get("negative_prompt"),
-                    "token_info": o.get("token_info", []),
-                    "warnings": o.get("warnings", []),
-                }
-                processed += 1
-                job_service.update_job(job_id, status=JobStatus.GENERATING, progress=processed / total)
+        def _preview_callback(indices: List[int]):
+            def _on_preview(i: int, step: int, image: Image.Image) -> None:
+                job_service.set_preview(job_id, str(indices[i]), {"step": step, "image_url": _encode_png(image)})
+            return _on_preview
 
-        packed = [r for r in results if r is not None]
+        profile = profiling.start_profile("job", profile_flag)
+        with profile or nullcontext():
+            for (w, h, steps, guide), pairs in groups.items():
+                prompts, negs, seeds, indices, cutoffs = _group_inputs(request, pairs)
+
+                chunks = image_manager.iter_batch_same_shape(
+                    prompts=prompts,
+                    negative_prompts=negs,
+                    num_inference_steps=int(steps),
+                    guidance_scale=float(guide),
+                    width=int(w),
+                    height=int(h),
+                    seeds=seeds,
+                    micro_batch_size=micro_bsz,
+                    guidance_cutoffs=cutoffs,
+                    preview_every=request.preview_every,
+                    on_preview=_preview_callback(indices) if request.preview_every else None,
+                    should_cancel=lambda: job_service.is_cancelled(job_id),
+                    cache_interval=request.cache_interval,
+                    cache_depth=request.cache_depth,
+                )
+                done = 0
+                async with aclosing(chunks):
+                    async for outs in chunks:
+                        actual += _observe(outs, w, h, steps, guide)
+                        remaining -= estimates[(w, h, steps, guide)] * len(outs) / len(pairs)
+                        admission.progress(ticket, remaining)
+                        job_service.update_job(job_id, eta_at=time.time() + remaining)
+
+                        with profiling.span("store_results"):
+                            for i, o in enumerate(outs, done):
+                                _store_job_result(job_id, request, out_dir, indices[i], pairs[i][1], o, w, h)
+                                processed += 1
+                                job_service.update_job(
+                                    job_id, status=JobStatus.GENERATING, progress=processed / total, completed=processed
+                                )
+                        done += len(outs)
+        job_service.update_job(job_id, profile=await profiling.finish_profile(profile))
+
+        if request.save_to_disk:
+            _write_manifest(out_dir, batch_id, job_result_store.entries(job_id))
         job_service.update_job(
             job_id,
             status=JobStatus.DONE,
             progress=1.0,
             result={
                 "success": True,
-                "count": len(packed),
+                "count": processed,
                 "model_used": image_manager.repo_id,
                 "batch_id": batch_id,
                 "saved_to_disk": bool(request.save_to_disk),
-                "results": packed,
+                "results_url": f"/api/image/job/{job_id}/results",
             },
         )
+    except GenerationCancelled:
+        logger.info("Async batch job %s cancelled", job_id)
+        job_service.update_job(job_id, status=JobStatus.CANCELLED, previews={})
     except Exception as e:
         logger.error("Async batch job error: %s", e)
         job_service.update_job(job_id, status=JobStatus.ERROR, error=str(e))
+    finally:
+        admission.release(ticket, key, actual)
+
+
+async def _run_sharded_job(job_id: str, request: BatchImageRequest, ticket: str, key: str) -> None:
+    total = len(request.items)
+    batch_id = request.prefix or f"batch_{int(time.time())}"
+    out_dir = os.path.join(settings.output_dir, "batches", batch_id)
+    processed = 0
+    # Nodes do not report device time, so a finished job keeps its full estimate and a failed one is refunded.
+    actual: Optional[float] = 0.0
+
+    def _progress(delta: int) -> None:
+        nonlocal processed
+        processed += delta
+        job_service.update_job(job_id, progress=processed / total, completed=processed)
+
+    def _store(index: int, node: str, entry: Dict[str, Any], data: bytes) -> None:
+        if request.save_to_disk:
+            os.makedirs(out_dir, exist_ok=True)
+            name = f"img_{index:04d}.png"
+            with open(os.path.join(out_dir, name), "wb") as f:
+                f.write(data)
+            ref = {"file_url": f"/files/batches/{batch_id}/{name}"}
+        else:
+            ref = job_result_store.put_bytes(job_id, index, data)
+        job_result_store.append(job_id, {
+            **{k: v for k, v in entry.items() if k not in ("blob", "file_url", "index")},
+            **ref,
+            "index": index,
+            "node": node,
+        })
+
+    try:
+        shards = coordinator.plan(request, _group_items(request))
+        job_service.update_job(
+            job_id,
+            status=JobStatus.GENERATING,
+            progress=0.0,
+            completed=0,
+            metadata={"batch_id": batch_id, "shards": len(shards)},
+        )
+        summary = await coordinator.run(shards, _store, _progress, lambda: job_service.is_cancelled(job_id))
+        actual = None
+
+        if request.save_to_disk:
+            _write_manifest(out_dir, batch_id, job_result_store.entries(job_id))
+        job_service.update_job(
+            job_id,
+            status=JobStatus.DONE,
+            progress=1.0,
+            completed=total,
+            result={
+                "success": True,
+                "count": total,
+                "model_used": "cluster",
+                "batch_id": batch_id,
+                "saved_to_disk": bool(request.save_to_disk),
+                "results_url": f"/api/image/job/{job_id}/results",
+                "cluster": summary,
+            },
+        )
+    except GenerationCancelled:
+        logger.info("Sharded batch job %s cancelled", job_id)
+        job_service.update_job(job_id, status=JobStatus.CANCELLED)
+    except Exception as e:
+        logger.error("Sharded batch job error: %s", e)
+        job_service.update_job(job_id, status=JobStatus.ERROR, error=str(e))
+    finally:
+        admission.release(ticket, key, actual)
+
+
+def _require_previews(preview_every: int) -> None:
+    if preview_every and not image_manager.supports_previews:
+        raise HTTPException(status_code=400, detail="preview_every is not supported when ENGINE_ADDRESS is set")
+
+
+def _submit_batch_job(
+    request: BatchImageRequest,
+    metadata: Dict[str, Any],
+    key: str,
+    deadline: Optional[float],
+    profile_flag: bool = False,
+    sharded: bool = False,
+) -> Dict[str, Any]:
+    _require_previews(request.preview_every)
+    ticket = uuid.uuid4().hex
+    estimates = _estimate_groups(_group_items(request), request.micro_batch_size)
+    # Shards run in parallel, which shortens the ETA but not the compute charged to the key.
+    # The local cost model stands in for each node's.
+    parallelism = len(coordinator.registry.active()) if sharded else 1
+    estimate = _admit(ticket, key, sum(estimates.values()), deadline, parallelism)
+    job_id = job_service.create_job(metadata=metadata)
+    job_service.update_job(job_id, estimate=estimate, eta_at=estimate["eta_at"])
+    if sharded:
+        asyncio.create_task(_run_sharded_job(job_id, request, ticket, key))
+    else:
+        asyncio.create_task(_run_batch_job(job_id, request, ticket, key, profile_flag))
+    return {"ok": True, "job_id": job_id, "estimate": estimate}
 
 
 @router.post("/generate-batch-async", dependencies=[Depends(require_api_key)])
-async def generate_batch_async(request: BatchImageRequest) -> Dict[str, Any]:
-    job_id = job_service.create_job(metadata={"type": "image-batch", "count": len(request.items)})
-    asyncio.create_task(_run_batch_job(job_id, request))
-    return {"ok": True, "job_id": job_id}
+async def generate_batch_async(
+    request: BatchImageRequest,
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+    x_emberglow_shard: Optional[str] = Header(None),
+) -> Dict[str, Any]:
+    # Shards from a coordinator always run here, even when this instance coordinates nodes of its own.
+    sharded = not x_emberglow_shard and coordinator.should_shard(len(request.items))
+    return _submit_batch_job(
+        request, {"type": "image-batch", "count": len(request.items)}, key, deadline, profile_flag, sharded
+    )
+
+
+@router.post("/generate-async", dependencies=[Depends(require_api_key)])
+async def generate_image_async(
+    request: ImageGenerationRequest,
+    preview_every: int = Query(0, ge=0, le=150),
+    cache_interval: int = Query(1, ge=1, le=8),
+    cache_depth: float = Query(0.5, ge=0.1, le=0.9),
+    deadline: Optional[float] = Query(None, gt=0),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Dict[str, Any]:
+    batch = BatchImageRequest(
+        items=[request],
+        micro_batch_size=1,
+        preview_every=preview_every,
+        cache_interval=cache_interval,
+        cache_depth=cache_depth,
+    )
+    return _submit_batch_job(batch, {"type": "image", "count": 1}, key, deadline, profile_flag)
+
+
+async def _run_manifest_job(
+    job_id: str,
+    options: BatchOptions,
+    feed: ManifestFeed,
+    ticket: str,
+    key: str,
+    profile_flag: bool = False,
+) -> None:
+    batch_id = options.prefix or f"batch_{int(time.time())}"
+    out_dir = os.path.join(settings.output_dir, "batches", batch_id)
+    processed = 0
+    actual = 0.0
+    job_service.update_job(job_id, status=JobStatus.GENERATING, metadata={"batch_id": batch_id})
+
+    try:
+        profile = profiling.start_profile("job", profile_flag)
+        with profile or nullcontext():
+            while True:
+                batch = await feed.next_batch(options.micro_batch_size)
+                if batch is None:
+                    break
+                (w, h, steps, guide), pairs = batch
+                prompts, negs, seeds, indices, cutoffs = _group_inputs(options, pairs)
+
+                def _on_preview(i: int, step: int, image: Image.Image) -> None:
+                    job_service.set_preview(job_id, str(indices[i]), {"step": step, "image_url": _encode_png(image)})
+
+                outs = await image_manager.infer_batch_same_shape(
+                    prompts=prompts,
+                    negative_prompts=negs,
+                    num_inference_steps=int(steps),
+                    guidance_scale=float(guide),
+                    width=int(w),
+                    height=int(h),
+                    seeds=seeds,
+                    micro_batch_size=len(pairs),
+                    guidance_cutoffs=cutoffs,
+                    preview_every=options.preview_every,
+                    on_preview=_on_preview if options.preview_every else None,
+                    should_cancel=lambda: job_service.is_cancelled(job_id),
+                    cache_interval=options.cache_interval,
+                    cache_depth=options.cache_depth,
+                )
+                actual += _observe(outs, w, h, steps, guide)
+                feed.queued_seconds -= cost_model.estimate(
+                    w, h, steps, guide, len(pairs), len(pairs),
+                    _cfg_fraction(steps, guide, cutoffs),
+                )
+                admission.progress(ticket, max(0.0, feed.queued_seconds))
+
+                with profiling.span("store_results"):
+                    for i, o in enumerate(outs):
+                        _store_job_result(job_id, options, out_dir, indices[i], pairs[i][1], o, w, h)
+                processed += len(outs)
+                # The total is only known once the upload ends, so progress is against items received so far.
+                job_service.update_job(
+                    job_id,
+                    progress=processed / feed.received,
+                    completed=processed,
+                    received=feed.received,
+                    eta_at=time.time() + max(0.0, feed.queued_seconds),
+                )
+        job_service.update_job(job_id, profile=await profiling.finish_profile(profile))
+
+        if processed == 0:
+            job_service.update_job(job_id, status=JobStatus.ERROR, error="No valid items in manifest")
+            return
+        if options.save_to_disk:
+            _write_manifest(out_dir, batch_id, job_result_store.entries(job_id))
+        job_service.update_job(
+            job_id,
+            status=JobStatus.DONE,
+            progress=1.0,
+            result={
+                "success": True,
+                "count": processed,
+                "model_used": image_manager.repo_id,
+                "batch_id": batch_id,
+                "saved_to_disk": bool(options.save_to_disk),
+                "results_url": f"/api/image/job/{job_id}/results",
+            },
+        )
+    except GenerationCancelled:
+        logger.info("Manifest job %s cancelled", job_id)
+        job_service.update_job(job_id, status=JobStatus.CANCELLED, previews={})
+    except Exception as e:
+        logger.error("Manifest job error: %s", e)
+        job_service.update_job(job_id, status=JobStatus.ERROR, error=str(e))
+    finally:
+        admission.release(ticket, key, actual)
+
+
+def _batch_options(
+    save_to_disk: bool = Query(False),
+    prefix: Optional[str] = Query(None),
+    start_seed: Optional[int] = Query(None),
+    micro_batch_size: int = Query(4, ge=1, le=64),
+    preview_every: int = Query(0, ge=0, le=150),
+    bucketing: bool = Query(False),
+    cache_interval: int = Query(1, ge=1, le=8),
+    cache_depth: float = Query(0.5, ge=0.1, le=0.9),
+) -> BatchOptions:
+    # Query bounds mirror BatchOptions, so bad values are a 422 here rather than a ValidationError later.
+    return BatchOptions(
+        save_to_disk=save_to_disk,
+        prefix=prefix,
+        start_seed=start_seed,
+        micro_batch_size=micro_batch_size,
+        preview_every=preview_every,
+        bucketing=bucketing,
+        cache_interval=cache_interval,
+        cache_depth=cache_depth,
+    )
+
+
+@router.post("/generate-batch-jsonl", dependencies=[Depends(require_api_key)])
+async def generate_batch_jsonl(
+    request: Request,
+    options: BatchOptions = Depends(_batch_options),
+    key: str = Depends(client_key),
+    profile_flag: bool = Depends(profile_requested),
+) -> Dict[str, Any]:
+    # The body is read line by line; generation starts on the first full micro-batch while the rest uploads.
+    _require_previews(options.preview_every)
+    ticket = uuid.uuid4().hex
+    _admit(ticket, key, 0.0, None)
+    feed = ManifestFeed(MANIFEST_LINGER_S)
+    job_id = job_service.create_job(metadata={"type": "image-batch-jsonl"})
+    task = asyncio.create_task(_run_manifest_job(job_id, options, feed, ticket, key, profile_flag))
+
+    rejected = 0
+    line_no = 0
+    charged = 0.0
+    errors: List[Dict[str, Any]] = []
+
+    def _reject(line_no: int, message: str) -> None:
+        nonlocal rejected
+        rejected += 1
+        if len(errors) < MANIFEST_MAX_ERRORS:
+            errors.append({"line": line_no, "error": message})
+
+    try:
+        async for line_no, line in iter_manifest(request.stream()):
+            if task.done() or job_service.is_cancelled(job_id):
+                break
+            if not line.strip():
+                continue
+            if feed.received >= MANIFEST_MAX_ITEMS:
+                _reject(line_no, f"Manifest exceeds {MANIFEST_MAX_ITEMS} items; the rest was ignored")
+                break
+            try:
+                item = ImageGenerationRequest(**json.loads(line))
+            except (ValueError, TypeError) as e:
+                _reject(line_no, str(e))
+                continue
+            w, h, steps, guide = group = _group_key(options, item)
+            per_item = cost_model.predict_micro_batch(
+                w, h, steps, guide, options.micro_batch_size,
+                _cfg_fraction(steps, guide, [item.guidance_cutoff]),
+            ) / options.micro_batch_size
+            if not admission.extend(ticket, key, charged + per_item):
+                _reject(line_no, "Compute budget exceeded; the rest was ignored")
+                break
+            charged += per_item
+            feed.add(group, (feed.received, item), per_item)
+            admission.progress(ticket, feed.queued_seconds)
+    except ValueError as e:
+        _reject(line_no + 1, str(e))
+    except ClientDisconnect:
+        logger.warning("Manifest upload for job %s disconnected after %d items", job_id, feed.received)
+        job_service.cancel_job(job_id)
+    finally:
+        feed.close()
+
+    job_service.update_job(job_id, received=feed.received, rejected=rejected, upload_errors=errors)
+    return {
+        "ok": True,
+        "job_id": job_id,
+        "received": feed.received,
+        "rejected": rejected,
+        "errors": errors,
+    }
+
+
+@router.post("/estimate", dependencies=[Depends(require_api_key)])
+async def estimate_batch(
+    request: BatchImageRequest,
+    key: str = Depends(client_key),
+) -> Dict[str, Any]:
+    estimates = _estimate_groups(_group_items(request), request.micro_batch_size)
+    seconds = sum(estimates.values())
+    queue = admission.backlog_seconds()
+    return {
+        "estimated_seconds": round(seconds, 2),
+        "queue_seconds": round(queue, 2),
+        "eta_at": time.time() + queue + seconds,
+        "groups": [
+            {"width": w, "height": h, "steps": steps, "guidance_scale": guide, "estimated_seconds": round(t, 2)}
+            for (w, h, steps, guide), t in estimates.items()
+        ],
+        "usage": admission.usage(key),
+        "cost_model": cost_model.stats(),
+    }
 
 
 @router.get("/job/{job_id}")
@@ -273,6 +1120,86 @@ async def get_job(job_id: str) -> Dict[str, Any]:
     return job
 
 
+@router.delete("/job/{job_id}", dependencies=[Depends(require_api_key)])
+async def delete_job(job_id: str) -> Dict[str, Any]:
+    job = job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] not in TERMINAL_STATUSES:
+        raise HTTPException(status_code=409, detail="Job is still running; cancel it first")
+    job_service.delete_job(job_id)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, job_result_store.delete, job_id)
+    return {"ok": True, "job_id": job_id}
+
+
+@router.get("/job/{job_id}/results")
+async def get_job_results(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    inline: bool = Query(False),
+) -> Dict[str, Any]:
+    if not job_service.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    loop = asyncio.get_running_loop()
+    page = await loop.run_in_executor(None, job_result_store.page, job_id, offset, limit, inline)
+    return {"job_id": job_id, **page}
+
+
+@router.get("/job/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    if not job_service.get_job(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def _stream():
+        last_update = None
+        while True:
+            job = job_service.get_job(job_id)
+            if job is None:
+                return
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                yield f"data: {json.dumps(job, default=str)}\n\n"
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-store"})
+
+
+@router.post("/job/{job_id}/cancel", dependencies=[Depends(require_api_key)])
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    job = job_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    accepted = job_service.cancel_job(job_id)
+    return {"ok": accepted, "job_id": job_id, "status": job["status"]}
+
+
+@router.get("/batch/{batch_id}/archive", dependencies=[Depends(require_api_key)])
+async def download_batch_archive(
+    batch_id: str,
+    format: str = Query("zip", pattern="^(zip|tar)$"),
+) -> StreamingResponse:
+    if batch_id in ("", ".", "..") or os.path.basename(batch_id) != batch_id:
+        raise HTTPException(status_code=400, detail="Invalid batch id")
+    batch_dir = os.path.join(settings.output_dir, "batches", batch_id)
+    if not os.path.isdir(batch_dir):
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    archiver = BatchArchiver(batch_dir)
+    if format == "tar":
+        body, media_type = archiver.stream_tar(), "application/x-tar"
+    else:
+        body, media_type = archiver.stream_zip(), "application/zip"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{batch_id}.{format}"'},
+    )
+
+
 @router.post("/warmup")
 async def warmup():
     await image_manager.ensure_loaded()
@@ -1,18 +1,31 @@
 import asyncio
+import io
 import os
-from fastapi import APIRouter, UploadFile, File, Query, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, Query, HTTPException, Depends
 from fastapi.responses import JSONResponse
-from typing import Optional
+from contextlib import nullcontext
+from typing import Optional, Dict, Any, List, Tuple, Union
+from PIL import Image
 
-from ...models.schemas import VideoGenerationOptions
+from ...models.schemas import VideoGenerationOptions, TextToLoopRequest
 from ...models.video_model import VideoModelManager
 from ...services.job_service import job_service, JobStatus
 from ...services.video_processor import VideoProcessor
+from ...services.archive_service import BatchArchiver
+from ...services.prompts import DEFAULT_NEGATIVE, enhance_prompt
+from ...core.state import image_manager
 from ...core.config import get_settings
-from ..dependencies import require_api_key
+from ...core import profiling
+from ..dependencies import require_api_key, profile_requested
 
 router = APIRouter(prefix="/api/video", tags=["video"])
 
+UPLOAD_STAGE_WEIGHTS = {"video": 0.85, "encoding": 0.15}
+PROMPT_STAGE_WEIGHTS = {"image": 0.25, "video": 0.65, "encoding": 0.1}
+BATCH_STAGE_WEIGHTS = {"video": 0.85, "encoding": 0.15}
+# Each ffmpeg encode is CPU-heavy and holds a clip's frames, so only a few run at once.
+MAX_CONCURRENT_ENCODES = 2
+
 
 class VideoGenerator:
     def __init__(self):
@@ -23,60 +36,264 @@ class VideoGenerator:
     async def generate_async(
         self,
         file_content: bytes,
-        options: VideoGenerationOptions
+        options: VideoGenerationOptions,
+        profile: bool = False,
     ) -> str:
         job_id = job_service.create_job(options.dict())
-        asyncio.create_task(self._process_video(job_id, file_content, options))
+        asyncio.create_task(self._process_video(job_id, file_content, options, profile))
+        return job_id
+
+    async def generate_batch_async(
+        self,
+        sources: List[Tuple[str, Union[bytes, str]]],
+        options: VideoGenerationOptions,
+        micro_batch_size: int,
+        profile: bool = False,
+    ) -> str:
+        job_id = job_service.create_job({"type": "video-batch", "count": len(sources), **options.dict()})
+        asyncio.create_task(self._process_video_batch(job_id, sources, options, micro_batch_size, profile))
+        return job_id
+
+    async def generate_from_prompt_async(self, request: TextToLoopRequest, profile: bool = False) -> str:
+        job_id = job_service.create_job({"type": "text-to-loop", **request.video.dict()})
+        asyncio.create_task(self._process_prompt_loop(job_id, request, profile))
         return job_id
+
+    def _report(
+        self,
+        job_id: str,
+        weights: Dict[str, float],
+        stages: Dict[str, float],
+        stage: str,
+        value: float,
+    ) -> None:
+        stages[stage] = value
+        job_service.update_job(
+            job_id,
+            stage=stage,
+            stages=dict(stages),
+            progress=round(sum(weights[k] * v for k, v in stages.items()), 4),
+        )
+
+    async def _animate(
+        self,
+        job_id: str,
+        base_image: Image.Image,
+        options: VideoGenerationOptions,
+        weights: Dict[str, float],
+        stages: Dict[str, float],
+    ) -> Dict[str, Any]:
+        job_service.update_job(job_id, status=JobStatus.GENERATING)
+        self._report(job_id, weights, stages, "video", 0.0)
+        frames, width, height = await self._manager.img2vid_clip(
+            base_image=base_image,
+            num_frames=options.num_frames,
+            fps=options.fps,
+            motion_bucket_id=options.motion,
+            noise_aug_strength=options.preserve_strength,
+            seed=options.seed,
+            enhance_quality=options.enhance_quality,
+            interpolation_factor=options.interpolation_factor,
+            loop_mode=options.loop_mode,
+            on_step=lambda step, total: self._report(job_id, weights, stages, "video", step / total),
+        )
+
+        job_service.update_job(job_id, status=JobStatus.ENCODING)
+        self._report(job_id, weights, stages, "encoding", 0.0)
+        output_path = await self._processor.create_looped_video(
+            frames=frames,
+            fps=options.fps,
+            duration_minutes=options.duration_minutes,
+            job_id=job_id
+        )
+        self._report(job_id, weights, stages, "encoding", 1.0)
+        return {
+            "video_path": output_path,
+            "width": width,
+            "height": height,
+            "fps": options.fps,
+            "duration_minutes": options.duration_minutes,
+        }
     
     async def _process_video(
         self,
         job_id: str,
         file_content: bytes,
-        options: VideoGenerationOptions
+        options: VideoGenerationOptions,
+        profile: bool = False,
     ):
         try:
-            job_service.update_job(job_id, status=JobStatus.LOADING)
-            base_image = self._processor.load_image(file_content)
-            
-            job_service.update_job(job_id, status=JobStatus.GENERATING)
-            frames, width, height = await self._manager.img2vid_clip(
-                base_image=base_image,
-                num_frames=options.num_frames,
-                fps=options.fps,
-                motion_bucket_id=options.motion,
-                noise_aug_strength=options.preserve_strength,
-                seed=options.seed,
-                enhance_quality=options.enhance_quality,
-            )
-            
-            job_service.update_job(job_id, status=JobStatus.ENCODING)
-            output_path = await self._processor.create_looped_video(
-                frames=frames,
-                fps=options.fps,
-                duration_minutes=options.duration_minutes,
-                job_id=job_id
-            )
+            session = profiling.start_profile("video", profile)
+            with session or nullcontext():
+                job_service.update_job(job_id, status=JobStatus.LOADING)
+                with profiling.span("load_image"):
+                    base_image = self._processor.load_image(file_content)
+                result = await self._animate(job_id, base_image, options, UPLOAD_STAGE_WEIGHTS, {})
+            job_service.update_job(job_id, profile=await profiling.finish_profile(session))
             
+            job_service.update_job(job_id, status=JobStatus.DONE, progress=1.0, result=result)
+        except Exception as e:
+            job_service.update_job(job_id, status=JobStatus.ERROR, error=str(e))
+
+    def _load_source(self, source: Union[bytes, str]) -> Image.Image:
+        if isinstance(source, bytes):
+            return self._processor.load_image(source)
+        with Image.open(source) as img:
+            return img.convert("RGB")
+
+    def _source_size(self, source: Union[bytes, str]) -> Tuple[int, int]:
+        # Image.open only parses the header, so sources can be grouped without decoding them.
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            return img.size
+
+    async def _process_video_batch(
+        self,
+        job_id: str,
+        sources: List[Tuple[str, Union[bytes, str]]],
+        options: VideoGenerationOptions,
+        micro_batch_size: int,
+        profile: bool = False,
+    ):
+        total = len(sources)
+        counts = {"video": 0, "encoding": 0}
+        stages: Dict[str, float] = {}
+
+        def _clip_done(stage: str) -> None:
+            counts[stage] += 1
+            self._report(job_id, BATCH_STAGE_WEIGHTS, stages, stage, counts[stage] / total)
+
+        clips: List[Optional[Dict[str, Any]]] = [None] * total
+        # Finished clips wait here for a fixed pool of encoders; SVD stalls while it is full, so decoded
+        # frames in memory are bounded by MAX_CONCURRENT_ENCODES rather than by the batch size.
+        pending: asyncio.Queue = asyncio.Queue(maxsize=MAX_CONCURRENT_ENCODES)
+
+        async def _encoder() -> None:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                index, frames = item
+                path = await self._processor.create_looped_video(
+                    frames=frames,
+                    fps=options.fps,
+                    duration_minutes=options.duration_minutes,
+                    job_id=f"{job_id}_{index:04d}",
+                )
+                item = frames = None
+                clips[index]["video_url"] = f"/files/{os.path.basename(path)}"
+                _clip_done("encoding")
+
+        encoders = [asyncio.create_task(_encoder()) for _ in range(MAX_CONCURRENT_ENCODES)]
+
+        async def _enqueue(item: Optional[Tuple[int, List[Image.Image]]]) -> None:
+            put = asyncio.ensure_future(pending.put(item))
+            while not put.done():
+                await asyncio.wait([put, *(t for t in encoders if not t.done())], return_when=asyncio.FIRST_COMPLETED)
+                # A failed encoder would leave the queue full forever; surface its error instead.
+                for task in encoders:
+                    if task.done() and task.exception() is not None:
+                        put.cancel()
+                        raise task.exception()
+
+        try:
+            session = profiling.start_profile("video_batch", profile)
+            with session or nullcontext():
+                job_service.update_job(job_id, status=JobStatus.LOADING)
+                with profiling.span("probe_sources"):
+                    sizes = [self._source_size(source) for _, source in sources]
+
+                job_service.update_job(job_id, status=JobStatus.GENERATING)
+                for (width, height), indices in self._manager.group_by_resolution(sizes).items():
+                    for start in range(0, len(indices), micro_batch_size):
+                        chunk = indices[start:start + micro_batch_size]
+                        # Decoded per micro-batch so only the images SVD is about to use are held in memory.
+                        with profiling.span("load_image"):
+                            images = [self._load_source(sources[i][1]) for i in chunk]
+                        batch_clips, width, height = await self._manager.img2vid_batch(
+                            images,
+                            num_frames=options.num_frames,
+                            fps=options.fps,
+                            motion_bucket_id=options.motion,
+                            noise_aug_strength=options.preserve_strength,
+                            seeds=[options.seed + i if options.seed is not None else None for i in chunk],
+                            enhance_quality=options.enhance_quality,
+                            interpolation_factor=options.interpolation_factor,
+                            loop_mode=options.loop_mode,
+                        )
+                        images = None
+                        # Clips are encoded while the next SVD batch is denoising, a few at a time.
+                        for i in chunk:
+                            clips[i] = {"index": i, "source": sources[i][0], "width": width, "height": height}
+                            _clip_done("video")
+                            await _enqueue((i, batch_clips.pop(0)))
+
+                job_service.update_job(job_id, status=JobStatus.ENCODING)
+                for _ in encoders:
+                    await _enqueue(None)
+                await asyncio.gather(*encoders)
+            job_service.update_job(job_id, profile=await profiling.finish_profile(session))
+
             job_service.update_job(
                 job_id,
                 status=JobStatus.DONE,
                 progress=1.0,
                 result={
-                    "video_path": output_path,
-                    "width": width,
-                    "height": height,
+                    "count": total,
                     "fps": options.fps,
                     "duration_minutes": options.duration_minutes,
-                }
+                    "clips": clips,
+                },
             )
         except Exception as e:
             job_service.update_job(job_id, status=JobStatus.ERROR, error=str(e))
+        finally:
+            for task in encoders:
+                task.cancel()
+
+    async def _process_prompt_loop(self, job_id: str, request: TextToLoopRequest, profile: bool = False):
+        stages: Dict[str, float] = {}
+        try:
+            session = profiling.start_profile("text_to_loop", profile)
+            with session or nullcontext():
+                job_service.update_job(job_id, status=JobStatus.GENERATING)
+                self._report(job_id, PROMPT_STAGE_WEIGHTS, stages, "image", 0.0)
+                item = request.image
+                out = await image_manager.infer(
+                    prompt=enhance_prompt(item.prompt, item.style),
+                    negative_prompt=item.negative_prompt or DEFAULT_NEGATIVE,
+                    num_inference_steps=min(item.num_inference_steps, 120),
+                    guidance_scale=item.guidance_scale,
+                    width=item.width,
+                    height=item.height,
+                    seed=item.seed,
+                )
+                self._report(job_id, PROMPT_STAGE_WEIGHTS, stages, "image", 1.0)
+
+                # The keyframe is handed to SVD as the in-memory PIL image; nothing is encoded or re-read.
+                result = await self._animate(job_id, out["image"], request.video, PROMPT_STAGE_WEIGHTS, stages)
+            job_service.update_job(job_id, profile=await profiling.finish_profile(session))
+
+            result["image"] = {
+                "prompt": out.get("prompt"),
+                "seed": out.get("seed"),
+                "width": item.width,
+                "height": item.height,
+            }
+            job_service.update_job(job_id, status=JobStatus.DONE, progress=1.0, result=result)
+        except Exception as e:
+            job_service.update_job(job_id, status=JobStatus.ERROR, error=str(e))
 
 
 generator = VideoGenerator()
 
 
+def _video_options(**kwargs) -> VideoGenerationOptions:
+    try:
+        return VideoGenerationOptions(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
 @router.post("/generate_loop_from_upload", dependencies=[Depends(require_api_key)])
 async def generate_video(
     file: UploadFile = File(...),
@@ -84,11 +301,14 @@ async def generate_video(
     fps: int = Query(24, ge=8, le=30),
     motion: int = Query(96, ge=0, le=255),
     preserve_strength: float = Query(0.02, ge=0.0, le=1.0),
-    num_frames: int = Query(24, ge=14, le=25),
+    num_frames: int = Query(24, ge=14, le=97),
     enhance_quality: bool = Query(True),
     seed: Optional[int] = Query(1234),
+    interpolation_factor: int = Query(1, ge=1, le=4),
+    loop_mode: str = Query("mirror", pattern="^(mirror|flow)$"),
+    profile_flag: bool = Depends(profile_requested),
 ):
-    options = VideoGenerationOptions(
+    options = _video_options(
         duration_minutes=duration_minutes,
         fps=fps,
         motion=motion,
@@ -96,10 +316,12 @@ async def generate_video(
         num_frames=num_frames,
         enhance_quality=enhance_quality,
         seed=seed,
+        interpolation_factor=interpolation_factor,
+        loop_mode=loop_mode,
     )
     
     content = await file.read()
-    job_id = await generator.generate_async(content, options)
+    job_id = await generator.generate_async(content, options, profile_flag)
     
     return JSONResponse(
         status_code=202,
@@ -113,6 +335,88 @@ async def generate_video(
     )
 
 
+@router.post("/generate_loops_batch", dependencies=[Depends(require_api_key)])
+async def generate_video_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    batch_id: Optional[str] = Form(None),
+    names: Optional[str] = Form(None),
+    duration_minutes: float = Query(30.0, ge=0.1, le=240.0),
+    fps: int = Query(24, ge=8, le=30),
+    motion: int = Query(96, ge=0, le=255),
+    preserve_strength: float = Query(0.02, ge=0.0, le=1.0),
+    num_frames: int = Query(24, ge=14, le=97),
+    enhance_quality: bool = Query(True),
+    seed: Optional[int] = Query(1234),
+    interpolation_factor: int = Query(1, ge=1, le=4),
+    loop_mode: str = Query("mirror", pattern="^(mirror|flow)$"),
+    micro_batch_size: int = Query(2, ge=1, le=16),
+    profile_flag: bool = Depends(profile_requested),
+):
+    sources: List[Tuple[str, Union[bytes, str]]] = []
+    for upload in files or []:
+        sources.append((upload.filename or f"upload_{len(sources)}", await upload.read()))
+
+    if batch_id:
+        if batch_id in (".", "..") or os.path.basename(batch_id) != batch_id:
+            raise HTTPException(status_code=400, detail="Invalid batch id")
+        batch_dir = os.path.join(get_settings().output_dir, "batches", batch_id)
+        if not os.path.isdir(batch_dir):
+            raise HTTPException(status_code=404, detail="Batch not found")
+        available = BatchArchiver(batch_dir).list_images()
+        selected = [n.strip() for n in names.split(",") if n.strip()] if names else available
+        missing = [n for n in selected if n not in available]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Images not found in batch: {', '.join(missing[:10])}")
+        sources.extend((f"{batch_id}/{n}", os.path.join(batch_dir, n)) for n in selected)
+
+    if not sources:
+        raise HTTPException(status_code=400, detail="Provide files or a batch_id")
+
+    options = _video_options(
+        duration_minutes=duration_minutes,
+        fps=fps,
+        motion=motion,
+        preserve_strength=preserve_strength,
+        num_frames=num_frames,
+        enhance_quality=enhance_quality,
+        seed=seed,
+        interpolation_factor=interpolation_factor,
+        loop_mode=loop_mode,
+    )
+    job_id = await generator.generate_batch_async(sources, options, micro_batch_size, profile_flag)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "job_id": job_id,
+            "count": len(sources),
+            "status": "queued",
+            "status_url": f"/api/video/job/{job_id}",
+            "poll_interval_s": 2,
+        },
+    )
+
+
+@router.post("/generate_loop_from_prompt", dependencies=[Depends(require_api_key)])
+async def generate_loop_from_prompt(
+    request: TextToLoopRequest,
+    profile_flag: bool = Depends(profile_requested),
+):
+    job_id = await generator.generate_from_prompt_async(request, profile_flag)
+
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/api/video/job/{job_id}",
+            "poll_interval_s": 2,
+        },
+    )
+
+
 @router.get("/job/{job_id}")
 async def get_job_status(job_id: str):
     job = job_service.get_job(job_id)
@@ -124,18 +428,30 @@ async def get_job_status(job_id: str):
         "status": job["status"],
         "progress": job["progress"],
         "error": job.get("error"),
+        "stage": job.get("stage"),
+        "stages": job.get("stages"),
+        "profile": job.get("profile"),
     }
     
     if job["status"] == JobStatus.DONE and job.get("result"):
         result = job["result"]
-        filename = os.path.basename(result["video_path"])
-        response.update({
-            "video_url": f"/files/{filename}",
-            "fps": result["fps"],
-            "duration_minutes": result["duration_minutes"],
-            "width": result["width"],
-            "height": result["height"],
-        })
+        if "clips" in result:
+            response.update({
+                "fps": result["fps"],
+                "duration_minutes": result["duration_minutes"],
+                "count": result["count"],
+                "clips": result["clips"],
+            })
+        else:
+            filename = os.path.basename(result["video_path"])
+            response.update({
+                "video_url": f"/files/{filename}",
+                "fps": result["fps"],
+                "duration_minutes": result["duration_minutes"],
+                "width": result["width"],
+                "height": result["height"],
+                "image": result.get("image"),
+            })
     
     return JSONResponse(content=response, headers={"Cache-Control": "no-store"})
 
@@ -1,9 +1,11 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import Field, validator
 from typing import Optional
 from functools import lru_cache
 import os
 
+TEXT_ENCODER_MODES = ("default", "int8", "offload", "no_t5")
+
 
 class Settings(BaseSettings):
     hf_token: Optional[str] = Field(None, env="HF_TOKEN")
@@ -22,6 +24,48 @@ class Settings(BaseSettings):
     cuda_alloc_conf: str = Field("max_split_size_mb:512,expandable_segments:True", env="PYTORCH_CUDA_ALLOC_CONF")
     max_concurrent_image: int = Field(1, env="MAX_CONCURRENT_IMAGE")
 
+    continuous_batching: bool = Field(False, env="CONTINUOUS_BATCHING")
+    engine_max_batch_size: int = Field(8, env="ENGINE_MAX_BATCH_SIZE")
+
+    attention_backend: str = Field("auto", env="ATTENTION_BACKEND")
+    attention_chunk_size: int = Field(1024, env="ATTENTION_CHUNK_SIZE")
+    attention_memory_budget_mb: int = Field(0, env="ATTENTION_MEMORY_BUDGET_MB")
+
+    text_encoder_mode: str = Field("default", env="TEXT_ENCODER_MODE")
+
+    compute_budget_seconds: float = Field(0.0, env="COMPUTE_BUDGET_SECONDS")
+    compute_budget_window_s: int = Field(3600, env="COMPUTE_BUDGET_WINDOW_S")
+
+    profile_sample_rate: float = Field(0.0, env="PROFILE_SAMPLE_RATE")
+
+    job_ttl_seconds: int = Field(86400, env="JOB_TTL_SECONDS")
+    draft_ttl_seconds: int = Field(86400, env="DRAFT_TTL_SECONDS")
+    cleanup_interval_seconds: int = Field(600, env="CLEANUP_INTERVAL_SECONDS")
+
+    model_backend: str = Field("sd3", env="MODEL_BACKEND")
+    stub_step_latency_ms: float = Field(20.0, env="STUB_STEP_LATENCY_MS")
+    stub_batch_overhead_ms: float = Field(50.0, env="STUB_BATCH_OVERHEAD_MS")
+    stub_load_seconds: float = Field(0.0, env="STUB_LOAD_SECONDS")
+
+    engine_address: Optional[str] = Field(None, env="ENGINE_ADDRESS")
+    engine_authkey: Optional[str] = Field(None, env="ENGINE_AUTHKEY")
+
+    cluster_nodes: str = Field("", env="CLUSTER_NODES")
+    cluster_api_key: Optional[str] = Field(None, env="CLUSTER_API_KEY")
+    cluster_min_items: int = Field(64, env="CLUSTER_MIN_ITEMS")
+    cluster_max_shard_size: int = Field(256, env="CLUSTER_MAX_SHARD_SIZE")
+    cluster_node_inflight: int = Field(2, env="CLUSTER_NODE_INFLIGHT")
+    cluster_max_attempts: int = Field(3, env="CLUSTER_MAX_ATTEMPTS")
+    cluster_poll_interval: float = Field(1.0, env="CLUSTER_POLL_INTERVAL")
+    coordinator_url: Optional[str] = Field(None, env="COORDINATOR_URL")
+    node_url: Optional[str] = Field(None, env="NODE_URL")
+
+    @validator("text_encoder_mode")
+    def validate_text_encoder_mode(cls, v):
+        if v not in TEXT_ENCODER_MODES:
+            raise ValueError(f"TEXT_ENCODER_MODE must be one of {', '.join(TEXT_ENCODER_MODES)}")
+        return v
+
     class Config:
         env_file = ".env"
         case_sensitive = False
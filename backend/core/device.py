@@ -1,3 +1,4 @@
+import os
 import torch
 from typing import Literal
 
@@ -18,6 +19,22 @@ class DeviceManager:
             return torch.float16
         return torch.float32
     
+    @staticmethod
+    def available_memory_bytes(device: DeviceType) -> int:
+        if device == "cuda":
+            free, _ = torch.cuda.mem_get_info()
+            return int(free)
+        try:
+            return int(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+        except (ValueError, OSError, AttributeError):
+            return 4 * 1024 ** 3
+
+    @staticmethod
+    def device_name(device: DeviceType) -> str:
+        if device == "cuda":
+            return f"cuda:{torch.cuda.get_device_name()}"
+        return device
+
     @staticmethod
     def setup_cuda_optimizations() -> None:
         if torch.cuda.is_available():
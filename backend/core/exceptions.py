@@ -22,4 +22,12 @@ class GenerationError(BaseAPIException):
 
 class ValidationError(BaseAPIException):
     def __init__(self, message: str):
-        super().__init__(message, status_code=400)
\ No newline at end of file
+        super().__init__(message, status_code=400)
+
+class GenerationCancelled(BaseAPIException):
+    def __init__(self, message: str = "Generation cancelled"):
+        super().__init__(message, status_code=409)
+
+class AdmissionRejected(BaseAPIException):
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message, status_code=status_code, details={"retry_after": retry_after})
\ No newline at end of file
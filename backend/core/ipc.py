@@ -0,0 +1,87 @@
+from multiprocessing import shared_memory, resource_tracker
+import os
+from typing import IO, Dict, Any, List, Optional, Tuple, Union
+import numpy as np
+from PIL import Image
+
+Address = Union[str, Tuple[str, int]]
+
+# Results come back through shared memory, so the engine is only reachable from the same host.
+LOOPBACK_HOSTS = {"127.0.0.1", "localhost", "::1", "[::1]"}
+
+
+def parse_address(address: str) -> Address:
+    if ":" in address and not address.startswith("/"):
+        host, port = address.rsplit(":", 1)
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError(f"ENGINE_ADDRESS must be a unix socket path or a loopback host:port, got {address!r}")
+        return host.strip("[]"), int(port)
+    return address
+
+
+def engine_authkey(authkey: Optional[str]) -> bytes:
+    # The connection unpickles every message, so an engine must never listen with a guessable key.
+    if not authkey:
+        raise ValueError("ENGINE_AUTHKEY must be set when ENGINE_ADDRESS is used")
+    return authkey.encode("utf-8")
+
+
+def lock_web_process(path: str) -> IO[str]:
+    # Jobs, admission budgets and the cost model live in the web process, so a second one would split them.
+    import fcntl
+    handle = open(path, "a")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        raise RuntimeError(
+            f"Another web process already serves {os.path.dirname(path)}; run one web worker per OUTPUT_DIR"
+        )
+    return handle
+
+
+def restrict_socket(address: Address) -> None:
+    if isinstance(address, str) and os.path.exists(address):
+        os.chmod(address, 0o600)
+
+
+def export_images(images: List[Image.Image]) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    arrays = [np.asarray(img.convert("RGB"), dtype=np.uint8) for img in images]
+    total = sum(a.nbytes for a in arrays)
+    if total == 0:
+        return None, []
+
+    block = shared_memory.SharedMemory(create=True, size=total)
+    specs: List[Dict[str, Any]] = []
+    offset = 0
+    for arr in arrays:
+        view = np.ndarray(arr.shape, dtype=np.uint8, buffer=block.buf, offset=offset)
+        view[:] = arr
+        del view
+        specs.append({"offset": offset, "width": int(arr.shape[1]), "height": int(arr.shape[0])})
+        offset += arr.nbytes
+
+    # Ownership passes to the reader, which unlinks the block once it has copied the pixels out.
+    resource_tracker.unregister(block._name, "shared_memory")
+    name = block.name
+    block.close()
+    return name, specs
+
+
+def import_images(name: Optional[str], specs: List[Dict[str, Any]]) -> List[Image.Image]:
+    if name is None:
+        return []
+    block = shared_memory.SharedMemory(name=name)
+    images: List[Image.Image] = []
+    try:
+        for spec in specs:
+            width, height = spec["width"], spec["height"]
+            chunk = block.buf[spec["offset"]:spec["offset"] + width * height * 3]
+            try:
+                images.append(Image.frombytes("RGB", (width, height), chunk))
+            finally:
+                chunk.release()
+    finally:
+        block.close()
+        block.unlink()
+    return images
@@ -0,0 +1,165 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import torch
+
+from .config import get_settings
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+_current: contextvars.ContextVar[Optional["Profile"]] = contextvars.ContextVar("profile", default=None)
+
+# Only one torch.profiler session can run in the process, so concurrent captures fall back to
+# wall-clock spans only.
+_torch_lock = threading.Lock()
+
+
+class Profile:
+    def __init__(self, name: str, output_dir: str, record_shapes: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.output_dir = output_dir
+        self.record_shapes = record_shapes
+        self.spans: List[Dict[str, Any]] = []
+        self.torch_enabled = False
+        self._lock = threading.Lock()
+        self._capture_lock = threading.Lock()
+        self._traces: List[str] = []
+        self._token: Optional[contextvars.Token] = None
+        self._origin_ns = 0
+
+    def __enter__(self) -> "Profile":
+        self.torch_enabled = _torch_lock.acquire(blocking=False)
+        self._origin_ns = time.perf_counter_ns()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._token)
+        if self.torch_enabled:
+            _torch_lock.release()
+
+    @contextmanager
+    def capture(self) -> Iterator[None]:
+        # The profiler's CPU callbacks are thread-local, so it runs on the worker thread doing the model work.
+        if not self.torch_enabled or not self._capture_lock.acquire(blocking=False):
+            yield
+            return
+        try:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            profiler = torch.profiler.profile(activities=activities, record_shapes=self.record_shapes)
+            try:
+                profiler.__enter__()
+            except Exception as e:
+                logger.warning(f"torch profiler unavailable, recording spans only: {e}")
+                self.torch_enabled = False
+                yield
+                return
+            try:
+                yield
+            finally:
+                profiler.__exit__(None, None, None)
+                os.makedirs(self.output_dir, exist_ok=True)
+                raw = os.path.join(self.output_dir, f"{self.name}_{self.id}.{len(self._traces)}.torch")
+                profiler.export_chrome_trace(raw)
+                self._traces.append(raw)
+        finally:
+            self._capture_lock.release()
+
+    def add_span(self, name: str, start_ns: int, end_ns: int) -> None:
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "ph": "X",
+                "cat": "span",
+                "pid": f"{self.name} spans",
+                "tid": threading.current_thread().name,
+                "ts": (start_ns - self._origin_ns) / 1000,
+                "dur": (end_ns - start_ns) / 1000,
+            })
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"count": 0, "total_ms": 0.0})
+        for s in self.spans:
+            totals[s["name"]]["count"] += 1
+            totals[s["name"]]["total_ms"] += s["dur"] / 1000
+        return {k: {"count": v["count"], "total_ms": round(v["total_ms"], 2)} for k, v in totals.items()}
+
+    def save(self) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{self.name}_{self.id}.json")
+        trace: Dict[str, Any] = {"traceEvents": []}
+        for raw in self._traces:
+            with open(raw, "r", encoding="utf-8") as f:
+                session = json.load(f)
+            os.remove(raw)
+            trace["traceEvents"].extend(session.get("traceEvents", []))
+            trace.update({k: v for k, v in session.items() if k != "traceEvents" and k not in trace})
+        trace["traceEvents"].extend(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+        return path
+
+
+def should_profile(requested: bool) -> bool:
+    rate = get_settings().profile_sample_rate
+    return requested or (rate > 0 and random.random() < rate)
+
+
+def start_profile(name: str, requested: bool) -> Optional[Profile]:
+    if not should_profile(requested):
+        return None
+    # Shapes bloat long traces, so only explicitly requested captures record them, not sampled ones.
+    return Profile(name, os.path.join(get_settings().output_dir, "profiles"), record_shapes=requested)
+
+
+async def finish_profile(profile: Optional[Profile]) -> Optional[Dict[str, Any]]:
+    if profile is None:
+        return None
+    loop = asyncio.get_running_loop()
+    try:
+        path = await loop.run_in_executor(None, profile.save)
+    except Exception as e:
+        logger.error(f"Failed to save profile {profile.id}: {e}")
+        return None
+    rel = os.path.relpath(path, get_settings().output_dir).replace("\\", "/")
+    return {"trace_url": f"/files/{rel}", "torch": bool(profile._traces), "spans": profile.summary()}
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter_ns()
+    with torch.profiler.record_function(name):
+        try:
+            yield
+        finally:
+            profile.add_span(name, start, time.perf_counter_ns())
+
+
+def in_context(fn: Callable) -> Callable:
+    # run_in_executor does not carry context variables into worker threads.
+    ctx = contextvars.copy_context()
+    profile = ctx.get(_current)
+    if profile is None:
+        return functools.partial(ctx.run, fn)
+
+    def _captured(*args, **kwargs):
+        with profile.capture():
+            return fn(*args, **kwargs)
+    return functools.partial(ctx.run, _captured)
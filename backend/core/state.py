@@ -1,9 +1,16 @@
-from ..models.image_model import ImageModelManager
 from .config import get_settings
 
 settings = get_settings()
 
-image_manager = ImageModelManager(hf_token=settings.hf_token)
+if settings.model_backend == "stub":
+    from ..models.stub_model import StubImageModelManager
+    image_manager = StubImageModelManager(hf_token=settings.hf_token)
+elif settings.engine_address:
+    from ..models.remote_model import RemoteImageModelManager
+    image_manager = RemoteImageModelManager(settings.engine_address, settings.engine_authkey, hf_token=settings.hf_token)
+else:
+    from ..models.image_model import ImageModelManager
+    image_manager = ImageModelManager(hf_token=settings.hf_token)
 
 # TODO disabling video until it is polished
-# video_manager = VideoModelManager(hf_token=settings.hf_token)
\ No newline at end of file
+# video_manager = VideoModelManager(hf_token=settings.hf_token)
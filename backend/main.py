@@ -2,12 +2,17 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import os
 
 from .core.config import get_settings
 from .core.logging import setup_logging
-from .api.routers import image, system
+from .api.routers import image, system, cluster
 from .services.warmup_service import warmup_service
+from .services.cluster import announce
+from .services.retention import run_cleanup
+from .services.cost_model import cost_model
+from .core.ipc import lock_web_process
 
 
 @asynccontextmanager
@@ -15,12 +20,26 @@ async def lifespan(app: FastAPI):
     settings = get_settings()
     settings.setup_environment()
     setup_logging()
+    web_lock = lock_web_process(os.path.join(settings.output_dir, ".web.lock"))
     
     if settings.auto_warmup:
         await warmup_service.ensure_warmup_started()
-    
+
+    cleanup = asyncio.create_task(run_cleanup())
+    announcer = None
+    if settings.coordinator_url and settings.node_url:
+        announcer = asyncio.create_task(
+            announce(settings.coordinator_url, settings.node_url, settings.cluster_api_key or settings.api_key)
+        )
+
     yield
 
+    cleanup.cancel()
+    if announcer is not None:
+        announcer.cancel()
+    cost_model.flush()
+    web_lock.close()
+
 
 app = FastAPI(
     title="AI Image Generation Service",
@@ -45,6 +64,7 @@ app.mount("/files", StaticFiles(directory=settings.output_dir), name="files")
 
 app.include_router(image.router)
 app.include_router(system.router)
+app.include_router(cluster.router)
 
 if settings.enable_video:
     from .api.routers import video
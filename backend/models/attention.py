@@ -0,0 +1,137 @@
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+import torch
+import torch.nn.functional as F
+
+try:
+    from torch.nn.attention import sdpa_kernel, SDPBackend
+    HAS_SDPA_KERNEL = True
+except ImportError:
+    HAS_SDPA_KERNEL = False
+
+ATTENTION_BACKENDS = ("auto", "default", "chunked", "sdpa_efficient")
+
+# CLIP (77) + T5 (256) tokens joined to the image tokens in every SD3 attention call.
+TEXT_TOKENS = 77 + 256
+
+
+class ChunkedJointAttnProcessor:
+    def __init__(self, chunk_size: int = 1024):
+        self.chunk_size = max(1, chunk_size)
+
+    def _heads(self, attn: Any, x: torch.Tensor, batch_size: int, head_dim: int) -> torch.Tensor:
+        return x.view(batch_size, -1, attn.heads, head_dim).transpose(1, 2)
+
+    def __call__(
+        self,
+        attn: Any,
+        hidden_states: torch.Tensor,
+        encoder_hidden_states: Optional[torch.Tensor] = None,
+        attention_mask: Optional[torch.Tensor] = None,
+        *args,
+        **kwargs,
+    ):
+        residual = hidden_states
+        batch_size = hidden_states.shape[0]
+
+        query = attn.to_q(hidden_states)
+        key = attn.to_k(hidden_states)
+        value = attn.to_v(hidden_states)
+        head_dim = key.shape[-1] // attn.heads
+        query = self._heads(attn, query, batch_size, head_dim)
+        key = self._heads(attn, key, batch_size, head_dim)
+        value = self._heads(attn, value, batch_size, head_dim)
+        if getattr(attn, "norm_q", None) is not None:
+            query = attn.norm_q(query)
+        if getattr(attn, "norm_k", None) is not None:
+            key = attn.norm_k(key)
+
+        if encoder_hidden_states is not None:
+            ctx_query = self._heads(attn, attn.add_q_proj(encoder_hidden_states), batch_size, head_dim)
+            ctx_key = self._heads(attn, attn.add_k_proj(encoder_hidden_states), batch_size, head_dim)
+            ctx_value = self._heads(attn, attn.add_v_proj(encoder_hidden_states), batch_size, head_dim)
+            if getattr(attn, "norm_added_q", None) is not None:
+                ctx_query = attn.norm_added_q(ctx_query)
+            if getattr(attn, "norm_added_k", None) is not None:
+                ctx_key = attn.norm_added_k(ctx_key)
+            query = torch.cat([query, ctx_query], dim=2)
+            key = torch.cat([key, ctx_key], dim=2)
+            value = torch.cat([value, ctx_value], dim=2)
+
+        # Only a chunk of query rows attends at a time, so the score matrix is chunk x tokens.
+        out = torch.empty_like(query)
+        for start in range(0, query.shape[2], self.chunk_size):
+            end = start + self.chunk_size
+            out[:, :, start:end] = F.scaled_dot_product_attention(
+                query[:, :, start:end], key, value, dropout_p=0.0, is_causal=False
+            )
+        hidden_states = out.transpose(1, 2).reshape(batch_size, -1, attn.heads * head_dim).to(query.dtype)
+
+        if encoder_hidden_states is not None:
+            hidden_states, encoder_hidden_states = (
+                hidden_states[:, :residual.shape[1]],
+                hidden_states[:, residual.shape[1]:],
+            )
+            if not attn.context_pre_only:
+                encoder_hidden_states = attn.to_add_out(encoder_hidden_states)
+
+        hidden_states = attn.to_out[0](hidden_states)
+        hidden_states = attn.to_out[1](hidden_states)
+        if encoder_hidden_states is not None:
+            return hidden_states, encoder_hidden_states
+        return hidden_states
+
+
+def image_tokens(width: int, height: int, vae_scale_factor: int = 8, patch_size: int = 2) -> int:
+    return (height // (vae_scale_factor * patch_size)) * (width // (vae_scale_factor * patch_size))
+
+
+def score_bytes(tokens: int, query_rows: int, batch_size: int, heads: int, dtype_bytes: int) -> int:
+    # CFG runs the conditional and unconditional branches in one batch.
+    return 2 * batch_size * heads * query_rows * tokens * dtype_bytes
+
+
+def select_backend(
+    requested: str,
+    device: str,
+    tokens: int,
+    batch_size: int,
+    heads: int,
+    dtype_bytes: int,
+    budget_bytes: int,
+) -> str:
+    if requested != "auto":
+        return requested
+    if score_bytes(tokens, tokens, batch_size, heads, dtype_bytes) <= budget_bytes:
+        return "default"
+    if device == "cuda" and HAS_SDPA_KERNEL:
+        return "sdpa_efficient"
+    return "chunked"
+
+
+def chunk_size_for(
+    max_chunk: int,
+    tokens: int,
+    batch_size: int,
+    heads: int,
+    dtype_bytes: int,
+    budget_bytes: int,
+) -> int:
+    per_row = score_bytes(tokens, 1, batch_size, heads, dtype_bytes)
+    return max(64, min(max_chunk, budget_bytes // max(1, per_row)))
+
+
+@contextmanager
+def attention_backend(transformer: Any, backend: str, chunk_size: int) -> Iterator[None]:
+    if backend == "chunked":
+        original = transformer.attn_processors
+        transformer.set_attn_processor(ChunkedJointAttnProcessor(chunk_size))
+        try:
+            yield
+        finally:
+            transformer.set_attn_processor(original)
+    elif backend == "sdpa_efficient" and HAS_SDPA_KERNEL:
+        with sdpa_kernel([SDPBackend.EFFICIENT_ATTENTION, SDPBackend.FLASH_ATTENTION]):
+            yield
+    else:
+        yield
@@ -9,6 +9,8 @@ from ..core.config import get_settings
 
 
 class BaseModelManager(ABC):
+    supports_previews = True
+
     def __init__(self, hf_token: Optional[str] = None):
         self.pipe: Optional[Any] = None
         self.hf_token = hf_token
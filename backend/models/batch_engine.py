@@ -0,0 +1,261 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Deque, Tuple, Callable
+import torch
+from PIL import Image
+
+from ..core.exceptions import GenerationError, GenerationCancelled
+from ..core.logging import get_logger
+from . import sd3_ops
+from .latent_preview import latents_to_previews
+
+
+@dataclass
+class _Sample:
+    prompt: str
+    negative_prompt: Optional[str]
+    num_inference_steps: int
+    guidance_scale: float
+    width: int
+    height: int
+    seed: Optional[int]
+    future: asyncio.Future
+    preview_every: int = 0
+    on_preview: Optional[Callable[[int, Image.Image], None]] = None
+    should_cancel: Optional[Callable[[], bool]] = None
+    guidance_cutoff: float = 1.0
+    scheduler: Any = None
+    latents: Optional[torch.Tensor] = None
+    prompt_embeds: Optional[torch.Tensor] = None
+    pooled: Optional[torch.Tensor] = None
+    negative_embeds: Optional[torch.Tensor] = None
+    negative_pooled: Optional[torch.Tensor] = None
+    step: int = 0
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    @property
+    def finished(self) -> bool:
+        return self.scheduler is not None and self.step >= len(self.scheduler.timesteps)
+
+    @property
+    def cfg_steps(self) -> int:
+        return sd3_ops.cfg_steps(self.num_inference_steps, self.guidance_scale, self.guidance_cutoff)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.should_cancel is not None and self.should_cancel()
+
+    @property
+    def preview_due(self) -> bool:
+        return (
+            self.on_preview is not None
+            and self.preview_every > 0
+            and not self.finished
+            and self.step % self.preview_every == 0
+        )
+
+    def release(self) -> None:
+        self.latents = None
+        self.prompt_embeds = self.pooled = None
+        self.negative_embeds = self.negative_pooled = None
+
+
+class ContinuousBatchEngine:
+    def __init__(self, manager: Any, semaphore: asyncio.Semaphore, max_batch_size: int = 8):
+        self._manager = manager
+        self._sem = semaphore
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: Deque[_Sample] = deque()
+        self._running: List[_Sample] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.logger = get_logger(self.__class__.__name__)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {"running": len(self._running), "pending": len(self._pending), "capacity": self.max_batch_size}
+
+    async def submit(
+        self,
+        *,
+        prompt: str,
+        negative_prompt: Optional[str],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seed: Optional[int] = None,
+        preview_every: int = 0,
+        on_preview: Optional[Callable[[int, Image.Image], None]] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        guidance_cutoff: float = 1.0,
+    ) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        sample = _Sample(
+            prompt=prompt,
+            negative_prompt=negative_prompt,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            width=width,
+            height=height,
+            seed=seed,
+            future=loop.create_future(),
+            preview_every=preview_every,
+            on_preview=on_preview,
+            should_cancel=should_cancel,
+            guidance_cutoff=guidance_cutoff,
+        )
+        self._pending.append(sample)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return await sample.future
+
+    def _admit(self) -> List[_Sample]:
+        # Samples join at step boundaries; latents must share a shape to be batched.
+        if self._running:
+            shape = self._running[0].shape
+        elif self._pending:
+            shape = self._pending[0].shape
+        else:
+            return []
+
+        free = self.max_batch_size - len(self._running)
+        admitted: List[_Sample] = []
+        skipped: Deque[_Sample] = deque()
+        while self._pending and len(admitted) < free:
+            sample = self._pending.popleft()
+            if sample.future.done():
+                continue
+            if sample.cancelled:
+                sample.future.set_exception(GenerationCancelled())
+                continue
+            if sample.shape == shape:
+                admitted.append(sample)
+            else:
+                skipped.append(sample)
+        skipped.extend(self._pending)
+        self._pending = skipped
+        return admitted
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            for sample in self._running:
+                if sample.cancelled and not sample.future.done():
+                    sample.release()
+                    sample.future.set_exception(GenerationCancelled())
+            admitted = self._admit()
+            batch = [s for s in self._running if not s.future.done()] + admitted
+            if not batch:
+                self._running = []
+                self._wakeup.clear()
+                if not self._pending:
+                    await self._wakeup.wait()
+                continue
+
+            if admitted:
+                self.logger.info(
+                    f"ENGINE admit {len(admitted)} | running={len(batch)} pending={len(self._pending)} | "
+                    f"{batch[0].width}x{batch[0].height}"
+                )
+
+            try:
+                async with self._sem:
+                    done = await loop.run_in_executor(None, self._step, admitted, batch)
+            except Exception as e:
+                self.logger.error(f"Engine step failed: {e}")
+                for sample in batch:
+                    sample.release()
+                    if not sample.future.done():
+                        sample.future.set_exception(GenerationError(f"Engine step failed: {e}"))
+                self._running = []
+                continue
+
+            self._running = [s for s in batch if not s.finished]
+            for sample, out in done:
+                if not sample.future.done():
+                    sample.future.set_result(out)
+
+    def _prefill(self, pipe: Any, samples: List[_Sample]) -> None:
+        device = self._manager.device
+        prompt_embeds, pooled, negative_embeds, negative_pooled = self._manager.encode_prompts(
+            [s.prompt for s in samples], [s.negative_prompt for s in samples]
+        )
+        for i, sample in enumerate(samples):
+            sample.prompt_embeds = prompt_embeds[i:i + 1]
+            sample.pooled = pooled[i:i + 1]
+            sample.negative_embeds = negative_embeds[i:i + 1]
+            sample.negative_pooled = negative_pooled[i:i + 1]
+            sample.scheduler = sd3_ops.make_scheduler(
+                pipe, sample.num_inference_steps, sample.width, sample.height, device
+            )
+            generator = None
+            if sample.seed is not None:
+                generator = torch.Generator(device=device).manual_seed(int(sample.seed))
+            sample.latents = sd3_ops.initial_latents(
+                pipe, generator, sample.width, sample.height, device, prompt_embeds.dtype
+            )
+
+    def _step(self, admitted: List[_Sample], batch: List[_Sample]) -> List[Tuple[_Sample, Dict[str, Any]]]:
+        pipe = self._manager.pipe
+        with torch.inference_mode():
+            if admitted:
+                self._prefill(pipe, admitted)
+
+            latents = torch.cat([s.latents for s in batch])
+            timesteps = torch.stack([s.scheduler.timesteps[s.step] for s in batch])
+            guidance = torch.tensor(
+                [sd3_ops.effective_guidance(s.guidance_scale) for s in batch],
+                device=latents.device,
+                dtype=latents.dtype,
+            )
+            # Samples sharing a step can sit on either side of their guidance cutoff.
+            cfg = torch.tensor([s.step < s.cfg_steps for s in batch], device=latents.device)
+            with self._manager.attention(batch[0].width, batch[0].height, len(batch)) as attn_backend:
+                noise = sd3_ops.predict_noise(
+                    pipe.transformer,
+                    latents,
+                    timesteps,
+                    torch.cat([s.prompt_embeds for s in batch]),
+                    torch.cat([s.pooled for s in batch]),
+                    torch.cat([s.negative_embeds for s in batch]),
+                    torch.cat([s.negative_pooled for s in batch]),
+                    guidance,
+                    cfg,
+                )
+
+            for i, sample in enumerate(batch):
+                t = sample.scheduler.timesteps[sample.step]
+                stepped = sample.scheduler.step(noise[i:i + 1], t, sample.latents, return_dict=False)[0]
+                sample.latents = stepped.to(latents.dtype)
+                sample.step += 1
+
+            due = [s for s in batch if s.preview_due]
+            if due:
+                previews = latents_to_previews(torch.cat([s.latents for s in due]))
+                for sample, preview in zip(due, previews):
+                    sample.on_preview(sample.step, preview)
+
+            finished = [s for s in batch if s.finished]
+            if not finished:
+                return []
+
+            images = sd3_ops.decode_latents(pipe, torch.cat([s.latents for s in finished]))
+            done = []
+            for sample, image in zip(finished, images):
+                done.append((sample, {
+                    "image": image,
+                    "warnings": [],
+                    "prompt": sample.prompt,
+                    "negative_prompt": sample.negative_prompt,
+                    "seed": sample.seed,
+                    "attention_backend": attn_backend,
+                    "cfg_steps": sample.cfg_steps,
+                }))
+                sample.release()
+            return done
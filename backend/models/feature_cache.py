@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import torch
+
+# Early steps lay out the composition and move fast, so they always run every block.
+WARMUP_STEPS = 3
+
+
+class FeatureCache:
+    # Reuses the residual of a contiguous span of deep transformer blocks across steps.
+    def __init__(self, transformer: Any, interval: int, depth: float, warmup: int = WARMUP_STEPS):
+        blocks = transformer.transformer_blocks
+        n = len(blocks)
+        span = max(1, min(n - 1, round(depth * (n - 1))))
+        # The final block is context-pre-only and feeds the output projection, so it always runs.
+        self.first, self.last = n - 1 - span, n - 2
+        self.span = span
+        self.num_blocks = n
+        self.transformer = transformer
+        self.interval = max(1, interval)
+        self.warmup = warmup
+        self.step = -1
+        self.reusing = False
+        self.computed_steps = 0
+        self.reused_steps = 0
+        self._inputs: Optional[Tuple[torch.Tensor, torch.Tensor]] = None
+        self._delta: Optional[Tuple[torch.Tensor, torch.Tensor]] = None
+        self._hook = None
+
+    def _on_step(self, module: Any, args: Any) -> None:
+        # Every transformer call is one denoising step; CFG runs both branches in the same call.
+        self.step += 1
+        self.reusing = (
+            self._delta is not None
+            and self.step >= self.warmup
+            and (self.step - self.warmup) % self.interval != 0
+        )
+        if self.reusing:
+            self.reused_steps += 1
+        else:
+            self.computed_steps += 1
+
+    def _wrap(self, index: int, original: Callable) -> Callable:
+        def forward(hidden_states, encoder_hidden_states, temb, *args, **kwargs):
+            if self.reusing and self._delta[1].shape == hidden_states.shape:
+                if index == self.first:
+                    d_encoder, d_hidden = self._delta
+                    return encoder_hidden_states + d_encoder, hidden_states + d_hidden
+                return encoder_hidden_states, hidden_states
+            if index == self.first:
+                self._inputs = (encoder_hidden_states, hidden_states)
+            encoder_out, hidden_out = original(hidden_states, encoder_hidden_states, temb, *args, **kwargs)
+            if index == self.last:
+                encoder_in, hidden_in = self._inputs
+                self._delta = (encoder_out - encoder_in, hidden_out - hidden_in)
+                self._inputs = None
+            return encoder_out, hidden_out
+        return forward
+
+    def attach(self) -> None:
+        blocks = self.transformer.transformer_blocks
+        for index in range(self.first, self.last + 1):
+            blocks[index].forward = self._wrap(index, blocks[index].forward)
+        self._hook = self.transformer.register_forward_pre_hook(self._on_step)
+
+    def detach(self) -> None:
+        if self._hook is not None:
+            self._hook.remove()
+            self._hook = None
+        blocks = self.transformer.transformer_blocks
+        for index in range(self.first, self.last + 1):
+            # Drops the instance attribute so the class forward is used again.
+            blocks[index].__dict__.pop("forward", None)
+        self._inputs = self._delta = None
+
+    def stats(self) -> Dict[str, Any]:
+        steps = self.computed_steps + self.reused_steps
+        skipped = self.reused_steps * self.span / (steps * self.num_blocks) if steps else 0.0
+        return {
+            "interval": self.interval,
+            "blocks": [self.first, self.last],
+            "computed_steps": self.computed_steps,
+            "reused_steps": self.reused_steps,
+            "skipped_block_fraction": round(skipped, 3),
+        }
+
+
+@contextmanager
+def feature_cache(transformer: Any, interval: int, depth: float) -> Iterator[Optional[FeatureCache]]:
+    if interval <= 1 or len(transformer.transformer_blocks) < 2:
+        yield None
+        return
+    cache = FeatureCache(transformer, interval, depth)
+    cache.attach()
+    try:
+        yield cache
+    finally:
+        cache.detach()
@@ -1,14 +1,30 @@
 import asyncio
+import math
+import random
+import threading
+import time
 import warnings
-from typing import Optional, Dict, Any, List
+from collections import deque
+from contextlib import contextmanager, aclosing, nullcontext, suppress
+from typing import Optional, Dict, Any, List, Callable, Iterator, AsyncIterator, Tuple, Deque
 import torch
+from PIL import Image
 from diffusers import DiffusionPipeline
 from transformers import PreTrainedTokenizer, PreTrainedTokenizerFast
 
 from ..core.config import get_settings
 from ..core.device import DeviceManager
-from ..core.exceptions import ModelLoadError, GenerationError
+from ..core.exceptions import ModelLoadError, GenerationError, GenerationCancelled
+from ..core import profiling
 from .base import BaseModelManager
+from .batch_engine import ContinuousBatchEngine
+from .latent_preview import latents_to_previews
+from . import sd3_ops
+from .text_encoders import TextEncoderRunner
+from .feature_cache import feature_cache
+from .attention import TEXT_TOKENS, image_tokens, select_backend, chunk_size_for, attention_backend
+
+PreviewCallback = Callable[[int, int, Image.Image], None]
 
 
 class ImageModelManager(BaseModelManager):
@@ -18,6 +34,17 @@ class ImageModelManager(BaseModelManager):
         self.repo_id = "stabilityai/stable-diffusion-3.5-medium"
         self.dtype = DeviceManager.get_dtype(self.device, self.settings.force_fp16)
         self.variant = "fp16" if self.device == "cuda" else None
+        self._engine: Optional[ContinuousBatchEngine] = None
+        self.text_encoders: Optional[TextEncoderRunner] = None
+        self._transformer_lock = threading.Lock()
+
+    @property
+    def engine(self) -> ContinuousBatchEngine:
+        if self._engine is None:
+            self._engine = ContinuousBatchEngine(
+                self, self._infer_sem, max_batch_size=self.settings.engine_max_batch_size
+            )
+        return self._engine
 
     def _configure_pipeline(self, pipe: DiffusionPipeline) -> DiffusionPipeline:
         try:
@@ -29,6 +56,28 @@ class ImageModelManager(BaseModelManager):
             self.logger.warning(f"Failed to enable VAE optimizations: {e}")
         return pipe
 
+    def _attention_plan(self, width: int, height: int, batch_size: int) -> Tuple[str, int]:
+        transformer = self.pipe.transformer
+        tokens = image_tokens(width, height, self.pipe.vae_scale_factor, transformer.config.patch_size) + TEXT_TOKENS
+        heads = transformer.config.num_attention_heads
+        dtype_bytes = torch.finfo(transformer.dtype).bits // 8
+        budget = self.settings.attention_memory_budget_mb * 1024 ** 2
+        if budget <= 0:
+            budget = DeviceManager.available_memory_bytes(self.device) // 4
+        backend = select_backend(
+            self.settings.attention_backend, self.device, tokens, batch_size, heads, dtype_bytes, budget
+        )
+        chunk = chunk_size_for(self.settings.attention_chunk_size, tokens, batch_size, heads, dtype_bytes, budget)
+        return backend, chunk
+
+    @contextmanager
+    def attention(self, width: int, height: int, batch_size: int) -> Iterator[str]:
+        # Attention processors, feature caching and guidance truncation patch the shared transformer,
+        # so every run that touches it, engine steps included, holds it exclusively while patched.
+        backend, chunk = self._attention_plan(width, height, batch_size)
+        with self._transformer_lock, attention_backend(self.pipe.transformer, backend, chunk):
+            yield backend
+
     async def ensure_loaded(self) -> None:
         async with self._lock:
             if self.pipe is not None:
@@ -41,6 +90,10 @@ class ImageModelManager(BaseModelManager):
                 raise ModelLoadError(f"Failed to load image model: {e}")
 
     def _load_pipeline(self) -> DiffusionPipeline:
+        extra: Dict[str, Any] = {}
+        if self.settings.text_encoder_mode == "no_t5":
+            # SD3 pads the T5 slot with zeros when text_encoder_3 is absent.
+            extra = {"text_encoder_3": None, "tokenizer_3": None}
         pipe = DiffusionPipeline.from_pretrained(
             self.repo_id,
             torch_dtype=self.dtype,
@@ -48,10 +101,17 @@ class ImageModelManager(BaseModelManager):
             token=self.hf_token,
             cache_dir=self.settings.hf_home,
             variant=self.variant,
+            **extra,
         )
         pipe = self._configure_pipeline(pipe)
+        self.text_encoders = TextEncoderRunner(pipe, self.settings.text_encoder_mode, self.device, self.dtype)
         return pipe.to(self.device)
 
+    def encode_prompts(
+        self, prompts: List[str], negative_prompts: List[Optional[str]]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        return self.text_encoders.encode(prompts, negative_prompts)
+
     def _collect_tokenizers(self) -> List[tuple[str, Any]]:
         tks: List[tuple[str, Any]] = []
         for name in ("tokenizer", "tokenizer_2", "tokenizer_3"):
@@ -91,7 +151,56 @@ class ImageModelManager(BaseModelManager):
         height: int,
         seeds: Optional[List[Optional[int]]] = None,
         micro_batch_size: int = 4,
+        preview_every: int = 0,
+        on_preview: Optional[PreviewCallback] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        return_latents: bool = False,
+        cache_interval: int = 1,
+        cache_depth: float = 0.5,
+        guidance_cutoffs: Optional[List[float]] = None,
     ) -> List[Dict[str, Any]]:
+        out_all: List[Dict[str, Any]] = []
+        async with aclosing(self.iter_batch_same_shape(
+            prompts=prompts,
+            negative_prompts=negative_prompts,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            width=width,
+            height=height,
+            seeds=seeds,
+            micro_batch_size=micro_batch_size,
+            preview_every=preview_every,
+            on_preview=on_preview,
+            should_cancel=should_cancel,
+            return_latents=return_latents,
+            cache_interval=cache_interval,
+            cache_depth=cache_depth,
+            guidance_cutoffs=guidance_cutoffs,
+        )) as chunks:
+            async for chunk in chunks:
+                out_all.extend(chunk)
+        return out_all
+
+    async def iter_batch_same_shape(
+        self,
+        *,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seeds: Optional[List[Optional[int]]] = None,
+        micro_batch_size: int = 4,
+        preview_every: int = 0,
+        on_preview: Optional[PreviewCallback] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        return_latents: bool = False,
+        cache_interval: int = 1,
+        cache_depth: float = 0.5,
+        guidance_cutoffs: Optional[List[float]] = None,
+        buffer_size: int = 2,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
         await self.ensure_loaded()
 
         N = len(prompts)
@@ -99,71 +208,398 @@ class ImageModelManager(BaseModelManager):
         if seeds is None:
             seeds = [None] * N
         assert len(seeds) == N, "seeds length mismatch"
+        if guidance_cutoffs is None:
+            guidance_cutoffs = [1.0] * N
+        guide_steps = [sd3_ops.cfg_steps(num_inference_steps, guidance_scale, c) for c in guidance_cutoffs]
 
         token_info = self._measure_tokens(prompts[0]) if N > 0 else []
-        out_all: List[Dict[str, Any]] = []
-
+        chunk_size = max(1, micro_batch_size)
         loop = asyncio.get_running_loop()
+        stop = threading.Event()
+
+        def _cancelled() -> bool:
+            return stop.is_set() or (should_cancel is not None and should_cancel())
+
+        def _on_step_end(start: int):
+            def _callback(pipe, step: int, timestep, callback_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+                if _cancelled():
+                    pipe._interrupt = True
+                    return callback_kwargs
+                done = step + 1
+                if on_preview is not None and preview_every > 0 and done % preview_every == 0 and done < num_inference_steps:
+                    for i, preview in enumerate(latents_to_previews(callback_kwargs["latents"])):
+                        on_preview(start + i, done, preview)
+                return callback_kwargs
+            return _callback
+
+        def _guidance(start: int, end: int):
+            sub = guide_steps[start:end]
+            # The pipeline already skips CFG at guidance <= 1; truncation only matters when it runs.
+            if guidance_scale <= 1 or all(n >= num_inference_steps for n in sub):
+                return nullcontext()
+            return sd3_ops.truncated_guidance(self.pipe.transformer, sub)
 
         def _run_subbatch(
+            start: int,
             p_sub: List[str],
             n_sub: List[Optional[str]],
             g_sub: List[Optional[torch.Generator]],
         ):
-            sched_cls = self.pipe.scheduler.__class__
-            self.pipe.scheduler = sched_cls.from_config(self.pipe.scheduler.config)
-            with warnings.catch_warnings(record=True) as w:
+            with warnings.catch_warnings(record=True) as w, self.attention(width, height, len(p_sub)) as attn_backend:
                 warnings.simplefilter("always")
-                result = self.pipe(
-                    prompt=p_sub,
-                    negative_prompt=n_sub,
+                sched_cls = self.pipe.scheduler.__class__
+                self.pipe.scheduler = sched_cls.from_config(self.pipe.scheduler.config)
+                with torch.inference_mode(), profiling.span("text_encode"):
+                    prompt_embeds, pooled, negative_embeds, negative_pooled = self.encode_prompts(p_sub, n_sub)
+                with (
+                    profiling.span("denoise"),
+                    _guidance(start, start + len(p_sub)),
+                    feature_cache(self.pipe.transformer, cache_interval, cache_depth) as cache,
+                ):
+                    latents = self.pipe(
+                        prompt_embeds=prompt_embeds,
+                        pooled_prompt_embeds=pooled,
+                        negative_prompt_embeds=negative_embeds,
+                        negative_pooled_prompt_embeds=negative_pooled,
+                        num_inference_steps=num_inference_steps,
+                        guidance_scale=guidance_scale,
+                        width=width,
+                        height=height,
+                        generator=g_sub,
+                        callback_on_step_end=_on_step_end(start),
+                        callback_on_step_end_tensor_inputs=["latents"],
+                        output_type="latent",
+                    ).images
+                with torch.inference_mode(), profiling.span("vae_decode"):
+                    images = sd3_ops.decode_latents(self.pipe, latents)
+                warn_msgs = [str(x.message) for x in w]
+            kept = latents.to("cpu", torch.float16).split(1) if return_latents else [None] * len(images)
+            return images, kept, warn_msgs, attn_backend, cache.stats() if cache is not None else None
+
+        async def _run_pipe(start: int, end: int) -> List[Dict[str, Any]]:
+            p_sub = prompts[start:end]
+            n_sub = negative_prompts[start:end]
+
+            sub_seeds = seeds[start:end]
+            if all(s is None for s in sub_seeds):
+                g_sub = None
+            else:
+                g_sub = []
+                for s in sub_seeds:
+                    if s is None:
+                        g_sub.append(torch.Generator(device=self.device))
+                    else:
+                        g_sub.append(torch.Generator(device=self.device).manual_seed(int(s)))
+
+            async with self._infer_sem:
+                self.logger.info(
+                    f"BATCH subrange {start}:{end} | size={end-start} | "
+                    f"{width}x{height} steps={num_inference_steps} guide={guidance_scale}"
+                )
+                started = time.perf_counter()
+                fut = loop.run_in_executor(None, profiling.in_context(_run_subbatch), start, p_sub, n_sub, g_sub)
+                try:
+                    images, kept, warn_msgs, attn_backend, cache_stats = await asyncio.shield(fut)
+                except asyncio.CancelledError:
+                    # The worker thread owns the device until its interrupted run returns.
+                    stop.set()
+                    await asyncio.wait({fut})
+                    raise
+                timing = {"batch_start": start, "batch_size": end - start, "seconds": time.perf_counter() - started}
+            if _cancelled():
+                raise GenerationCancelled("Generation cancelled")
+
+            return [
+                {
+                    "image": img,
+                    "warnings": warn_msgs,
+                    "token_info": token_info,
+                    "prompt": p_sub[i],
+                    "negative_prompt": n_sub[i],
+                    "seed": seeds[start + i],
+                    "attention_backend": attn_backend,
+                    "timing": timing,
+                    "feature_cache": cache_stats,
+                    "cfg_steps": guide_steps[start + i],
+                    **({"latents": kept[i]} if return_latents else {}),
+                }
+                for i, img in enumerate(images)
+            ]
+
+        async def _run_engine(start: int, end: int) -> List[Dict[str, Any]]:
+            return await self._infer_via_engine(
+                prompts=prompts[start:end],
+                negative_prompts=negative_prompts[start:end],
+                num_inference_steps=num_inference_steps,
+                guidance_scale=guidance_scale,
+                width=width,
+                height=height,
+                seeds=seeds[start:end],
+                token_info=token_info,
+                preview_every=preview_every,
+                on_preview=on_preview,
+                should_cancel=_cancelled,
+                offset=start,
+                guidance_cutoffs=guidance_cutoffs[start:end],
+            )
+
+        # The continuous engine decodes inside its step loop and mixes requests at different steps,
+        # so latent-returning drafts and feature-cached runs bypass it.
+        use_engine = self.settings.continuous_batching and not return_latents and cache_interval <= 1
+        run_chunk = _run_engine if use_engine else _run_pipe
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer_size))
+
+        # The engine refills its batch between steps, so it needs several chunks in flight to stay full.
+        window = max(1, buffer_size, math.ceil(self.settings.engine_max_batch_size / chunk_size)) if use_engine else 1
+        in_flight: Deque[asyncio.Task] = deque()
+
+        async def _produce() -> None:
+            try:
+                starts = iter(range(0, N, chunk_size))
+                while True:
+                    for start in starts:
+                        if _cancelled():
+                            raise GenerationCancelled("Generation cancelled")
+                        in_flight.append(asyncio.create_task(run_chunk(start, min(N, start + chunk_size))))
+                        if len(in_flight) >= window:
+                            break
+                    if not in_flight:
+                        break
+                    # Blocks while buffer_size chunks are unconsumed, which idles the device instead of piling up images.
+                    await queue.put(await in_flight.popleft())
+                await queue.put(None)
+            except (GenerationCancelled, GenerationError) as e:
+                await queue.put(e)
+            except Exception as e:
+                await queue.put(GenerationError(f"Image batch generation failed: {e}"))
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+        producer = asyncio.create_task(_produce())
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            stop.set()
+            if not producer.done():
+                producer.cancel()
+                with suppress(asyncio.CancelledError):
+                    await producer
+
+    async def _infer_via_engine(
+        self,
+        *,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seeds: List[Optional[int]],
+        token_info: List[Dict[str, Any]],
+        preview_every: int = 0,
+        on_preview: Optional[PreviewCallback] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        offset: int = 0,
+        guidance_cutoffs: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        self.logger.info(
+            f"ENGINE submit {len(prompts)} | {width}x{height} steps={num_inference_steps} guide={guidance_scale}"
+        )
+        if guidance_cutoffs is None:
+            guidance_cutoffs = [1.0] * len(prompts)
+        try:
+            outs = await asyncio.gather(*[
+                self.engine.submit(
+                    prompt=p,
+                    negative_prompt=n,
                     num_inference_steps=num_inference_steps,
                     guidance_scale=guidance_scale,
                     width=width,
                     height=height,
-                    generator=g_sub,
+                    seed=s,
+                    preview_every=preview_every,
+                    on_preview=self._bind_preview(on_preview, offset + i),
+                    should_cancel=should_cancel,
+                    guidance_cutoff=c,
                 )
-                warn_msgs = [str(x.message) for x in w]
-            return result, warn_msgs
+                for i, (p, n, s, c) in enumerate(zip(prompts, negative_prompts, seeds, guidance_cutoffs))
+            ])
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            raise GenerationError(f"Image batch generation failed: {e}")
 
+        for out in outs:
+            out["token_info"] = token_info
+        return list(outs)
+
+    async def infer_variations(
+        self,
+        *,
+        prompt: str,
+        negative_prompt: Optional[str],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seed: Optional[int],
+        count: int,
+        shared_steps: int,
+        strength: float,
+        micro_batch_size: int = 4,
+        guidance_cutoff: float = 1.0,
+    ) -> List[Dict[str, Any]]:
+        await self.ensure_loaded()
+        guidance_end = sd3_ops.cfg_steps(num_inference_steps, guidance_scale, guidance_cutoff)
+
+        base_seed = int(seed) if seed is not None else random.randrange(2 ** 32)
+        shared_steps = max(0, min(shared_steps, num_inference_steps - 1))
+        token_info = self._measure_tokens(prompt)
+
+        def _run_variations() -> Tuple[List[Any], str]:
+            pipe, device = self.pipe, self.device
+            with torch.inference_mode():
+                with profiling.span("text_encode"):
+                    embeds = self.encode_prompts([prompt], [negative_prompt])
+                scheduler = sd3_ops.make_scheduler(pipe, num_inference_steps, width, height, device)
+                generator = torch.Generator(device=device).manual_seed(base_seed)
+                latents = sd3_ops.initial_latents(pipe, generator, width, height, device, embeds[0].dtype)
+                with self.attention(width, height, 1), profiling.span("denoise_shared"):
+                    prefix, velocity = sd3_ops.denoise(
+                        pipe.transformer, scheduler, latents, *embeds, guidance_scale, start=0, end=shared_steps,
+                        guidance_end=guidance_end,
+                    )
+                sigma = float(scheduler.sigmas[shared_steps])
+
+                images = []
+                for start in range(0, count, max(1, micro_batch_size)):
+                    end = min(count, start + max(1, micro_batch_size))
+                    generators = [
+                        torch.Generator(device=device).manual_seed(base_seed + 1 + i) for i in range(start, end)
+                    ]
+                    branches = sd3_ops.fork_latents(prefix, velocity, sigma, generators, strength)
+                    branch_embeds = [e.expand(end - start, *e.shape[1:]) for e in embeds]
+                    branch_scheduler = sd3_ops.make_scheduler(pipe, num_inference_steps, width, height, device)
+                    branch_scheduler.set_begin_index(shared_steps)
+                    with self.attention(width, height, end - start) as attn_backend, profiling.span("denoise"):
+                        branches, _ = sd3_ops.denoise(
+                            pipe.transformer, branch_scheduler, branches, *branch_embeds, guidance_scale,
+                            start=shared_steps, guidance_end=guidance_end,
+                        )
+                    with profiling.span("vae_decode"):
+                        images.extend(sd3_ops.decode_latents(pipe, branches))
+                return images, attn_backend
+
+        self.logger.info(
+            f"VARIATIONS x{count} | shared={shared_steps}/{num_inference_steps} strength={strength} | "
+            f"{width}x{height} seed={base_seed}"
+        )
+        loop = asyncio.get_running_loop()
         try:
             async with self._infer_sem:
-                for start in range(0, N, max(1, micro_batch_size)):
-                    end = min(N, start + max(1, micro_batch_size))
-                    p_sub = prompts[start:end]
-                    n_sub = negative_prompts[start:end]
-                    
-                    sub_seeds = seeds[start:end]
-                    if all(s is None for s in sub_seeds):
-                        g_sub = None
-                    else:
-                        g_sub = []
-                        for s in sub_seeds:
-                            if s is None:
-                                g_sub.append(torch.Generator(device=self.device))
-                            else:
-                                g_sub.append(torch.Generator(device=self.device).manual_seed(int(s)))
-
-                    self.logger.info(
-                        f"BATCH subrange {start}:{end} | size={end-start} | "
-                        f"{width}x{height} steps={num_inference_steps} guide={guidance_scale}"
-                    )
-                    result, warn_msgs = await loop.run_in_executor(None, _run_subbatch, p_sub, n_sub, g_sub)
+                images, attn_backend = await loop.run_in_executor(None, profiling.in_context(_run_variations))
+        except Exception as e:
+            raise GenerationError(f"Variation generation failed: {e}")
 
-                    for i, img in enumerate(result.images):
-                        out_all.append({
-                            "image": img,
-                            "warnings": warn_msgs,
-                            "token_info": token_info,
-                            "prompt": p_sub[i],
-                            "negative_prompt": n_sub[i],
-                            "seed": seeds[start + i],
-                        })
+        return [
+            {
+                "image": image,
+                "variation": i,
+                "seed": base_seed,
+                "shared_steps": shared_steps,
+                "attention_backend": attn_backend,
+                "prompt": prompt,
+                "negative_prompt": negative_prompt,
+                "token_info": token_info,
+                "warnings": [],
+            }
+            for i, image in enumerate(images)
+        ]
 
-            return out_all
+    async def refine(
+        self,
+        *,
+        latents: List[torch.Tensor],
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[int],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        strength: float,
+        micro_batch_size: int = 4,
+    ) -> List[Dict[str, Any]]:
+        await self.ensure_loaded()
 
-        except Exception as e:
-            raise GenerationError(f"Image batch generation failed: {e}")
+        N = len(latents)
+        # Only the last `strength` share of the schedule is run, starting from the upscaled draft.
+        start_step = min(num_inference_steps - 1, int(round(num_inference_steps * (1.0 - strength))))
+        token_info = self._measure_tokens(prompts[0]) if N > 0 else []
+        loop = asyncio.get_running_loop()
+
+        def _run_refine(start: int, end: int) -> Tuple[List[Any], str]:
+            pipe, device = self.pipe, self.device
+            with torch.inference_mode():
+                with profiling.span("text_encode"):
+                    embeds = self.encode_prompts(prompts[start:end], negative_prompts[start:end])
+                scheduler = sd3_ops.make_scheduler(pipe, num_inference_steps, width, height, device)
+                scheduler.set_begin_index(start_step)
+                with profiling.span("latent_upscale"):
+                    drafts = torch.cat(latents[start:end]).to(device=device, dtype=embeds[0].dtype)
+                    drafts = sd3_ops.upscale_latents(drafts, width, height, pipe.vae_scale_factor)
+                    generators = [torch.Generator(device=device).manual_seed(int(s)) for s in seeds[start:end]]
+                    noisy = sd3_ops.renoise_latents(drafts, float(scheduler.sigmas[start_step]), generators)
+                with self.attention(width, height, end - start) as attn_backend, profiling.span("denoise"):
+                    refined, _ = sd3_ops.denoise(
+                        pipe.transformer, scheduler, noisy, *embeds, guidance_scale, start=start_step
+                    )
+                with profiling.span("vae_decode"):
+                    return sd3_ops.decode_latents(pipe, refined), attn_backend
+
+        self.logger.info(
+            f"REFINE x{N} | steps={num_inference_steps - start_step}/{num_inference_steps} "
+            f"strength={strength} | {width}x{height}"
+        )
+        out_all: List[Dict[str, Any]] = []
+        for start in range(0, N, max(1, micro_batch_size)):
+            end = min(N, start + max(1, micro_batch_size))
+            try:
+                async with self._infer_sem:
+                    started = time.perf_counter()
+                    images, attn_backend = await loop.run_in_executor(
+                        None, profiling.in_context(_run_refine), start, end
+                    )
+                    timing = {"batch_start": start, "batch_size": end - start, "seconds": time.perf_counter() - started}
+            except Exception as e:
+                raise GenerationError(f"Refinement failed: {e}")
+            for i, image in enumerate(images, start):
+                out_all.append({
+                    "image": image,
+                    "prompt": prompts[i],
+                    "negative_prompt": negative_prompts[i],
+                    "seed": seeds[i],
+                    "refine_steps": num_inference_steps - start_step,
+                    "attention_backend": attn_backend,
+                    "token_info": token_info,
+                    "warnings": [],
+                    "timing": timing,
+                })
+        return out_all
+
+    @staticmethod
+    def _bind_preview(on_preview: Optional[PreviewCallback], index: int) -> Optional[Callable[[int, Image.Image], None]]:
+        if on_preview is None:
+            return None
+        return lambda step, image: on_preview(index, step, image)
 
     async def infer(self, **kwargs) -> Dict[str, Any]:
         res = await self.infer_batch_same_shape(
@@ -175,5 +611,8 @@ class ImageModelManager(BaseModelManager):
             height=kwargs.get("height", 1024),
             seeds=[kwargs.get("seed")],
             micro_batch_size=1,
+            cache_interval=kwargs.get("cache_interval", 1),
+            cache_depth=kwargs.get("cache_depth", 0.5),
+            guidance_cutoffs=[kwargs.get("guidance_cutoff", 1.0)],
         )
         return res[0]
\ No newline at end of file
@@ -0,0 +1,184 @@
+import asyncio
+from multiprocessing.connection import Client
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, Callable, AsyncIterator
+
+from ..core.exceptions import ModelLoadError, GenerationError, GenerationCancelled
+from ..core.ipc import parse_address, engine_authkey, import_images
+from .base import BaseModelManager
+
+
+class RemoteImageModelManager(BaseModelManager):
+    # Latent previews are decoded inside the engine's step loop and are not sent back over the socket.
+    supports_previews = False
+
+    def __init__(self, address: str, authkey: Optional[str], hf_token: Optional[str] = None):
+        super().__init__(hf_token)
+        self.address = parse_address(address)
+        self.authkey = engine_authkey(authkey)
+        self.repo_id = "stabilityai/stable-diffusion-3.5-medium"
+        # Reported by the engine on load; this process never touches the device itself.
+        self.device_name: Optional[str] = None
+
+    def _call(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        with Client(self.address, authkey=self.authkey) as conn:
+            conn.send(message)
+            return conn.recv()
+
+    async def _request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._call, message)
+
+    async def ensure_loaded(self) -> None:
+        async with self._lock:
+            if self.pipe is not None:
+                return
+            self.logger.info(f"Connecting to inference engine at {self.address}")
+            try:
+                reply = await self._request({"op": "load"})
+            except Exception as e:
+                raise ModelLoadError(f"Inference engine unreachable: {e}")
+            if not reply.get("ok"):
+                raise ModelLoadError(f"Inference engine failed to load model: {reply.get('error')}")
+            self.repo_id = reply.get("repo_id", self.repo_id)
+            self.device_name = reply.get("device")
+            # The pipeline lives in the engine process; this only marks the manager as ready.
+            self.pipe = reply
+
+    async def infer_batch_same_shape(
+        self,
+        *,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seeds: Optional[List[Optional[int]]] = None,
+        micro_batch_size: int = 4,
+        preview_every: int = 0,
+        on_preview: Optional[Callable] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        return_latents: bool = False,
+        cache_interval: int = 1,
+        cache_depth: float = 0.5,
+        guidance_cutoffs: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        out_all: List[Dict[str, Any]] = []
+        async with aclosing(self.iter_batch_same_shape(
+            prompts=prompts,
+            negative_prompts=negative_prompts,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            width=width,
+            height=height,
+            seeds=seeds,
+            micro_batch_size=micro_batch_size,
+            preview_every=preview_every,
+            on_preview=on_preview,
+            should_cancel=should_cancel,
+            return_latents=return_latents,
+            cache_interval=cache_interval,
+            cache_depth=cache_depth,
+            guidance_cutoffs=guidance_cutoffs,
+        )) as chunks:
+            async for chunk in chunks:
+                out_all.extend(chunk)
+        return out_all
+
+    async def iter_batch_same_shape(
+        self,
+        *,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seeds: Optional[List[Optional[int]]] = None,
+        micro_batch_size: int = 4,
+        preview_every: int = 0,
+        on_preview: Optional[Callable] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        return_latents: bool = False,
+        cache_interval: int = 1,
+        cache_depth: float = 0.5,
+        guidance_cutoffs: Optional[List[float]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        await self.ensure_loaded()
+
+        N = len(prompts)
+        if seeds is None:
+            seeds = [None] * N
+        step = max(1, micro_batch_size)
+
+        # Routes reject previews in this mode; cancellation is honoured between micro-batches.
+        # Each micro-batch is only requested once the previous one has been consumed.
+        for start in range(0, N, step):
+            end = min(N, start + step)
+            if should_cancel is not None and should_cancel():
+                raise GenerationCancelled("Generation cancelled")
+            try:
+                reply = await self._request({
+                    "op": "infer_batch",
+                    "kwargs": {
+                        "prompts": prompts[start:end],
+                        "negative_prompts": negative_prompts[start:end],
+                        "num_inference_steps": num_inference_steps,
+                        "guidance_scale": guidance_scale,
+                        "width": width,
+                        "height": height,
+                        "seeds": seeds[start:end],
+                        "micro_batch_size": step,
+                        "return_latents": return_latents,
+                        "cache_interval": cache_interval,
+                        "cache_depth": cache_depth,
+                        "guidance_cutoffs": guidance_cutoffs[start:end] if guidance_cutoffs else None,
+                    },
+                })
+            except Exception as e:
+                raise GenerationError(f"Inference engine request failed: {e}")
+            if not reply.get("ok"):
+                raise GenerationError(f"Image batch generation failed: {reply.get('error')}")
+
+            images = import_images(reply["shm"], reply["images"])
+            yield [{**meta, "image": image} for meta, image in zip(reply["results"], images)]
+
+    async def infer_variations(self, **kwargs) -> List[Dict[str, Any]]:
+        await self.ensure_loaded()
+        try:
+            reply = await self._request({"op": "variations", "kwargs": kwargs})
+        except Exception as e:
+            raise GenerationError(f"Inference engine request failed: {e}")
+        if not reply.get("ok"):
+            raise GenerationError(f"Variation generation failed: {reply.get('error')}")
+        images = import_images(reply["shm"], reply["images"])
+        return [{**meta, "image": image} for meta, image in zip(reply["results"], images)]
+
+    async def refine(self, **kwargs) -> List[Dict[str, Any]]:
+        await self.ensure_loaded()
+        # Draft latents are small CPU tensors, so they travel pickled rather than through shared memory.
+        try:
+            reply = await self._request({"op": "refine", "kwargs": kwargs})
+        except Exception as e:
+            raise GenerationError(f"Inference engine request failed: {e}")
+        if not reply.get("ok"):
+            raise GenerationError(f"Refinement failed: {reply.get('error')}")
+        images = import_images(reply["shm"], reply["images"])
+        return [{**meta, "image": image} for meta, image in zip(reply["results"], images)]
+
+    async def infer(self, **kwargs) -> Dict[str, Any]:
+        res = await self.infer_batch_same_shape(
+            prompts=[kwargs.get("prompt", "")],
+            negative_prompts=[kwargs.get("negative_prompt")],
+            num_inference_steps=kwargs.get("num_inference_steps", 44),
+            guidance_scale=kwargs.get("guidance_scale", 7.5),
+            width=kwargs.get("width", 1024),
+            height=kwargs.get("height", 1024),
+            seeds=[kwargs.get("seed")],
+            micro_batch_size=1,
+            cache_interval=kwargs.get("cache_interval", 1),
+            cache_depth=kwargs.get("cache_depth", 0.5),
+            guidance_cutoffs=[kwargs.get("guidance_cutoff", 1.0)],
+        )
+        return res[0]
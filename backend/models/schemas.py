@@ -1,3 +1,4 @@
+import math
 from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from enum import Enum
@@ -21,6 +22,7 @@ class ImageGenerationRequest(BaseModel):
     style: ArtStyle = ArtStyle.CINEMATIC
     num_inference_steps: int = Field(44, ge=1, le=150)
     guidance_scale: float = Field(7.5, ge=0.0, le=20.0)
+    guidance_cutoff: float = Field(1.0, ge=0.0, le=1.0)
     width: int = Field(1024, ge=256, le=2048)
     height: int = Field(1024, ge=256, le=2048)
     negative_prompt: Optional[str] = None
@@ -33,12 +35,46 @@ class ImageGenerationRequest(BaseModel):
         return v
 
 
-class BatchImageRequest(BaseModel):
-    items: List[ImageGenerationRequest] = Field(..., min_items=1, max_items=10000)
+class BatchOptions(BaseModel):
     save_to_disk: bool = False
     prefix: Optional[str] = None
     start_seed: Optional[int] = None
     micro_batch_size: int = Field(4, ge=1, le=64)
+    preview_every: int = Field(0, ge=0, le=150)
+    bucketing: bool = False
+    cache_interval: int = Field(1, ge=1, le=8)
+    cache_depth: float = Field(0.5, ge=0.1, le=0.9)
+
+
+class BatchImageRequest(BatchOptions):
+    items: List[ImageGenerationRequest] = Field(..., min_items=1, max_items=10000)
+
+
+class VariationRequest(ImageGenerationRequest):
+    count: int = Field(4, ge=1, le=32)
+    shared_fraction: float = Field(0.3, ge=0.0, le=0.9)
+    variation_strength: float = Field(0.5, ge=0.0, le=1.0)
+    micro_batch_size: int = Field(4, ge=1, le=64)
+
+
+class DraftRequest(BaseModel):
+    items: List[ImageGenerationRequest] = Field(..., min_items=1, max_items=10000)
+    start_seed: Optional[int] = None
+    micro_batch_size: int = Field(4, ge=1, le=64)
+    draft_scale: float = Field(0.5, ge=0.25, le=1.0)
+    draft_steps: int = Field(12, ge=1, le=150)
+
+
+class RefineRequest(BaseModel):
+    draft_id: str = Field(..., min_length=1, max_length=64)
+    indices: List[int] = Field(..., min_items=1, max_items=256)
+    strength: float = Field(0.45, ge=0.1, le=1.0)
+    num_inference_steps: Optional[int] = Field(None, ge=1, le=150)
+    micro_batch_size: int = Field(4, ge=1, le=64)
+
+
+class NodeRegistration(BaseModel):
+    url: str = Field(..., min_length=1, max_length=512, pattern="^https?://")
 
 
 class VideoGenerationOptions(BaseModel):
@@ -46,6 +82,20 @@ class VideoGenerationOptions(BaseModel):
     fps: int = Field(24, ge=8, le=30)
     motion: int = Field(96, ge=0, le=255)
     preserve_strength: float = Field(0.02, ge=0.0, le=1.0)
-    num_frames: int = Field(24, ge=14, le=25)
+    num_frames: int = Field(24, ge=14, le=97)
     enhance_quality: bool = True
-    seed: Optional[int] = 1234
\ No newline at end of file
+    seed: Optional[int] = 1234
+    interpolation_factor: int = Field(1, ge=1, le=4)
+    loop_mode: str = Field("mirror", pattern="^(mirror|flow)$")
+
+    @validator("interpolation_factor")
+    def validate_diffusion_frames(cls, v, values):
+        num_frames = values.get("num_frames", 24)
+        if math.ceil((num_frames - 1) / v) + 1 > 25:
+            raise ValueError("num_frames / interpolation_factor exceeds the 25 frames SVD can generate")
+        return v
+
+
+class TextToLoopRequest(BaseModel):
+    image: ImageGenerationRequest
+    video: VideoGenerationOptions = Field(default_factory=VideoGenerationOptions)
\ No newline at end of file
@@ -0,0 +1,216 @@
+import math
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+import torch
+from diffusers.utils.torch_utils import randn_tensor
+from PIL import Image
+
+
+def encode_prompts(
+    pipe: Any,
+    prompts: List[str],
+    negative_prompts: List[Optional[str]],
+    device: torch.device,
+) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+    prompt_embeds, negative_embeds, pooled, negative_pooled = pipe.encode_prompt(
+        prompt=prompts,
+        prompt_2=None,
+        prompt_3=None,
+        negative_prompt=[n or "" for n in negative_prompts],
+        do_classifier_free_guidance=True,
+        device=device,
+    )
+    return prompt_embeds, pooled, negative_embeds, negative_pooled
+
+
+def make_scheduler(pipe: Any, num_inference_steps: int, width: int, height: int, device: torch.device) -> Any:
+    scheduler = pipe.scheduler.__class__.from_config(pipe.scheduler.config)
+    kwargs = {}
+    config = scheduler.config
+    if config.get("use_dynamic_shifting", False):
+        patch = pipe.transformer.config.patch_size
+        seq_len = (height // pipe.vae_scale_factor // patch) * (width // pipe.vae_scale_factor // patch)
+        base_len = config.get("base_image_seq_len", 256)
+        max_len = config.get("max_image_seq_len", 4096)
+        base_shift = config.get("base_shift", 0.5)
+        max_shift = config.get("max_shift", 1.16)
+        slope = (max_shift - base_shift) / (max_len - base_len)
+        kwargs["mu"] = seq_len * slope + (base_shift - slope * base_len)
+    scheduler.set_timesteps(num_inference_steps, device=device, **kwargs)
+    return scheduler
+
+
+def initial_latents(
+    pipe: Any,
+    generator: Optional[torch.Generator],
+    width: int,
+    height: int,
+    device: torch.device,
+    dtype: torch.dtype,
+) -> torch.Tensor:
+    shape = (
+        1,
+        pipe.transformer.config.in_channels,
+        int(height) // pipe.vae_scale_factor,
+        int(width) // pipe.vae_scale_factor,
+    )
+    return randn_tensor(shape, generator=generator, device=device, dtype=dtype)
+
+
+def predict_noise(
+    transformer: Any,
+    latents: torch.Tensor,
+    timesteps: torch.Tensor,
+    prompt_embeds: torch.Tensor,
+    pooled: torch.Tensor,
+    negative_embeds: torch.Tensor,
+    negative_pooled: torch.Tensor,
+    guidance: torch.Tensor,
+    cfg: Optional[torch.Tensor] = None,
+) -> torch.Tensor:
+    # Only rows flagged in cfg run the unconditional branch; the rest cost a single pass.
+    if cfg is None:
+        cfg = guidance > 1
+    rows = cfg.nonzero().flatten()
+    noise = transformer(
+        hidden_states=torch.cat([latents[rows], latents]),
+        timestep=torch.cat([timesteps[rows], timesteps]),
+        encoder_hidden_states=torch.cat([negative_embeds[rows], prompt_embeds]),
+        pooled_projections=torch.cat([negative_pooled[rows], pooled]),
+        return_dict=False,
+    )[0]
+    uncond, cond = noise[:len(rows)], noise[len(rows):]
+    if len(rows) == 0:
+        return cond
+    guided = cond.clone()
+    guided[rows] = uncond + guidance[rows].view(-1, 1, 1, 1) * (cond[rows] - uncond)
+    return guided
+
+
+def effective_guidance(guidance_scale: float) -> float:
+    # Matches the pipeline, which skips CFG entirely at guidance <= 1.
+    return guidance_scale if guidance_scale > 1 else 1.0
+
+
+def cfg_steps(num_inference_steps: int, guidance_scale: float, cutoff: float = 1.0) -> int:
+    # Number of leading steps that run the unconditional branch; later steps use the conditional one alone.
+    if guidance_scale <= 1:
+        return 0
+    return min(num_inference_steps, int(math.ceil(num_inference_steps * cutoff)))
+
+
+@contextmanager
+def truncated_guidance(transformer: Any, steps: List[int]) -> Iterator[None]:
+    # The diffusers pipeline always batches [uncond, cond]. Rows past their CFG budget drop the
+    # uncond half and get the cond prediction back in its place, so the pipeline's guidance
+    # combination collapses to the conditional prediction for them.
+    original = transformer.forward
+    n = len(steps)
+    calls = 0
+
+    def forward(hidden_states, encoder_hidden_states=None, pooled_projections=None, timestep=None, *args, **kwargs):
+        nonlocal calls
+        keep = [i for i, end in enumerate(steps) if calls < end]
+        calls += 1
+        if hidden_states.shape[0] != 2 * n or len(keep) == n:
+            return original(hidden_states, encoder_hidden_states, pooled_projections, timestep, *args, **kwargs)
+        rows = torch.tensor(keep, device=hidden_states.device, dtype=torch.long)
+
+        def _split(x: torch.Tensor) -> torch.Tensor:
+            return torch.cat([x[:n][rows], x[n:]])
+
+        out = original(
+            _split(hidden_states), _split(encoder_hidden_states), _split(pooled_projections), _split(timestep),
+            *args, **kwargs,
+        )
+        cond = out[0][len(keep):]
+        uncond = cond.clone()
+        uncond[rows] = out[0][:len(keep)]
+        return (torch.cat([uncond, cond]),) + tuple(out[1:])
+
+    transformer.forward = forward
+    try:
+        yield
+    finally:
+        transformer.__dict__.pop("forward", None)
+
+
+def denoise(
+    transformer: Any,
+    scheduler: Any,
+    latents: torch.Tensor,
+    prompt_embeds: torch.Tensor,
+    pooled: torch.Tensor,
+    negative_embeds: torch.Tensor,
+    negative_pooled: torch.Tensor,
+    guidance_scale: float,
+    start: int = 0,
+    end: Optional[int] = None,
+    callback: Optional[Callable[[int, torch.Tensor], None]] = None,
+    guidance_end: Optional[int] = None,
+) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    timesteps = scheduler.timesteps
+    end = len(timesteps) if end is None else end
+    guidance_end = len(timesteps) if guidance_end is None else guidance_end
+    guidance = torch.full(
+        (latents.shape[0],), effective_guidance(guidance_scale), device=latents.device, dtype=latents.dtype
+    )
+    velocity = None
+    for i in range(start, end):
+        t = timesteps[i]
+        velocity = predict_noise(
+            transformer,
+            latents,
+            t.expand(latents.shape[0]),
+            prompt_embeds,
+            pooled,
+            negative_embeds,
+            negative_pooled,
+            guidance,
+            cfg=guidance > 1 if i < guidance_end else torch.zeros_like(guidance, dtype=torch.bool),
+        )
+        latents = scheduler.step(velocity, t, latents, return_dict=False)[0].to(prompt_embeds.dtype)
+        if callback is not None:
+            callback(i + 1, latents)
+    return latents, velocity
+
+
+def fork_latents(
+    latents: torch.Tensor,
+    velocity: Optional[torch.Tensor],
+    sigma: float,
+    generators: List[torch.Generator],
+    strength: float,
+) -> torch.Tensor:
+    # Flow matching: x = (1 - sigma) * x0 + sigma * eps. Keep the predicted x0 and replace a
+    # share of eps with fresh noise so each branch keeps the composition of the shared prefix.
+    if velocity is None:
+        x0, eps = torch.zeros_like(latents), latents
+    else:
+        x0 = latents - sigma * velocity
+        eps = latents + (1 - sigma) * velocity
+    keep = (1.0 - strength ** 2) ** 0.5
+    branches = []
+    for generator in generators:
+        noise = randn_tensor(latents.shape, generator=generator, device=latents.device, dtype=latents.dtype)
+        branches.append((1 - sigma) * x0 + sigma * (keep * eps + strength * noise))
+    return torch.cat(branches)
+
+
+def upscale_latents(latents: torch.Tensor, width: int, height: int, vae_scale_factor: int) -> torch.Tensor:
+    size = (int(height) // vae_scale_factor, int(width) // vae_scale_factor)
+    if tuple(latents.shape[-2:]) == size:
+        return latents
+    return torch.nn.functional.interpolate(latents.float(), size=size, mode="bicubic").to(latents.dtype)
+
+
+def renoise_latents(latents: torch.Tensor, sigma: float, generators: List[torch.Generator]) -> torch.Tensor:
+    # Flow matching forward process: move clean latents back to noise level sigma.
+    noise = randn_tensor(latents.shape, generator=generators, device=latents.device, dtype=latents.dtype)
+    return (1 - sigma) * latents + sigma * noise
+
+
+def decode_latents(pipe: Any, latents: torch.Tensor) -> List[Image.Image]:
+    latents = latents / pipe.vae.config.scaling_factor + pipe.vae.config.shift_factor
+    image = pipe.vae.decode(latents.to(pipe.vae.dtype), return_dict=False)[0]
+    return pipe.image_processor.postprocess(image, output_type="pil")
@@ -0,0 +1,310 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Optional, Dict, Any, List, Callable, AsyncIterator, Deque
+import numpy as np
+import torch
+from PIL import Image
+
+from ..core.config import get_settings
+from ..core.exceptions import GenerationError, GenerationCancelled
+from ..core import profiling
+from .base import BaseModelManager
+from .feature_cache import WARMUP_STEPS
+from . import sd3_ops
+
+PreviewCallback = Callable[[int, int, Image.Image], None]
+
+# Simulated step latency is quoted for one 1024x1024 image with classifier-free guidance.
+REFERENCE_PIXELS = 1024 * 1024
+PREVIEW_SIZE = 128
+LATENT_CHANNELS = 16
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p99": None, "max": None}
+    arr = np.asarray(values) * 1000
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 2),
+        "p99": round(float(np.percentile(arr, 99)), 2),
+        "max": round(float(arr.max()), 2),
+    }
+
+
+def synthetic_image(prompt: str, seed: Optional[int], width: int, height: int) -> Image.Image:
+    # Coarse noise upsampled to full size compresses like a real render, unlike flat fills or white noise.
+    digest = hashlib.sha256(f"{prompt}\0{seed}".encode("utf-8")).digest()
+    rng = np.random.default_rng(int.from_bytes(digest[:8], "little"))
+    coarse = rng.integers(0, 256, (max(1, height // 16), max(1, width // 16), 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((width, height), Image.Resampling.BICUBIC)
+
+
+# Deterministic stand-in for the SD3.5 manager, for exercising the API layer without a GPU.
+class StubImageModelManager(BaseModelManager):
+    def __init__(self, hf_token: Optional[str] = None):
+        super().__init__(hf_token)
+        self.settings = get_settings()
+        self.repo_id = "stub"
+        self.step_latency_s = self.settings.stub_step_latency_ms / 1000
+        self.batch_overhead_s = self.settings.stub_batch_overhead_ms / 1000
+        self._stats_lock = threading.Lock()
+        self._micro_batches = 0
+        self._busy_s = 0.0
+        self._queue_waits: Deque[float] = deque(maxlen=10000)
+
+    async def ensure_loaded(self) -> None:
+        async with self._lock:
+            if self.pipe is not None:
+                return
+            await asyncio.sleep(self.settings.stub_load_seconds)
+            self.pipe = self.repo_id
+            self.logger.info(
+                f"Stub model ready | step={self.settings.stub_step_latency_ms}ms "
+                f"overhead={self.settings.stub_batch_overhead_ms}ms"
+            )
+
+    def unload(self) -> None:
+        self.pipe = None
+        self.logger.info("Model unloaded")
+
+    def step_seconds(self, width: int, height: int, passes: int) -> float:
+        # passes counts transformer rows: two per image while CFG runs, one after.
+        return self.step_latency_s * width * height / REFERENCE_PIXELS * passes / 2
+
+    def _render(
+        self,
+        start: int,
+        prompts: List[str],
+        seeds: List[Optional[int]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        preview_every: int,
+        on_preview: Optional[PreviewCallback],
+        should_cancel: Optional[Callable[[], bool]],
+        cache_interval: int,
+        cache_depth: float,
+        guide_steps: List[int],
+    ) -> List[Image.Image]:
+        # Sleeps in an executor thread, so thread-pool and GIL contention match the real pipeline.
+        with profiling.span("denoise"):
+            time.sleep(self.batch_overhead_s)
+            for step in range(1, num_inference_steps + 1):
+                per_step = self.step_seconds(width, height, sum(2 if step <= n else 1 for n in guide_steps))
+                if should_cancel is not None and should_cancel():
+                    raise GenerationCancelled("Generation cancelled")
+                # Mirrors FeatureCache: after warm-up only every cache_interval-th step runs the deep blocks.
+                reused = cache_interval > 1 and step > WARMUP_STEPS and (step - 1 - WARMUP_STEPS) % cache_interval != 0
+                time.sleep(per_step * (1.0 - cache_depth) if reused else per_step)
+                if on_preview is not None and preview_every > 0 and step % preview_every == 0 and step < num_inference_steps:
+                    for i, (p, s) in enumerate(zip(prompts, seeds)):
+                        on_preview(start + i, step, synthetic_image(p, s, PREVIEW_SIZE, PREVIEW_SIZE))
+        with profiling.span("vae_decode"):
+            return [synthetic_image(p, s, width, height) for p, s in zip(prompts, seeds)]
+
+    async def infer_batch_same_shape(
+        self,
+        *,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seeds: Optional[List[Optional[int]]] = None,
+        micro_batch_size: int = 4,
+        preview_every: int = 0,
+        on_preview: Optional[PreviewCallback] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        return_latents: bool = False,
+        cache_interval: int = 1,
+        cache_depth: float = 0.5,
+        guidance_cutoffs: Optional[List[float]] = None,
+    ) -> List[Dict[str, Any]]:
+        out_all: List[Dict[str, Any]] = []
+        async with aclosing(self.iter_batch_same_shape(
+            prompts=prompts,
+            negative_prompts=negative_prompts,
+            num_inference_steps=num_inference_steps,
+            guidance_scale=guidance_scale,
+            width=width,
+            height=height,
+            seeds=seeds,
+            micro_batch_size=micro_batch_size,
+            preview_every=preview_every,
+            on_preview=on_preview,
+            should_cancel=should_cancel,
+            return_latents=return_latents,
+            cache_interval=cache_interval,
+            cache_depth=cache_depth,
+            guidance_cutoffs=guidance_cutoffs,
+        )) as chunks:
+            async for chunk in chunks:
+                out_all.extend(chunk)
+        return out_all
+
+    async def iter_batch_same_shape(
+        self,
+        *,
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seeds: Optional[List[Optional[int]]] = None,
+        micro_batch_size: int = 4,
+        preview_every: int = 0,
+        on_preview: Optional[PreviewCallback] = None,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        return_latents: bool = False,
+        cache_interval: int = 1,
+        cache_depth: float = 0.5,
+        guidance_cutoffs: Optional[List[float]] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        await self.ensure_loaded()
+
+        N = len(prompts)
+        assert len(negative_prompts) == N, "negative_prompts length mismatch"
+        if seeds is None:
+            seeds = [None] * N
+        assert len(seeds) == N, "seeds length mismatch"
+        if guidance_cutoffs is None:
+            guidance_cutoffs = [1.0] * N
+        guide_steps = [sd3_ops.cfg_steps(num_inference_steps, guidance_scale, c) for c in guidance_cutoffs]
+        step = max(1, micro_batch_size)
+        loop = asyncio.get_running_loop()
+
+        for start in range(0, N, step):
+            end = min(N, start + step)
+            if should_cancel is not None and should_cancel():
+                raise GenerationCancelled("Generation cancelled")
+            queued = time.perf_counter()
+            async with self._infer_sem:
+                started = time.perf_counter()
+                try:
+                    images = await loop.run_in_executor(
+                        None, profiling.in_context(self._render), start, prompts[start:end], seeds[start:end],
+                        num_inference_steps, guidance_scale, width, height, preview_every, on_preview, should_cancel,
+                        cache_interval, cache_depth, guide_steps[start:end],
+                    )
+                except GenerationCancelled:
+                    raise
+                except Exception as e:
+                    raise GenerationError(f"Image batch generation failed: {e}")
+                seconds = time.perf_counter() - started
+            with self._stats_lock:
+                self._micro_batches += 1
+                self._busy_s += seconds
+                self._queue_waits.append(started - queued)
+
+            timing = {"batch_start": start, "batch_size": end - start, "seconds": seconds}
+            yield [
+                {
+                    "image": image,
+                    "warnings": [],
+                    "token_info": [],
+                    "prompt": prompts[start + i],
+                    "negative_prompt": negative_prompts[start + i],
+                    "seed": seeds[start + i],
+                    "attention_backend": "stub",
+                    "timing": timing,
+                    "feature_cache": {"interval": cache_interval} if cache_interval > 1 else None,
+                    "cfg_steps": guide_steps[start + i],
+                    **({"latents": torch.zeros(1, LATENT_CHANNELS, height // 8, width // 8, dtype=torch.float16)}
+                       if return_latents else {}),
+                }
+                for i, image in enumerate(images)
+            ]
+
+    async def infer_variations(
+        self,
+        *,
+        prompt: str,
+        negative_prompt: Optional[str],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        seed: Optional[int],
+        count: int,
+        shared_steps: int,
+        strength: float,
+        micro_batch_size: int = 4,
+        guidance_cutoff: float = 1.0,
+    ) -> List[Dict[str, Any]]:
+        base_seed = int(seed) if seed is not None else random.randrange(2 ** 32)
+        shared_steps = max(0, min(shared_steps, num_inference_steps - 1))
+        outs = await self.infer_batch_same_shape(
+            prompts=[prompt] * count,
+            negative_prompts=[negative_prompt] * count,
+            num_inference_steps=num_inference_steps - shared_steps,
+            guidance_scale=guidance_scale,
+            width=width,
+            height=height,
+            seeds=[base_seed + 1 + i for i in range(count)],
+            micro_batch_size=micro_batch_size,
+            guidance_cutoffs=[guidance_cutoff] * count,
+        )
+        return [
+            {**o, "variation": i, "seed": base_seed, "shared_steps": shared_steps}
+            for i, o in enumerate(outs)
+        ]
+
+    async def refine(
+        self,
+        *,
+        latents: List[torch.Tensor],
+        prompts: List[str],
+        negative_prompts: List[Optional[str]],
+        seeds: List[int],
+        num_inference_steps: int,
+        guidance_scale: float,
+        width: int,
+        height: int,
+        strength: float,
+        micro_batch_size: int = 4,
+    ) -> List[Dict[str, Any]]:
+        start_step = min(num_inference_steps - 1, int(round(num_inference_steps * (1.0 - strength))))
+        outs = await self.infer_batch_same_shape(
+            prompts=prompts,
+            negative_prompts=negative_prompts,
+            num_inference_steps=num_inference_steps - start_step,
+            guidance_scale=guidance_scale,
+            width=width,
+            height=height,
+            seeds=seeds,
+            micro_batch_size=micro_batch_size,
+        )
+        return [{**o, "refine_steps": num_inference_steps - start_step} for o in outs]
+
+    async def infer(self, **kwargs) -> Dict[str, Any]:
+        res = await self.infer_batch_same_shape(
+            prompts=[kwargs.get("prompt", "")],
+            negative_prompts=[kwargs.get("negative_prompt")],
+            num_inference_steps=kwargs.get("num_inference_steps", 44),
+            guidance_scale=kwargs.get("guidance_scale", 7.5),
+            width=kwargs.get("width", 1024),
+            height=kwargs.get("height", 1024),
+            seeds=[kwargs.get("seed")],
+            micro_batch_size=1,
+            cache_interval=kwargs.get("cache_interval", 1),
+            cache_depth=kwargs.get("cache_depth", 0.5),
+            guidance_cutoffs=[kwargs.get("guidance_cutoff", 1.0)],
+        )
+        return res[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            waits = list(self._queue_waits)
+            return {
+                "micro_batches": self._micro_batches,
+                "busy_seconds": round(self._busy_s, 3),
+                "queue_wait_ms": _percentiles(waits),
+            }
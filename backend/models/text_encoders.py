@@ -0,0 +1,101 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import torch
+
+from ..core.config import TEXT_ENCODER_MODES
+from ..core.logging import get_logger
+from . import sd3_ops
+
+ENCODER_NAMES = ("text_encoder", "text_encoder_2", "text_encoder_3")
+
+
+def _module_bytes(module: Optional[torch.nn.Module]) -> int:
+    if module is None:
+        return 0
+    total = 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        total += tensor.numel() * tensor.element_size()
+    # Dynamically quantized linears keep packed int8 weights outside parameters().
+    for sub in module.modules():
+        if isinstance(sub, torch.ao.nn.quantized.dynamic.Linear):
+            weight = sub.weight()
+            total += weight.numel() * weight.element_size()
+    return total
+
+
+class TextEncoderRunner:
+    def __init__(self, pipe: Any, mode: str, device: str, dtype: torch.dtype):
+        if mode not in TEXT_ENCODER_MODES:
+            raise ValueError(f"Unknown text encoder mode {mode!r}")
+        self.mode = mode
+        self.device = device
+        self.dtype = dtype
+        self.logger = get_logger(self.__class__.__name__)
+        self._encodes = 0
+        self._total_s = 0.0
+        self._last_s = 0.0
+
+        self._pipe = pipe
+        if mode in ("int8", "offload"):
+            # Encoders move to a side pipeline so the main pipeline's device stays the transformer's.
+            self._pipe = pipe.__class__(**{**pipe.components, "transformer": None, "vae": None})
+            pipe.register_modules(**{name: None for name in ENCODER_NAMES})
+
+        if mode == "int8":
+            self._quantize()
+        elif mode == "offload":
+            for encoder in self._encoders():
+                encoder.to("cpu")
+
+        self.memory_bytes = {name: _module_bytes(getattr(self._pipe, name, None)) for name in ENCODER_NAMES}
+        self.logger.info(
+            f"Text encoders mode={mode} | "
+            + ", ".join(f"{k}={v / 1024 ** 2:.0f}MB" for k, v in self.memory_bytes.items())
+        )
+
+    def _encoders(self) -> List[torch.nn.Module]:
+        return [m for m in (getattr(self._pipe, name, None) for name in ENCODER_NAMES) if m is not None]
+
+    def _quantize(self) -> None:
+        for encoder in self._encoders():
+            encoder.to("cpu", dtype=torch.float32)
+        t5 = getattr(self._pipe, "text_encoder_3", None)
+        if t5 is not None:
+            quantized = torch.ao.quantization.quantize_dynamic(t5, {torch.nn.Linear}, dtype=torch.qint8)
+            self._pipe.register_modules(text_encoder_3=quantized)
+
+    def encode(
+        self, prompts: List[str], negative_prompts: List[Optional[str]]
+    ) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor]:
+        start = time.perf_counter()
+        if self.mode == "int8":
+            embeds = sd3_ops.encode_prompts(self._pipe, prompts, negative_prompts, torch.device("cpu"))
+        elif self.mode == "offload":
+            for encoder in self._encoders():
+                encoder.to(self.device)
+            try:
+                embeds = sd3_ops.encode_prompts(self._pipe, prompts, negative_prompts, torch.device(self.device))
+            finally:
+                for encoder in self._encoders():
+                    encoder.to("cpu")
+                if self.device == "cuda":
+                    torch.cuda.empty_cache()
+        else:
+            embeds = sd3_ops.encode_prompts(self._pipe, prompts, negative_prompts, torch.device(self.device))
+        embeds = tuple(e.to(device=self.device, dtype=self.dtype) for e in embeds)
+
+        elapsed = time.perf_counter() - start
+        self._encodes += 1
+        self._total_s += elapsed
+        self._last_s = elapsed
+        return embeds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "memory_mb": {k: round(v / 1024 ** 2, 1) for k, v in self.memory_bytes.items()},
+            "resident_on": "cpu" if self.mode in ("int8", "offload") else self.device,
+            "encodes": self._encodes,
+            "last_encode_ms": round(self._last_s * 1000, 1),
+            "avg_encode_ms": round(self._total_s / self._encodes * 1000, 1) if self._encodes else None,
+        }
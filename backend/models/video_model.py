@@ -1,6 +1,7 @@
+import math
 import torch
 import asyncio
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Callable, Dict, Any
 from PIL import Image
 import numpy as np
 
@@ -14,7 +15,16 @@ from diffusers import StableVideoDiffusionPipeline
 from ..core.config import get_settings
 from ..core.device import DeviceManager
 from ..core.exceptions import ModelLoadError, GenerationError
+from ..core import profiling
 from .base import BaseModelManager
+from .frame_interpolation import interpolate_frames
+
+# Rough peak bytes per output pixel per frame in the SVD temporal VAE decoder (fp16).
+DECODE_BYTES_PER_PIXEL = 1536
+MIN_DIFFUSION_FRAMES = 8
+MAX_DIFFUSION_FRAMES = 25
+# In-between frames used to bridge the last frame back to the first in "flow" loops.
+SEAM_STEPS = 4
 
 
 class VideoModelManager(BaseModelManager):
@@ -70,6 +80,32 @@ class VideoModelManager(BaseModelManager):
             return frames
         return frames + frames[-2:0:-1]
     
+    @staticmethod
+    def diffusion_frames(num_frames: int, interpolation_factor: int) -> int:
+        if interpolation_factor < 2 or not HAS_CV2:
+            return min(num_frames, MAX_DIFFUSION_FRAMES)
+        frames = max(MIN_DIFFUSION_FRAMES, math.ceil((num_frames - 1) / interpolation_factor) + 1)
+        return min(frames, MAX_DIFFUSION_FRAMES)
+
+    def _finish_clip(
+        self,
+        frames: List[Image.Image],
+        num_frames: int,
+        enhance_quality: bool,
+        interpolation_factor: int,
+        loop_mode: str,
+    ) -> List[Image.Image]:
+        if enhance_quality:
+            with profiling.span("enhance_frames"):
+                frames = self._enhance_frames(frames)
+        with profiling.span("interpolate"):
+            # The diffused frames can overshoot once interpolated (MIN_DIFFUSION_FRAMES), so trim to the request.
+            frames = interpolate_frames(frames, interpolation_factor)[:num_frames]
+            if loop_mode == "flow":
+                seam = interpolate_frames([frames[-1], frames[0]], max(SEAM_STEPS, interpolation_factor))
+                return frames + seam[1:-1]
+        return self._create_seamless_loop(frames)
+
     def _enhance_frames(self, frames: List[Image.Image]) -> List[Image.Image]:
         if not HAS_CV2:
             return frames
@@ -84,59 +120,126 @@ class VideoModelManager(BaseModelManager):
         
         return enhanced
     
-    async def img2vid_clip(
+    def _decode_chunk_size(self, width: int, height: int, num_frames: int) -> int:
+        if self.device != "cuda":
+            return min(8, num_frames)
+        # VAE temporal decode dominates peak memory; size chunks to half of what is free now.
+        budget = DeviceManager.available_memory_bytes(self.device) // 2
+        return max(1, min(num_frames, budget // (width * height * DECODE_BYTES_PER_PIXEL)))
+
+    def group_by_resolution(self, sizes: List[Tuple[int, int]]) -> Dict[Tuple[int, int], List[int]]:
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for i, size in enumerate(sizes):
+            groups.setdefault(self._resize_for_model(*size), []).append(i)
+        return groups
+
+    async def img2vid_batch(
         self,
-        base_image: Image.Image,
+        images: List[Image.Image],
         num_frames: int = 24,
         fps: int = 24,
         motion_bucket_id: int = 96,
         noise_aug_strength: float = 0.02,
-        seed: Optional[int] = None,
+        seeds: Optional[List[Optional[int]]] = None,
         enhance_quality: bool = True,
-    ) -> Tuple[List[Image.Image], int, int]:
+        on_step: Optional[Callable[[int, int], None]] = None,
+        interpolation_factor: int = 1,
+        loop_mode: str = "mirror",
+    ) -> Tuple[List[List[Image.Image]], int, int]:
         await self.ensure_loaded()
-        
-        width, height = base_image.size
-        new_w, new_h = self._resize_for_model(width, height)
-        if (width, height) != (new_w, new_h):
-            image = base_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        else:
-            image = base_image
-        
+
+        sizes = {self._resize_for_model(*image.size) for image in images}
+        if len(sizes) != 1:
+            raise GenerationError("All images in a video batch must resize to the same resolution")
+        width, height = sizes.pop()
+        batch = [
+            image if image.size == (width, height) else image.resize((width, height), Image.Resampling.LANCZOS)
+            for image in images
+        ]
+
+        if seeds is None:
+            seeds = [None] * len(batch)
         generator = None
-        if seed is not None:
-            generator = torch.Generator(device=self.device).manual_seed(seed)
+        if any(s is not None for s in seeds):
+            generator = [
+                torch.Generator(device=self.device).manual_seed(int(s)) if s is not None
+                else torch.Generator(device=self.device)
+                for s in seeds
+            ]
+        # Fewer frames are diffused and the rest are filled by optical flow; SVD is conditioned on the sparser rate.
+        sampled_frames = self.diffusion_frames(num_frames, interpolation_factor)
+        factor = interpolation_factor if sampled_frames != num_frames else 1
+        svd_fps = max(1, round(fps / factor))
+        decode_chunk_size = self._decode_chunk_size(width, height, sampled_frames)
         
+        def _callback(pipe, step: int, timestep, callback_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            on_step(step + 1, pipe.num_timesteps)
+            return callback_kwargs
+
+        self.logger.info(
+            f"SVD batch x{len(batch)} | {width}x{height} frames={sampled_frames}x{factor} "
+            f"decode_chunk={decode_chunk_size}"
+        )
         loop = asyncio.get_running_loop()
         
         try:
-            with torch.inference_mode():
-                result = await loop.run_in_executor(
-                    None,
-                    lambda: self.pipe(
-                        image=image,
-                        num_frames=num_frames,
-                        decode_chunk_size=8,
-                        motion_bucket_id=motion_bucket_id,
-                        noise_aug_strength=noise_aug_strength,
-                        fps=fps,
-                        width=image.width,
-                        height=image.height,
-                        generator=generator,
+            async with self._infer_sem:
+                with torch.inference_mode(), profiling.span("svd"):
+                    result = await loop.run_in_executor(
+                        None,
+                        profiling.in_context(lambda: self.pipe(
+                            image=batch,
+                            num_frames=sampled_frames,
+                            decode_chunk_size=decode_chunk_size,
+                            motion_bucket_id=motion_bucket_id,
+                            noise_aug_strength=noise_aug_strength,
+                            fps=svd_fps,
+                            width=width,
+                            height=height,
+                            generator=generator,
+                            callback_on_step_end=_callback if on_step is not None else None,
+                        ))
                     )
-                )
-            
-            frames = result.frames[0]
-            
-            if enhance_quality:
-                frames = self._enhance_frames(frames)
-            
-            frames = self._create_seamless_loop(frames)
-            
-            return frames, image.width, image.height
+
+            clips = []
+            for frames in result.frames:
+                clips.append(await loop.run_in_executor(
+                    None,
+                    profiling.in_context(self._finish_clip),
+                    frames, num_frames, enhance_quality, factor, loop_mode,
+                ))
+
+            return clips, width, height
             
         except Exception as e:
             raise GenerationError(f"Video generation failed: {e}")
 
+    async def img2vid_clip(
+        self,
+        base_image: Image.Image,
+        num_frames: int = 24,
+        fps: int = 24,
+        motion_bucket_id: int = 96,
+        noise_aug_strength: float = 0.02,
+        seed: Optional[int] = None,
+        enhance_quality: bool = True,
+        on_step: Optional[Callable[[int, int], None]] = None,
+        interpolation_factor: int = 1,
+        loop_mode: str = "mirror",
+    ) -> Tuple[List[Image.Image], int, int]:
+        clips, width, height = await self.img2vid_batch(
+            [base_image],
+            num_frames=num_frames,
+            fps=fps,
+            motion_bucket_id=motion_bucket_id,
+            noise_aug_strength=noise_aug_strength,
+            seeds=[seed],
+            enhance_quality=enhance_quality,
+            on_step=on_step,
+            interpolation_factor=interpolation_factor,
+            loop_mode=loop_mode,
+        )
+        return clips[0], width, height
+
     async def infer(self, **kwargs):
         return await self.img2vid_clip(**kwargs)
\ No newline at end of file
@@ -0,0 +1,93 @@
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from typing import Iterator, List, Dict, Any
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _StreamSink(io.RawIOBase):
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class BatchArchiver:
+    def __init__(self, batch_dir: str):
+        self.batch_dir = batch_dir
+
+    def list_images(self) -> List[str]:
+        return sorted(
+            name for name in os.listdir(self.batch_dir)
+            if name.lower().endswith(".png") and os.path.isfile(os.path.join(self.batch_dir, name))
+        )
+
+    def manifest(self, images: List[str]) -> bytes:
+        path = os.path.join(self.batch_dir, "manifest.json")
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                return f.read()
+        entries: List[Dict[str, Any]] = []
+        for name in images:
+            stem = os.path.splitext(name)[0]
+            index = stem.rsplit("_", 1)[-1]
+            entries.append({"file": name, "index": int(index) if index.isdigit() else None})
+        return json.dumps({"batch_id": os.path.basename(self.batch_dir), "items": entries}, indent=2).encode("utf-8")
+
+    def stream_zip(self) -> Iterator[bytes]:
+        images = self.list_images()
+        sink = _StreamSink()
+        # The sink is not seekable, so zipfile writes data descriptors instead of rewinding.
+        with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            zf.writestr("manifest.json", self.manifest(images), compress_type=zipfile.ZIP_DEFLATED)
+            yield sink.drain()
+            for name in images:
+                path = os.path.join(self.batch_dir, name)
+                info = zipfile.ZipInfo.from_file(path, arcname=name)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(path, "rb") as src, zf.open(info, mode="w", force_zip64=True) as dest:
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        dest.write(chunk)
+                        yield sink.drain()
+                yield sink.drain()
+        yield sink.drain()
+
+    def stream_tar(self) -> Iterator[bytes]:
+        images = self.list_images()
+        sink = _StreamSink()
+        with tarfile.open(fileobj=sink, mode="w|") as tar:
+            manifest = self.manifest(images)
+            info = tarfile.TarInfo("manifest.json")
+            info.size = len(manifest)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(manifest))
+            yield sink.drain()
+            for name in images:
+                path = os.path.join(self.batch_dir, name)
+                info = tar.gettarinfo(path, arcname=name)
+                with open(path, "rb") as src:
+                    tar.addfile(info, src)
+                yield sink.drain()
+        yield sink.drain()
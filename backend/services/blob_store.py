@@ -0,0 +1,133 @@
+import base64
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import torch
+from PIL import Image
+
+from ..core.config import get_settings
+from ..core.logging import get_logger
+
+
+# Parsed result indexes kept in memory, so paging a large job does not re-read its whole index.
+INDEX_CACHE_JOBS = 16
+
+
+class JobResultStore:
+    def __init__(self, root: str, url_prefix: str):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self._lock = threading.Lock()
+        self._index_cache: "OrderedDict[str, Tuple[int, List[Dict[str, Any]]]]" = OrderedDict()
+        self.logger = get_logger(__name__)
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    def _index_path(self, job_id: str) -> str:
+        return os.path.join(self._job_dir(job_id), "results.jsonl")
+
+    def put_image(self, job_id: str, index: int, img: Image.Image) -> Dict[str, str]:
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        name = f"img_{index:04d}.png"
+        img.save(os.path.join(job_dir, name), format="PNG", optimize=True)
+        return {"blob": name, "file_url": f"{self.url_prefix}/{job_id}/{name}"}
+
+    def put_bytes(self, job_id: str, index: int, data: bytes) -> Dict[str, str]:
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        name = f"img_{index:04d}.png"
+        with open(os.path.join(job_dir, name), "wb") as f:
+            f.write(data)
+        return {"blob": name, "file_url": f"{self.url_prefix}/{job_id}/{name}"}
+
+    def append(self, job_id: str, entry: Dict[str, Any]) -> None:
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        line = json.dumps(entry, default=str)
+        with self._lock, open(self._index_path(job_id), "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def entries(self, job_id: str) -> List[Dict[str, Any]]:
+        path = self._index_path(job_id)
+        if not os.path.isfile(path):
+            return []
+        with self._lock:
+            offset, items = self._index_cache.pop(job_id, (0, []))
+            # The index is append-only, so only lines written since the last read are parsed.
+            with open(path, "rb") as f:
+                f.seek(offset)
+                tail = f.read()
+            complete = tail.rfind(b"\n") + 1
+            if complete:
+                items = items + [json.loads(line) for line in tail[:complete].splitlines() if line.strip()]
+                items.sort(key=lambda e: e.get("index", 0))
+            self._index_cache[job_id] = (offset + complete, items)
+            while len(self._index_cache) > INDEX_CACHE_JOBS:
+                self._index_cache.popitem(last=False)
+        return items
+
+    def page(self, job_id: str, offset: int, limit: int, inline: bool = False) -> Dict[str, Any]:
+        items = self.entries(job_id)
+        window = items[offset:offset + limit]
+        if inline:
+            window = [self._inline(job_id, e) for e in window]
+        return {"total": len(items), "offset": offset, "limit": limit, "results": window}
+
+    def _inline(self, job_id: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        blob: Optional[str] = entry.get("blob")
+        if not blob:
+            return entry
+        with open(os.path.join(self._job_dir(job_id), blob), "rb") as f:
+            encoded = base64.b64encode(f.read()).decode("utf-8")
+        return {**entry, "image_url": f"data:image/png;base64,{encoded}"}
+
+    def delete(self, job_id: str) -> None:
+        with self._lock:
+            self._index_cache.pop(job_id, None)
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def expire(self, max_age_seconds: float, keep: Iterable[str] = ()) -> int:
+        # Directory mtimes move with every write, so this also catches jobs orphaned by a restart.
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - max_age_seconds
+        keep = set(keep)
+        removed = 0
+        for name in os.listdir(self.root):
+            path = self._job_dir(name)
+            try:
+                stale = os.path.isdir(path) and os.path.getmtime(path) < cutoff
+            except OSError:
+                continue
+            if stale and name not in keep:
+                self.delete(name)
+                removed += 1
+        if removed:
+            self.logger.info(f"Expired {removed} result directories from {self.root}")
+        return removed
+
+
+
+class DraftStore(JobResultStore):
+    # Drafts keep their final latents next to the preview so refinement can resume in latent space.
+    def put_latents(self, draft_id: str, index: int, latents: torch.Tensor) -> str:
+        os.makedirs(self._job_dir(draft_id), exist_ok=True)
+        name = f"latents_{index:04d}.pt"
+        torch.save(latents.to("cpu", torch.float16).contiguous(), os.path.join(self._job_dir(draft_id), name))
+        return name
+
+    def load_latents(self, draft_id: str, name: str) -> torch.Tensor:
+        return torch.load(os.path.join(self._job_dir(draft_id), name), map_location="cpu", weights_only=True)
+
+    def exists(self, draft_id: str) -> bool:
+        return os.path.isfile(self._index_path(draft_id))
+
+
+settings = get_settings()
+job_result_store = JobResultStore(os.path.join(settings.output_dir, "jobs"), "/files/jobs")
+draft_store = DraftStore(os.path.join(settings.output_dir, "drafts"), "/files/drafts")
@@ -0,0 +1,45 @@
+import math
+from typing import Tuple
+from PIL import Image, ImageOps
+
+ASPECT_RATIOS = (
+    (1, 1), (5, 4), (4, 5), (4, 3), (3, 4), (3, 2), (2, 3), (16, 9), (9, 16), (21, 9), (9, 21),
+)
+LONG_SIDES = tuple(range(256, 2049, 128))
+ALIGN = 64
+# Beyond these the resize back to the requested size would visibly distort it, so the request runs as is.
+MAX_ASPECT_ERROR = 0.15
+MAX_SCALE_ERROR = 1.25
+
+def _align(value: float) -> int:
+    return max(ALIGN, int(math.ceil(value / ALIGN)) * ALIGN)
+
+
+def bucket_for(width: int, height: int) -> Tuple[int, int]:
+    aspect = math.log(width / height)
+    ratio_w, ratio_h = min(ASPECT_RATIOS, key=lambda r: abs(math.log(r[0] / r[1]) - aspect))
+    if abs(math.log(ratio_w / ratio_h) - aspect) > MAX_ASPECT_ERROR:
+        return width, height
+    ratio = max(ratio_w, ratio_h) / min(ratio_w, ratio_h)
+
+    # Nearest bucket by pixel count; post-processing resizes and center-crops in either direction.
+    long_side, short_side = min(
+        ((candidate, _align(candidate / ratio)) for candidate in LONG_SIDES),
+        key=lambda b: abs(math.log(b[0] * b[1] / (width * height))),
+    )
+    if abs(math.log(long_side * short_side / (width * height))) > math.log(MAX_SCALE_ERROR):
+        return width, height
+
+    if ratio_w >= ratio_h:
+        return long_side, short_side
+    return short_side, long_side
+
+
+def scaled_size(width: int, height: int, scale: float) -> Tuple[int, int]:
+    return _align(width * scale), _align(height * scale)
+
+
+def fit_to_size(img: Image.Image, width: int, height: int) -> Image.Image:
+    if img.size == (width, height):
+        return img
+    return ImageOps.fit(img, (width, height), Image.Resampling.LANCZOS, centering=(0.5, 0.5))
@@ -0,0 +1,449 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import httpx
+
+from ..core.config import get_settings
+from ..core.exceptions import GenerationError, GenerationCancelled
+from ..core.logging import get_logger
+from ..models.schemas import BatchImageRequest, ImageGenerationRequest
+
+# Marks requests sent by a coordinator, so a node that is itself a coordinator runs them locally.
+SHARD_HEADER = "X-Emberglow-Shard"
+# Several shards per node keep every node busy until the end and make a retried shard cheap.
+SHARDS_PER_NODE = 4
+TERMINAL = {"done", "error", "cancelled"}
+# A node that keeps failing is parked and gets no shards until it re-registers or the park expires.
+PARK_AFTER_FAILURES = 3
+PARK_SECONDS = 300.0
+# Busy replies (429/503) do not count as attempts, but a shard nobody accepts for this long fails the job.
+MAX_BUSY_SECONDS = 900.0
+# How long an abandoned shard job is polled for deletion; node retention removes anything left after that.
+ABANDON_SECONDS = 300.0
+
+StoreCallback = Callable[[int, str, Dict[str, Any], bytes], None]
+
+
+class NodeFailure(Exception):
+    def __init__(self, message: str, retry_after: float = 0.0, busy: bool = False):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.busy = busy
+
+
+@dataclass
+class Shard:
+    shard_id: int
+    body: Dict[str, Any]
+    indices: List[int]
+    attempts: int = 0
+    completed: int = 0
+    failed_on: Set[str] = field(default_factory=set)
+    busy_since: Optional[float] = None
+
+
+class Node:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.registered_at = time.time()
+        self.shards = 0
+        self.items = 0
+        self.busy_s = 0.0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.cooldown_until = 0.0
+
+    def succeeded(self, items: int, seconds: float) -> None:
+        self.shards += 1
+        self.items += items
+        self.busy_s += seconds
+        self.consecutive_failures = 0
+
+    def failed(self, error: NodeFailure) -> float:
+        if not error.busy:
+            self.failures += 1
+            self.consecutive_failures += 1
+        self.last_error = str(error)
+        # Back off exponentially on repeated failures so a dead node stops draining the shard queue.
+        delay = max(error.retry_after, min(60.0, 2.0 ** self.consecutive_failures))
+        if self.consecutive_failures >= PARK_AFTER_FAILURES:
+            delay = max(delay, PARK_SECONDS)
+        self.cooldown_until = time.time() + delay
+        return delay
+
+    def reset(self) -> None:
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    @property
+    def parked(self) -> bool:
+        return self.consecutive_failures >= PARK_AFTER_FAILURES and time.time() < self.cooldown_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "shards": self.shards,
+            "items": self.items,
+            "busy_seconds": round(self.busy_s, 2),
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "cooling_down": time.time() < self.cooldown_until,
+            "parked": self.parked,
+        }
+
+
+class NodeRegistry:
+    def __init__(self, urls: List[str]):
+        self._nodes: Dict[str, Node] = {}
+        self.logger = get_logger(__name__)
+        for url in urls:
+            self.register(url)
+
+    def register(self, url: str) -> Node:
+        url = url.rstrip("/")
+        node = self._nodes.get(url)
+        if node is None:
+            node = self._nodes[url] = Node(url)
+            self.logger.info(f"Registered worker node {url}")
+        else:
+            # A node re-announces itself after a restart, so it gets a clean slate.
+            node.reset()
+        return node
+
+    def unregister(self, url: str) -> bool:
+        removed = self._nodes.pop(url.rstrip("/"), None) is not None
+        if removed:
+            self.logger.info(f"Unregistered worker node {url}")
+        return removed
+
+    def get(self, url: str) -> Optional[Node]:
+        return self._nodes.get(url)
+
+    def nodes(self) -> List[Node]:
+        return list(self._nodes.values())
+
+    def active(self) -> List[Node]:
+        return [n for n in self._nodes.values() if not n.parked]
+
+
+class ShardCoordinator:
+    def __init__(
+        self,
+        registry: NodeRegistry,
+        api_key: Optional[str],
+        min_items: int,
+        max_shard_size: int,
+        node_inflight: int,
+        max_attempts: int,
+        poll_interval: float,
+    ):
+        self.registry = registry
+        self.api_key = api_key
+        self.min_items = min_items
+        self.max_shard_size = max(1, max_shard_size)
+        self.node_inflight = max(1, node_inflight)
+        self.max_attempts = max(1, max_attempts)
+        self.poll_interval = poll_interval
+        self._abandoned: Set[asyncio.Task] = set()
+        self.logger = get_logger(__name__)
+
+    def should_shard(self, count: int) -> bool:
+        return bool(self.registry.active()) and count >= self.min_items
+
+    def shard_size(self, count: int, micro_batch_size: int) -> int:
+        nodes = max(1, len(self.registry.active()))
+        size = min(self.max_shard_size, math.ceil(count / (nodes * SHARDS_PER_NODE)))
+        # Whole micro-batches only, so no node runs a ragged tail per shard.
+        return max(micro_batch_size, math.ceil(size / micro_batch_size) * micro_batch_size)
+
+    def plan(
+        self,
+        request: BatchImageRequest,
+        groups: Dict[tuple, List[Tuple[int, ImageGenerationRequest]]],
+    ) -> List[Shard]:
+        shards: List[Shard] = []
+        for pairs in groups.values():
+            size = self.shard_size(len(pairs), request.micro_batch_size)
+            for start in range(0, len(pairs), size):
+                chunk = pairs[start:start + size]
+                items = []
+                for idx, it in chunk:
+                    # Pin start_seed + index here; a node only sees its shard-local indices.
+                    seed = it.seed if it.seed is not None else (
+                        request.start_seed + idx if request.start_seed is not None else None
+                    )
+                    items.append({**it.dict(), "seed": seed})
+                body = {
+                    "items": items,
+                    "micro_batch_size": request.micro_batch_size,
+                    "bucketing": request.bucketing,
+                    "cache_interval": request.cache_interval,
+                    "cache_depth": request.cache_depth,
+                }
+                shards.append(Shard(len(shards), body, [idx for idx, _ in chunk]))
+        return shards
+
+    def _client(self) -> httpx.AsyncClient:
+        headers = {SHARD_HEADER: "1"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return httpx.AsyncClient(headers=headers, timeout=httpx.Timeout(60.0))
+
+    async def _request(self, client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            raise NodeFailure(f"{method} {url} failed: {e!r}")
+        if resp.status_code in (429, 503):
+            retry_after = float(resp.headers.get("Retry-After", 5))
+            raise NodeFailure(f"{url} is busy ({resp.status_code})", retry_after=retry_after, busy=True)
+        if resp.status_code >= 400:
+            raise NodeFailure(f"{method} {url} returned {resp.status_code}: {resp.text[:200]}")
+        return resp
+
+    async def _cancel_remote(self, client: httpx.AsyncClient, node: Node, remote_id: str) -> None:
+        try:
+            await client.post(f"{node.url}/api/image/job/{remote_id}/cancel", timeout=5.0)
+        except httpx.HTTPError:
+            pass
+
+    async def _delete_remote(self, client: httpx.AsyncClient, node: Node, remote_id: str) -> None:
+        # The results now live on the coordinator; without this every node keeps a copy until restart.
+        try:
+            await client.delete(f"{node.url}/api/image/job/{remote_id}", timeout=10.0)
+        except httpx.HTTPError:
+            pass
+
+    async def _abandon_remote(self, node: Node, remote_id: str) -> None:
+        # A cancelled job only stops between micro-batches and a running job cannot be deleted, so wait for it.
+        async with self._client() as client:
+            await self._cancel_remote(client, node, remote_id)
+            deadline = time.time() + ABANDON_SECONDS
+            while time.time() < deadline:
+                try:
+                    resp = await client.delete(f"{node.url}/api/image/job/{remote_id}", timeout=10.0)
+                except httpx.HTTPError:
+                    return
+                if resp.status_code != 409:
+                    return
+                await asyncio.sleep(self.poll_interval)
+
+    def _abandon(self, node: Node, remote_id: str) -> None:
+        task = asyncio.create_task(self._abandon_remote(node, remote_id))
+        self._abandoned.add(task)
+        task.add_done_callback(self._abandoned.discard)
+
+    async def _collect(
+        self,
+        client: httpx.AsyncClient,
+        node: Node,
+        shard: Shard,
+        remote_id: str,
+        stored: Set[int],
+        store: StoreCallback,
+    ) -> None:
+        offset = 0
+        fetches = asyncio.Semaphore(8)
+
+        async def _fetch(entry: Dict[str, Any]) -> None:
+            index = shard.indices[entry["index"]]
+            if index in stored or not entry.get("file_url"):
+                return
+            # Only follow paths under the node's own /files mount, never a URL the node hands back.
+            if not entry["file_url"].startswith("/files/") or ".." in entry["file_url"]:
+                raise NodeFailure(f"{node.url} returned an unexpected file_url {entry['file_url'][:100]!r}")
+            async with fetches:
+                resp = await self._request(client, "GET", f"{node.url}{entry['file_url']}")
+            # PNG bytes are kept as the node encoded them; decoding and re-encoding would only cost CPU.
+            store(index, node.url, entry, resp.content)
+            stored.add(index)
+
+        while True:
+            resp = await self._request(
+                client, "GET", f"{node.url}/api/image/job/{remote_id}/results",
+                params={"offset": offset, "limit": 1000},
+            )
+            page = resp.json()
+            await asyncio.gather(*(_fetch(e) for e in page["results"]))
+            offset += len(page["results"])
+            if not page["results"] or offset >= page["total"]:
+                return
+
+    async def _run_shard(
+        self,
+        client: httpx.AsyncClient,
+        node: Node,
+        shard: Shard,
+        stored: Set[int],
+        store: StoreCallback,
+        on_progress: Callable[[int], None],
+    ) -> None:
+        started = time.perf_counter()
+        resp = await self._request(client, "POST", f"{node.url}/api/image/generate-batch-async", json=shard.body)
+        remote_id = resp.json()["job_id"]
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                job = (await self._request(client, "GET", f"{node.url}/api/image/job/{remote_id}")).json()
+                completed = job.get("completed") or 0
+                if completed > shard.completed:
+                    on_progress(completed - shard.completed)
+                    shard.completed = completed
+                if job["status"] in TERMINAL:
+                    break
+            if job["status"] != "done":
+                raise NodeFailure(f"{node.url} job {remote_id} ended {job['status']}: {job.get('error')}")
+            await self._collect(client, node, shard, remote_id, stored, store)
+        except (asyncio.CancelledError, NodeFailure):
+            # The shard is retried elsewhere, so whatever this node produced for it is deleted there.
+            self._abandon(node, remote_id)
+            raise
+        await self._delete_remote(client, node, remote_id)
+        node.succeeded(len(shard.indices), time.perf_counter() - started)
+
+    async def run(
+        self,
+        shards: List[Shard],
+        store: StoreCallback,
+        on_progress: Callable[[int], None],
+        should_cancel: Callable[[], bool],
+    ) -> Dict[str, Any]:
+        waiting: List[Shard] = list(shards)
+        wake = asyncio.Event()
+        stored: Set[int] = set()
+        pending = len(shards)
+        retries = 0
+        fatal: List[str] = []
+        finished = asyncio.Event()
+        used: Set[str] = set()
+
+        def _take(node: Node) -> Optional[Shard]:
+            healthy = {n.url for n in self.registry.active()}
+            for i, shard in enumerate(waiting):
+                # A retry goes to a node that has not failed it yet; only when every healthy node has can one try again.
+                if node.url not in shard.failed_on or healthy <= shard.failed_on:
+                    return waiting.pop(i)
+            return None
+
+        async def _worker(node: Node) -> None:
+            nonlocal pending, retries
+            while self.registry.get(node.url) is node:
+                wait = node.cooldown_until - time.time()
+                if wait > 0:
+                    # Short naps, so a node that re-registers during its backoff is picked up quickly.
+                    await asyncio.sleep(min(wait, self.poll_interval))
+                    continue
+                shard = _take(node)
+                if shard is None:
+                    wake.clear()
+                    try:
+                        await asyncio.wait_for(wake.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                used.add(node.url)
+                try:
+                    await self._run_shard(client, node, shard, stored, store, on_progress)
+                except NodeFailure as e:
+                    delay = node.failed(e)
+                    on_progress(-shard.completed)
+                    shard.completed = 0
+                    if e.busy:
+                        shard.busy_since = shard.busy_since or time.time()
+                    else:
+                        shard.busy_since = None
+                        shard.attempts += 1
+                        shard.failed_on.add(node.url)
+                        retries += 1
+                    self.logger.warning(
+                        f"Shard {shard.shard_id} failed on {node.url} (attempt {shard.attempts}): {e}; "
+                        f"node backs off {delay:.0f}s"
+                    )
+                    if shard.attempts >= self.max_attempts:
+                        fatal.append(f"Shard {shard.shard_id} failed {shard.attempts} times, last on {node.url}: {e}")
+                        finished.set()
+                        return
+                    if shard.busy_since is not None and time.time() - shard.busy_since > MAX_BUSY_SECONDS:
+                        fatal.append(
+                            f"Shard {shard.shard_id} was refused as busy for {MAX_BUSY_SECONDS:.0f}s, "
+                            f"last by {node.url}: {e}"
+                        )
+                        finished.set()
+                        return
+                    waiting.append(shard)
+                    wake.set()
+                    continue
+                pending -= 1
+                if pending == 0:
+                    finished.set()
+
+        tasks: Dict[Tuple[str, int], asyncio.Task] = {}
+        async with self._client() as client:
+            try:
+                while not finished.is_set():
+                    if should_cancel():
+                        raise GenerationCancelled("Generation cancelled")
+                    nodes = self.registry.nodes()
+                    if not self.registry.active():
+                        raise GenerationError("No healthy worker nodes registered")
+                    # Nodes registered mid-job pick up shards too.
+                    for node in nodes:
+                        for slot in range(self.node_inflight):
+                            task = tasks.get((node.url, slot))
+                            if task is None or task.done():
+                                tasks[(node.url, slot)] = asyncio.create_task(_worker(node))
+                    try:
+                        await asyncio.wait_for(finished.wait(), timeout=self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                for task in tasks.values():
+                    task.cancel()
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        if fatal:
+            raise GenerationError(fatal[0])
+        return {"shards": len(shards), "retries": retries, "nodes": sorted(used)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "min_items": self.min_items,
+            "max_shard_size": self.max_shard_size,
+            "node_inflight": self.node_inflight,
+            "nodes": [n.stats() for n in self.registry.nodes()],
+        }
+
+
+async def announce(coordinator_url: str, node_url: str, api_key: Optional[str], interval: float = 5.0) -> None:
+    # Workers may start before the coordinator, so keep trying until it accepts the registration.
+    logger = get_logger(__name__)
+    if not api_key:
+        logger.warning("COORDINATOR_URL is set but neither CLUSTER_API_KEY nor API_KEY is; not registering")
+        return
+    headers = {"Authorization": f"Bearer {api_key}"}
+    async with httpx.AsyncClient(headers=headers, timeout=httpx.Timeout(10.0)) as client:
+        while True:
+            try:
+                resp = await client.post(f"{coordinator_url.rstrip('/')}/api/cluster/nodes", json={"url": node_url})
+                if resp.status_code < 400:
+                    logger.info(f"Registered with coordinator {coordinator_url} as {node_url}")
+                    return
+                logger.warning(f"Coordinator rejected registration: {resp.status_code} {resp.text[:200]}")
+            except httpx.HTTPError as e:
+                logger.warning(f"Coordinator {coordinator_url} unreachable: {e!r}")
+            await asyncio.sleep(interval)
+
+
+settings = get_settings()
+coordinator = ShardCoordinator(
+    NodeRegistry([u.strip() for u in settings.cluster_nodes.split(",") if u.strip()]),
+    settings.cluster_api_key or settings.api_key,
+    settings.cluster_min_items,
+    settings.cluster_max_shard_size,
+    settings.cluster_node_inflight,
+    settings.cluster_max_attempts,
+    settings.cluster_poll_interval,
+)
@@ -0,0 +1,283 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+import numpy as np
+
+from ..core.config import get_settings
+from ..core.device import DeviceManager
+from ..core.exceptions import AdmissionRejected
+from ..core.logging import get_logger
+
+MIN_OBSERVATIONS = 6
+MAX_OBSERVATIONS = 256
+# Observations are written out at most this often, off the request path; flush() writes the rest on shutdown.
+SAVE_INTERVAL_SECONDS = 30.0
+# Priced as a GPU until an engine (ENGINE_ADDRESS) has reported which device it runs on.
+PENDING_DEVICE = "cuda"
+
+# Used until enough runs have been measured on a device:
+# [per micro-batch, per step, per step x megapixel x image x CFG pass, per megapixel x image].
+DEFAULT_COEFFICIENTS = {
+    "cuda": [1.0, 0.01, 0.03, 0.05],
+    "mps": [2.0, 0.05, 0.4, 0.5],
+    "cpu": [5.0, 0.1, 4.0, 2.0],
+}
+
+
+def _features(
+    width: int, height: int, steps: int, guidance_scale: float, batch_size: int, cfg_fraction: float = 1.0
+) -> List[float]:
+    megapixels = width * height / 1e6
+    # The unconditional pass only runs for the cfg_fraction of steps before the guidance cutoff.
+    passes = 1 + cfg_fraction if guidance_scale > 1.0 else 1
+    return [1.0, float(steps), steps * megapixels * batch_size * passes, megapixels * batch_size]
+
+
+class CostModel:
+    def __init__(
+        self,
+        path: str,
+        device: Optional[str] = None,
+        resolve_device: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        self.path = path
+        self._device = device
+        self._resolve_device = resolve_device
+        self._lock = threading.Lock()
+        self._observations: Dict[str, Deque[Tuple[List[float], float]]] = defaultdict(
+            lambda: deque(maxlen=MAX_OBSERVATIONS)
+        )
+        self._coefficients: Dict[str, List[float]] = {}
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.logger = get_logger(__name__)
+        self._load()
+
+    @property
+    def device(self) -> str:
+        if self._device is None and self._resolve_device is not None:
+            self._device = self._resolve_device()
+        return self._device or PENDING_DEVICE
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for device, rows in data.get("observations", {}).items():
+                for x, y in rows:
+                    self._observations[device].append((x, y))
+                self._fit(device)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable cost model at {self.path}: {e}")
+
+    def _save(self, data: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    def _fit(self, device: str) -> None:
+        rows = self._observations[device]
+        if len(rows) < MIN_OBSERVATIONS:
+            return
+        X = np.array([x for x, _ in rows], dtype=np.float64)
+        y = np.array([t for _, t in rows], dtype=np.float64)
+        # Least squares with negative terms dropped and refitted, so no term can reduce a prediction.
+        active = list(range(X.shape[1]))
+        coef = np.zeros(X.shape[1])
+        while active:
+            solution = np.linalg.lstsq(X[:, active], y, rcond=None)[0]
+            if (solution >= 0).all():
+                coef[active] = solution
+                break
+            active = [c for c, v in zip(active, solution) if v >= 0]
+        if not coef.any():
+            # Every term dropped out (noisy timings from a few tiny runs); a zero model would admit anything.
+            self._coefficients.pop(device, None)
+            return
+        self._coefficients[device] = coef.tolist()
+
+    def _coefficients_for(self, device: str) -> List[float]:
+        if device in self._coefficients:
+            return self._coefficients[device]
+        return DEFAULT_COEFFICIENTS.get(device.split(":", 1)[0], DEFAULT_COEFFICIENTS["cpu"])
+
+    def observe(
+        self,
+        width: int,
+        height: int,
+        steps: int,
+        guidance_scale: float,
+        batch_size: int,
+        seconds: float,
+        cfg_fraction: float = 1.0,
+    ) -> None:
+        with self._lock:
+            self._observations[self.device].append(
+                (_features(width, height, steps, guidance_scale, batch_size, cfg_fraction), float(seconds))
+            )
+            self._fit(self.device)
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= SAVE_INTERVAL_SECONDS
+            if due:
+                self._saved_at = time.monotonic()
+        if due:
+            threading.Thread(target=self.flush, name="cost-model-save", daemon=True).start()
+
+    def flush(self) -> None:
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {"observations": {k: list(v) for k, v in self._observations.items()}}
+                self._dirty = False
+                self._saved_at = time.monotonic()
+            try:
+                self._save(data)
+            except OSError as e:
+                self.logger.warning(f"Could not persist cost model: {e}")
+
+    def predict_micro_batch(
+        self, width: int, height: int, steps: int, guidance_scale: float, batch_size: int, cfg_fraction: float = 1.0
+    ) -> float:
+        coef = self._coefficients_for(self.device)
+        x = _features(width, height, steps, guidance_scale, batch_size, cfg_fraction)
+        return max(0.0, sum(c * v for c, v in zip(coef, x)))
+
+    def estimate(
+        self,
+        width: int,
+        height: int,
+        steps: int,
+        guidance_scale: float,
+        count: int,
+        micro_batch_size: int,
+        cfg_fraction: float = 1.0,
+    ) -> float:
+        size = max(1, micro_batch_size)
+        full, rest = divmod(count, size)
+        seconds = full * self.predict_micro_batch(width, height, steps, guidance_scale, size, cfg_fraction)
+        if rest:
+            seconds += self.predict_micro_batch(width, height, steps, guidance_scale, rest, cfg_fraction)
+        return seconds
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "device": self.device,
+            "observations": len(self._observations[self.device]),
+            "fitted": self.device in self._coefficients,
+            "coefficients": [round(c, 6) for c in self._coefficients_for(self.device)],
+        }
+
+
+class AdmissionController:
+    def __init__(self, concurrency: int, budget_seconds: float, window_seconds: int):
+        self.concurrency = max(1, concurrency)
+        self.budget_seconds = budget_seconds
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._outstanding: Dict[str, float] = {}
+        self._charges: Dict[str, Dict[str, Tuple[float, float]]] = defaultdict(dict)
+
+    def backlog_seconds(self) -> float:
+        with self._lock:
+            return sum(self._outstanding.values()) / self.concurrency
+
+    def _used(self, key: str, now: float) -> float:
+        charges = self._charges[key]
+        for ticket in [t for t, (ts, _) in charges.items() if now - ts > self.window_seconds]:
+            del charges[ticket]
+        return sum(seconds for _, seconds in charges.values())
+
+    def admit(
+        self,
+        ticket: str,
+        key: str,
+        estimate: float,
+        deadline: Optional[float] = None,
+        parallelism: int = 1,
+    ) -> Dict[str, float]:
+        # Work spread over several devices finishes sooner but still costs its full estimate against the budget.
+        now = time.time()
+        wall = estimate / max(1, parallelism)
+        with self._lock:
+            queue = sum(self._outstanding.values()) / self.concurrency
+            if deadline is not None and queue + wall > deadline:
+                raise AdmissionRejected(
+                    f"Estimated completion in {queue + wall:.0f}s misses the {deadline:.0f}s deadline",
+                    status_code=503,
+                    retry_after=max(1.0, queue + wall - deadline),
+                )
+            if self.budget_seconds > 0:
+                used = self._used(key, now)
+                if used + estimate > self.budget_seconds:
+                    oldest = min((ts for ts, _ in self._charges[key].values()), default=now)
+                    raise AdmissionRejected(
+                        f"Compute budget exceeded: {used:.0f}s used, {estimate:.0f}s requested, "
+                        f"{self.budget_seconds:.0f}s per {self.window_seconds}s",
+                        status_code=429,
+                        retry_after=max(1.0, oldest + self.window_seconds - now),
+                    )
+            self._charges[key][ticket] = (now, estimate)
+            self._outstanding[ticket] = wall
+        return {
+            "estimated_seconds": round(wall, 2),
+            "queue_seconds": round(queue, 2),
+            "eta_at": now + queue + wall,
+        }
+
+    def extend(self, ticket: str, key: str, estimate: float) -> bool:
+        # Grows an admitted ticket's charge as work arrives; False when the key's budget cannot cover it.
+        now = time.time()
+        with self._lock:
+            charges = self._charges[key]
+            if self.budget_seconds > 0:
+                used = self._used(key, now) - charges.get(ticket, (now, 0.0))[1]
+                if used + estimate > self.budget_seconds:
+                    return False
+            charges[ticket] = (charges.get(ticket, (now, 0.0))[0], estimate)
+        return True
+
+    def progress(self, ticket: str, remaining: float) -> None:
+        with self._lock:
+            if ticket in self._outstanding:
+                self._outstanding[ticket] = remaining
+
+    def release(self, ticket: str, key: str, actual: Optional[float] = None) -> None:
+        # None keeps the admitted estimate; a measured figure, 0.0 included, replaces it.
+        with self._lock:
+            self._outstanding.pop(ticket, None)
+            if actual is not None and ticket in self._charges[key]:
+                ts, _ = self._charges[key][ticket]
+                self._charges[key][ticket] = (ts, actual)
+
+    def usage(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            used = self._used(key, time.time())
+        return {
+            "used_seconds": round(used, 2),
+            "budget_seconds": self.budget_seconds or None,
+            "window_seconds": self.window_seconds,
+        }
+
+
+def _device_name() -> Optional[str]:
+    # Resolved on first use: naming a CUDA device creates a context, which a web process using an engine must not hold.
+    if settings.engine_address:
+        from ..core.state import image_manager
+        return getattr(image_manager, "device_name", None)
+    return DeviceManager.device_name(DeviceManager.get_device())
+
+
+settings = get_settings()
+cost_model = CostModel(os.path.join(settings.output_dir, "cost_model.json"), resolve_device=_device_name)
+admission = AdmissionController(
+    settings.max_concurrent_image, settings.compute_budget_seconds, settings.compute_budget_window_s
+)
@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+from multiprocessing.connection import Listener, Connection
+from typing import Dict, Any, Optional
+
+from ..core.config import get_settings
+from ..core.device import DeviceManager
+from ..core.ipc import parse_address, engine_authkey, restrict_socket, export_images
+from ..core.logging import setup_logging, get_logger
+from ..models.image_model import ImageModelManager
+
+
+class EngineServer:
+    _image_ops = {
+        "infer_batch": "infer_batch_same_shape",
+        "variations": "infer_variations",
+        "refine": "refine",
+    }
+
+    def __init__(self, address: str, authkey: Optional[str], hf_token: Optional[str] = None):
+        self.address = parse_address(address)
+        self.authkey = engine_authkey(authkey)
+        self.manager = ImageModelManager(hf_token=hf_token)
+        self.loop = asyncio.new_event_loop()
+        self.logger = get_logger(__name__)
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self.loop.run_forever, name="engine-loop", daemon=True).start()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+
+        with Listener(self.address, authkey=self.authkey) as listener:
+            restrict_socket(self.address)
+            self.logger.info(f"Inference engine listening on {self.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    self.logger.warning(f"Rejected engine connection: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self._dispatch(message))
+
+    def _run(self, coro) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def _dispatch(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        op = message.get("op")
+        try:
+            if op == "load":
+                self._run(self.manager.ensure_loaded())
+                return {
+                    "ok": True,
+                    "repo_id": self.manager.repo_id,
+                    "device": DeviceManager.device_name(self.manager.device),
+                }
+            if op in self._image_ops:
+                method = getattr(self.manager, self._image_ops[op])
+                outs = self._run(method(**message["kwargs"]))
+                name, specs = export_images([o.pop("image") for o in outs])
+                return {"ok": True, "shm": name, "images": specs, "results": outs}
+            return {"ok": False, "error": f"Unknown op {op!r}"}
+        except Exception as e:
+            self.logger.error(f"Engine op {op} failed: {e}")
+            return {"ok": False, "error": str(e)}
+
+
+def main() -> None:
+    settings = get_settings()
+    settings.setup_environment()
+    setup_logging()
+    if not settings.engine_address:
+        raise SystemExit("ENGINE_ADDRESS must be set to run the inference engine")
+    if not settings.engine_authkey:
+        raise SystemExit("ENGINE_AUTHKEY must be set to run the inference engine")
+    EngineServer(settings.engine_address, settings.engine_authkey, hf_token=settings.hf_token).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
-from typing import Dict, Optional, Any
+from typing import Dict, List, Optional, Any
 from enum import Enum
 import uuid
 import time
+import threading
 from ..core.logging import get_logger
 
 class JobStatus(str, Enum):
@@ -11,10 +12,14 @@ class JobStatus(str, Enum):
     ENCODING = "encoding"
     DONE = "done"
     ERROR = "error"
+    CANCELLED = "cancelled"
+
+TERMINAL_STATUSES = {JobStatus.DONE, JobStatus.ERROR, JobStatus.CANCELLED}
 
 class JobService:
     def __init__(self):
         self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._preview_lock = threading.Lock()
         self.logger = get_logger(__name__)
     
     def create_job(self, metadata: Optional[Dict[str, Any]] = None) -> str:
@@ -26,6 +31,8 @@ class JobService:
             "error": None,
             "result": None,
             "created_at": time.time(),
+            "updated_at": time.time(),
+            "cancel_requested": False,
             "metadata": metadata or {},
         }
         self.logger.info(f"Created job {job_id}")
@@ -34,19 +41,59 @@ class JobService:
     def update_job(self, job_id: str, **updates) -> None:
         if job_id in self._jobs:
             self._jobs[job_id].update(updates)
+            self._jobs[job_id]["updated_at"] = time.time()
+
+    def cancel_job(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return False
+        self.update_job(job_id, cancel_requested=True)
+        self.logger.info(f"Cancellation requested for job {job_id}")
+        return True
+
+    def is_cancelled(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        return bool(job and job.get("cancel_requested"))
     
+    def set_preview(self, job_id: str, key: str, preview: Dict[str, Any]) -> None:
+        # Called from inference threads; the dict is replaced, never mutated, so readers stay safe.
+        with self._preview_lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            previews = dict(job.get("previews") or {})
+            previews[key] = preview
+            self.update_job(job_id, previews=previews)
+
+    def clear_preview(self, job_id: str, key: str) -> None:
+        with self._preview_lock:
+            job = self._jobs.get(job_id)
+            if job is None or key not in (job.get("previews") or {}):
+                return
+            previews = dict(job["previews"])
+            previews.pop(key, None)
+            self.update_job(job_id, previews=previews)
+
+    def delete_job(self, job_id: str) -> bool:
+        return self._jobs.pop(job_id, None) is not None
+
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         return self._jobs.get(job_id)
     
-    def cleanup_old_jobs(self, max_age_seconds: int = 3600) -> None:
+    def active_job_ids(self) -> List[str]:
+        return [job_id for job_id, job in self._jobs.items() if job["status"] not in TERMINAL_STATUSES]
+
+    def cleanup_old_jobs(self, max_age_seconds: int = 3600) -> List[str]:
+        # Long jobs can outlive the age limit, so only finished jobs idle for that long are dropped.
         current_time = time.time()
         to_remove = [
             job_id for job_id, job in self._jobs.items()
-            if current_time - job["created_at"] > max_age_seconds
+            if job["status"] in TERMINAL_STATUSES and current_time - job["updated_at"] > max_age_seconds
         ]
         for job_id in to_remove:
             del self._jobs[job_id]
         if to_remove:
             self.logger.info(f"Cleaned up {len(to_remove)} old jobs")
+        return to_remove
 
 job_service = JobService()
\ No newline at end of file
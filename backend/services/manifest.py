@@ -0,0 +1,70 @@
+import asyncio
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..models.schemas import ImageGenerationRequest
+
+MAX_LINE_BYTES = 64 * 1024
+
+Pair = Tuple[int, ImageGenerationRequest]
+
+
+async def iter_manifest(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    # Yields (line number, raw line) as soon as each newline arrives; only a partial line is buffered.
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+        if len(buffer) > MAX_LINE_BYTES:
+            raise ValueError(f"Line {line_no + 1} exceeds {MAX_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+class ManifestFeed:
+    # Shape groups filled by the upload while the generation task drains them micro-batch by micro-batch.
+    def __init__(self, linger_seconds: float):
+        self.linger_seconds = linger_seconds
+        self.received = 0
+        self.queued_seconds = 0.0
+        self.closed = False
+        self._groups: Dict[tuple, List[Pair]] = defaultdict(list)
+        self._wake = asyncio.Event()
+
+    def add(self, key: tuple, pair: Pair, estimate: float) -> None:
+        self._groups[key].append(pair)
+        self.received += 1
+        self.queued_seconds += estimate
+        self._wake.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake.set()
+
+    def _take(self, key: tuple, size: int) -> Tuple[tuple, List[Pair]]:
+        pairs = self._groups[key]
+        batch, rest = pairs[:size], pairs[size:]
+        if rest:
+            self._groups[key] = rest
+        else:
+            del self._groups[key]
+        return key, batch
+
+    async def next_batch(self, size: int) -> Optional[Tuple[tuple, List[Pair]]]:
+        while True:
+            for key, pairs in self._groups.items():
+                if len(pairs) >= size:
+                    return self._take(key, size)
+            if self.closed:
+                return self._take(next(iter(self._groups)), size) if self._groups else None
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.linger_seconds)
+            except asyncio.TimeoutError:
+                # A slow upload should not leave the device idle behind a half-full micro-batch.
+                if self._groups:
+                    return self._take(max(self._groups, key=lambda k: len(self._groups[k])), size)
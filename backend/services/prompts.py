@@ -0,0 +1,23 @@
+from ..models.schemas import ArtStyle
+
+STYLE_PROMPTS = {
+    ArtStyle.CINEMATIC: "cinematic lighting, movie still, dramatic atmosphere",
+    ArtStyle.PHOTOGRAPHIC: "professional photography, ultra realistic, 8k",
+    ArtStyle.ANIME: "anime art style, studio quality, vibrant colors",
+    ArtStyle.FANTASY: "fantasy art, magical atmosphere, ethereal lighting",
+    ArtStyle.DIGITAL: "digital painting, concept art, highly detailed",
+    ArtStyle.MODEL_3D: "3d render, octane render, volumetric lighting",
+    ArtStyle.NEON_PUNK: "cyberpunk, neon lights, futuristic",
+    ArtStyle.OIL_PAINTING: "oil painting, traditional art, textured brushstrokes",
+    ArtStyle.WATERCOLOR: "watercolor painting, soft edges, flowing colors",
+    ArtStyle.FREESTYLE: "",
+}
+
+DEFAULT_NEGATIVE = "low quality, blurry, distorted, watermark, text, error"
+
+
+def enhance_prompt(prompt: str, style: ArtStyle) -> str:
+    style_prompt = STYLE_PROMPTS.get(style, "")
+    if style_prompt:
+        return f"{prompt}, {style_prompt}, masterpiece, best quality"
+    return prompt
@@ -0,0 +1,30 @@
+import asyncio
+from typing import List
+
+from ..core.config import get_settings
+from ..core.logging import get_logger
+from .blob_store import job_result_store, draft_store
+from .job_service import job_service
+
+logger = get_logger(__name__)
+
+
+def _purge(removed: List[str], active: List[str]) -> None:
+    settings = get_settings()
+    for job_id in removed:
+        job_result_store.delete(job_id)
+    job_result_store.expire(settings.job_ttl_seconds, keep=active)
+    draft_store.expire(settings.draft_ttl_seconds)
+
+
+async def run_cleanup() -> None:
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            # The job table is only touched on the loop; file deletion runs in a worker thread.
+            removed = job_service.cleanup_old_jobs(settings.job_ttl_seconds)
+            await loop.run_in_executor(None, _purge, removed, job_service.active_job_ids())
+        except Exception as e:
+            logger.error(f"Result cleanup failed: {e}")
+        await asyncio.sleep(settings.cleanup_interval_seconds)
@@ -1,11 +1,11 @@
 import os
-import tempfile
 import subprocess
 import asyncio
 from typing import List
 from PIL import Image
 import io
 from ..core.logging import get_logger
+from ..core import profiling
 
 
 class VideoProcessor:
@@ -38,23 +38,29 @@ class VideoProcessor:
                 os.remove(temp_path)
     
     async def _encode_frames(self, frames: List[Image.Image], fps: int, output: str):
-        work_dir = tempfile.mkdtemp(prefix="frames_", dir=self.temp_dir)
-        try:
-            for i, frame in enumerate(frames):
-                frame.save(os.path.join(work_dir, f"frame_{i:06d}.png"))
-            
-            pattern = os.path.join(work_dir, "frame_%06d.png")
-            await self._run_ffmpeg([
-                "ffmpeg", "-y", "-v", "error",
-                "-framerate", str(fps), "-i", pattern,
-                "-c:v", "libx264", "-pix_fmt", "yuv420p",
-                "-crf", "18", "-movflags", "+faststart",
-                output
-            ])
-        finally:
-            for file in os.listdir(work_dir):
-                os.remove(os.path.join(work_dir, file))
-            os.rmdir(work_dir)
+        # Raw RGB frames are piped straight into the encoder; nothing is written to disk first.
+        width, height = frames[0].size
+        cmd = [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}",
+            "-framerate", str(fps), "-i", "-",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p",
+            "-crf", "18", "-movflags", "+faststart",
+            output
+        ]
+        with profiling.span("encode_frames"):
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdin=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                for frame in frames:
+                    proc.stdin.write(frame.convert("RGB").tobytes())
+                    await proc.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            _, stderr = await proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"FFmpeg failed: {stderr.decode('utf-8', errors='replace')}")
     
     async def _loop_video(self, input_path: str, output_path: str, duration_minutes: float):
         duration_seconds = int(duration_minutes * 60)
@@ -67,9 +73,10 @@ class VideoProcessor:
     
     async def _run_ffmpeg(self, cmd: List[str]):
         loop = asyncio.get_running_loop()
-        proc = await loop.run_in_executor(
-            None,
-            lambda: subprocess.run(cmd, capture_output=True, text=True)
-        )
+        with profiling.span("ffmpeg"):
+            proc = await loop.run_in_executor(
+                None,
+                lambda: subprocess.run(cmd, capture_output=True, text=True)
+            )
         if proc.returncode != 0:
             raise RuntimeError(f"FFmpeg failed: {proc.stderr}")
\ No newline at end of file
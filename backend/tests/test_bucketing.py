@@ -0,0 +1,21 @@
+from backend.services.bucketing import bucket_for, fit_to_size
+from PIL import Image
+
+
+def test_near_identical_sizes_share_a_handful_of_buckets():
+    sizes = [(w, h) for w in range(960, 1089, 8) for h in range(960, 1089, 8)]
+    assert len({bucket_for(w, h) for w, h in sizes}) <= 6
+
+
+def test_bucket_snaps_to_nearest_not_covering():
+    assert bucket_for(1032, 1024) == (1024, 1024)
+    assert bucket_for(1000, 600) == (1024, 576)
+
+
+def test_far_sizes_run_as_requested():
+    assert bucket_for(2048, 256) == (2048, 256)
+    assert bucket_for(200, 200) == (200, 200)
+
+
+def test_fit_to_size_restores_requested_size():
+    assert fit_to_size(Image.new("RGB", (1024, 1024)), 1032, 1000).size == (1032, 1000)
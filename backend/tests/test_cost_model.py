@@ -0,0 +1,17 @@
+from backend.services.cost_model import CostModel, MIN_OBSERVATIONS
+
+
+def test_fit_follows_measured_timings(tmp_path):
+    model = CostModel(str(tmp_path / "cost_model.json"), "cuda")
+    for steps in range(10, 10 + 4 * MIN_OBSERVATIONS, 4):
+        model.observe(1024, 1024, steps, 4.5, 2, 0.5 + 0.1 * steps)
+    assert model.stats()["fitted"]
+    assert model.predict_micro_batch(1024, 1024, 30, 4.5, 2) > model.predict_micro_batch(1024, 1024, 10, 4.5, 2)
+
+
+def test_degenerate_fit_falls_back_to_defaults(tmp_path):
+    model = CostModel(str(tmp_path / "cost_model.json"), "cuda")
+    for steps in range(1, MIN_OBSERVATIONS + 1):
+        model.observe(256, 256, steps, 1.0, 1, 0.0)
+    assert not model.stats()["fitted"]
+    assert model.predict_micro_batch(1024, 1024, 28, 4.5, 4) > 0
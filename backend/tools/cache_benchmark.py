@@ -0,0 +1,116 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Tuple
+import torch
+from diffusers import FlowMatchEulerDiscreteScheduler, SD3Transformer2DModel
+
+from ..models import sd3_ops
+from ..models.feature_cache import feature_cache
+
+# Small enough to run on a laptop CPU while keeping SD3's block structure.
+TINY_CONFIG = {
+    "sample_size": 32,
+    "patch_size": 2,
+    "in_channels": 16,
+    "num_layers": 12,
+    "attention_head_dim": 16,
+    "num_attention_heads": 4,
+    "joint_attention_dim": 64,
+    "caption_projection_dim": 64,
+    "pooled_projection_dim": 32,
+    "out_channels": 16,
+    "pos_embed_max_size": 64,
+}
+TEXT_TOKENS = 77
+
+
+def _load(args: argparse.Namespace) -> SD3Transformer2DModel:
+    if args.repo:
+        dtype = torch.float16 if args.device == "cuda" else torch.float32
+        model = SD3Transformer2DModel.from_pretrained(args.repo, subfolder="transformer", torch_dtype=dtype)
+    else:
+        torch.manual_seed(args.seed)
+        model = SD3Transformer2DModel(**TINY_CONFIG)
+    return model.to(args.device).eval()
+
+
+def _inputs(model: SD3Transformer2DModel, args: argparse.Namespace) -> Tuple[torch.Tensor, List[torch.Tensor]]:
+    config = model.config
+    dtype = next(model.parameters()).dtype
+    g = torch.Generator(device="cpu").manual_seed(args.seed)
+    size = args.size // 8
+    latents = torch.randn(args.batch, config.in_channels, size, size, generator=g)
+    embeds = [
+        torch.randn(args.batch, TEXT_TOKENS, config.joint_attention_dim, generator=g),
+        torch.randn(args.batch, config.pooled_projection_dim, generator=g),
+        torch.randn(args.batch, TEXT_TOKENS, config.joint_attention_dim, generator=g),
+        torch.randn(args.batch, config.pooled_projection_dim, generator=g),
+    ]
+    return latents.to(args.device, dtype), [e.to(args.device, dtype) for e in embeds]
+
+
+def _run(model, latents, embeds, args, interval: int, depth: float) -> Tuple[torch.Tensor, float, Any]:
+    scheduler = FlowMatchEulerDiscreteScheduler(shift=3.0)
+    scheduler.set_timesteps(args.steps, device=args.device)
+    if args.device == "cuda":
+        torch.cuda.synchronize()
+    started = time.perf_counter()
+    with torch.inference_mode(), feature_cache(model, interval, depth) as cache:
+        out, _ = sd3_ops.denoise(model, scheduler, latents, *embeds, args.guidance)
+    if args.device == "cuda":
+        torch.cuda.synchronize()
+    return out.float(), time.perf_counter() - started, cache.stats() if cache is not None else None
+
+
+def _drift(out: torch.Tensor, ref: torch.Tensor) -> Dict[str, float]:
+    mse = torch.mean((out - ref) ** 2).item()
+    peak = (ref.max() - ref.min()).item()
+    return {
+        "rel_l2": round((torch.linalg.vector_norm(out - ref) / torch.linalg.vector_norm(ref)).item(), 5),
+        "psnr_db": round(10 * torch.log10(torch.tensor(peak ** 2 / mse)).item(), 2) if mse > 0 else float("inf"),
+        "cosine": round(torch.nn.functional.cosine_similarity(out.flatten(), ref.flatten(), dim=0).item(), 5),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure feature-cache speedup and drift against full compute.")
+    parser.add_argument("--repo", help="Load a real SD3 transformer instead of the tiny random one")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--steps", type=int, default=44)
+    parser.add_argument("--size", type=int, default=256, help="Image side in pixels; latents are size / 8")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--guidance", type=float, default=7.0)
+    parser.add_argument("--intervals", default="2,3,4")
+    parser.add_argument("--depths", default="0.25,0.5,0.75")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = _load(args)
+    latents, embeds = _inputs(model, args)
+
+    def _best(interval: int, depth: float) -> Tuple[torch.Tensor, float, Any]:
+        runs = [_run(model, latents, embeds, args, interval, depth) for _ in range(args.repeats)]
+        return min(runs, key=lambda r: r[1])
+
+    _run(model, latents, embeds, args, 1, 0.5)  # warm-up: allocator, kernels, thread pools
+    ref, base_s, _ = _best(1, 0.5)
+    rows = [{"interval": 1, "depth": None, "seconds": round(base_s, 4), "speedup": 1.0}]
+    for interval in (int(x) for x in args.intervals.split(",")):
+        for depth in (float(x) for x in args.depths.split(",")):
+            out, seconds, stats = _best(interval, depth)
+            rows.append({
+                "interval": interval,
+                "depth": depth,
+                "seconds": round(seconds, 4),
+                "speedup": round(base_s / seconds, 3),
+                **_drift(out, ref),
+                "cache": stats,
+            })
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+# Traffic defaults to the in-process app on the stub backend; must be set before backend modules load.
+os.environ.setdefault("MODEL_BACKEND", "stub")
+os.environ.setdefault("AUTO_WARMUP", "false")
+os.environ.setdefault("OUTPUT_DIR", tempfile.mkdtemp(prefix="emberglow-loadtest-"))
+
+import httpx
+
+SIZES = ((1024, 1024), (1024, 768), (768, 1024), (1216, 832), (832, 1216), (512, 512))
+PROMPTS = (
+    "a lighthouse on a cliff at dusk",
+    "portrait of an old fisherman, dramatic light",
+    "a neon-lit alley in the rain",
+    "isometric cozy library interior",
+    "macro photo of a dew-covered leaf",
+)
+TERMINAL = {"done", "error", "cancelled"}
+
+Scenario = Callable[[httpx.AsyncClient, random.Random, argparse.Namespace, Dict[str, List[float]]], Awaitable[int]]
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # ru_maxrss is a high-water mark in KiB on Linux, so growth is only approximate here.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentiles(values: List[float]) -> Dict[str, Any]:
+    if not values:
+        return {"count": 0}
+    arr = np.asarray(values) * 1000
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(arr, 50)), 1),
+        "p90_ms": round(float(np.percentile(arr, 90)), 1),
+        "p99_ms": round(float(np.percentile(arr, 99)), 1),
+        "max_ms": round(float(arr.max()), 1),
+    }
+
+
+def _item(rng: random.Random, args: argparse.Namespace) -> Dict[str, Any]:
+    width, height = rng.choice(SIZES) if args.mixed_sizes else (args.width, args.height)
+    return {
+        "prompt": rng.choice(PROMPTS),
+        "num_inference_steps": args.steps,
+        "width": width,
+        "height": height,
+        "seed": rng.randrange(2 ** 31),
+    }
+
+
+async def _generate(client, rng, args, extra) -> int:
+    resp = await client.post("/api/image/generate", json=_item(rng, args), headers={"Accept": "application/json"})
+    return resp.status_code
+
+
+async def _generate_png(client, rng, args, extra) -> int:
+    resp = await client.post("/api/image/generate", json=_item(rng, args), headers={"Accept": "image/png"})
+    return resp.status_code
+
+
+async def _batch(client, rng, args, extra) -> int:
+    body = {
+        "items": [_item(rng, args) for _ in range(args.batch_size)],
+        "micro_batch_size": args.micro_batch_size,
+        "bucketing": args.mixed_sizes,
+    }
+    resp = await client.post("/api/image/generate-batch", json=body, headers={"Accept": "application/json"})
+    return resp.status_code
+
+
+async def _job(client, rng, args, extra) -> int:
+    body = {
+        "items": [_item(rng, args) for _ in range(args.batch_size)],
+        "micro_batch_size": args.micro_batch_size,
+    }
+    submitted = time.perf_counter()
+    resp = await client.post("/api/image/generate-batch-async", json=body)
+    if resp.status_code != 200:
+        return resp.status_code
+    job_id = resp.json()["job_id"]
+
+    started = None
+    while True:
+        await asyncio.sleep(args.poll_interval)
+        job = (await client.get(f"/api/image/job/{job_id}")).json()
+        if started is None and job["status"] not in ("queued", "loading"):
+            started = time.perf_counter()
+            extra["job_queue_delay"].append(started - submitted)
+        if job["status"] in TERMINAL:
+            break
+    if job["status"] != "done":
+        return 500
+    page = await client.get(f"/api/image/job/{job_id}/results", params={"limit": 1000})
+    return page.status_code
+
+
+async def _status(client, rng, args, extra) -> int:
+    resp = await client.get("/api/image/status")
+    return resp.status_code
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "generate": _generate,
+    "generate_png": _generate_png,
+    "batch": _batch,
+    "job": _job,
+    "status": _status,
+}
+
+
+def _parse_mix(spec: str) -> Tuple[List[str], List[float]]:
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition(":")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+        names.append(name)
+        weights.append(float(weight or 1))
+    return names, weights
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, time.perf_counter() - expected))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class MemorySampler:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples: List[Tuple[float, int]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        origin = time.perf_counter()
+        while True:
+            self.samples.append((time.perf_counter() - origin, _rss_bytes()))
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self.samples.append((self.samples[-1][0] if self.samples else 0.0, _rss_bytes()))
+
+    def summary(self) -> Dict[str, Any]:
+        rss = [b / 1024 ** 2 for _, b in self.samples]
+        times = [t for t, _ in self.samples]
+        # Slope over the second half ignores warm-up allocations (caches, thread pools, first encodes).
+        half = len(rss) // 2
+        slope = float(np.polyfit(times[half:], rss[half:], 1)[0]) if len(rss) - half >= 3 else None
+        return {
+            "start_mb": round(rss[0], 1),
+            "end_mb": round(rss[-1], 1),
+            "peak_mb": round(max(rss), 1),
+            "growth_mb": round(rss[-1] - rss[0], 1),
+            "steady_growth_mb_per_min": round(slope * 60, 2) if slope is not None else None,
+        }
+
+
+async def _run_load(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict[str, Any]:
+    names, weights = _parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    extra: Dict[str, List[float]] = defaultdict(list)
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+
+    async def _one(name: str, scheduled: Optional[float]) -> None:
+        async with in_flight:
+            sent = time.perf_counter()
+            if scheduled is not None:
+                extra["dispatch_delay"].append(sent - scheduled)
+            try:
+                code = await SCENARIOS[name](client, rng, args, extra)
+            except Exception:
+                code = -1
+            latencies[name].append(time.perf_counter() - sent)
+            statuses[name][code] += 1
+
+    deadline = time.perf_counter() + args.duration
+    if args.rate > 0:
+        # Open loop: Poisson arrivals keep coming whether or not the server keeps up.
+        tasks = []
+        next_at = time.perf_counter()
+        while next_at < deadline:
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            tasks.append(asyncio.create_task(_one(rng.choices(names, weights)[0], next_at)))
+            next_at += rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+    else:
+        async def _worker() -> None:
+            while time.perf_counter() < deadline:
+                await _one(rng.choices(names, weights)[0], None)
+        await asyncio.gather(*(_worker() for _ in range(args.concurrency)))
+
+    return {
+        "requests": {
+            name: {**_percentiles(latencies[name]), "status": dict(statuses[name])}
+            for name in names
+        },
+        "dispatch_delay": _percentiles(extra["dispatch_delay"]),
+        "job_queue_delay": _percentiles(extra["job_queue_delay"]),
+    }
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    headers = {"Authorization": f"Bearer {args.api_key}"} if args.api_key else {}
+    timeout = httpx.Timeout(args.timeout)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, headers=headers, timeout=timeout)
+        image_manager = None
+    else:
+        from ..core.state import image_manager
+        from ..main import app
+        # ASGITransport skips the lifespan, so load the model up front instead of timing it.
+        await image_manager.ensure_loaded()
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://loadtest", headers=headers, timeout=timeout
+        )
+
+    lag = LoopLagMonitor(args.lag_interval)
+    memory = MemorySampler(1.0)
+    lag.start()
+    memory.start()
+    started = time.perf_counter()
+    async with client:
+        report = await _run_load(client, args)
+    elapsed = time.perf_counter() - started
+    await lag.stop()
+    await memory.stop()
+
+    total = sum(r["count"] for r in report["requests"].values())
+    report.update({
+        "target": args.url or "in-process",
+        "backend": os.environ.get("MODEL_BACKEND"),
+        "elapsed_s": round(elapsed, 1),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "event_loop_lag": _percentiles(lag.lags),
+        "memory": memory.summary(),
+    })
+    stats = getattr(image_manager, "stats", None)
+    if stats is not None:
+        # Time each micro-batch waited for the device semaphore inside the server.
+        report["model"] = stats()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a traffic mix against the image API and report latencies.")
+    parser.add_argument("--url", help="Target a running server instead of the in-process app")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY"))
+    parser.add_argument("--mix", default="generate:5,batch:2,job:2,status:1",
+                        help=f"Weighted scenarios from {', '.join(SCENARIOS)}")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to keep issuing requests")
+    parser.add_argument("--rate", type=float, default=0.0, help="Open-loop arrivals per second; 0 for closed loop")
+    parser.add_argument("--concurrency", type=int, default=4, help="Closed-loop client count")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--micro-batch-size", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--mixed-sizes", action="store_true", help="Draw sizes from common aspect ratios")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this path")
+    args = parser.parse_args()
+
+    report = asyncio.run(_main(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+import httpx
+
+PROMPTS = (
+    "a lighthouse on a cliff at dusk",
+    "portrait of an old fisherman, dramatic light",
+    "a neon-lit alley in the rain",
+    "isometric cozy library interior",
+)
+
+
+def _spawn(port: int, env: Dict[str, str], log_dir: str, name: str) -> subprocess.Popen:
+    log = open(os.path.join(log_dir, f"{name}.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env={**os.environ, **env},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+
+
+def _wait_ready(url: str, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/api/ready", timeout=2.0).json().get("ready"):
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def _bench(url: str, args: argparse.Namespace, headers: Dict[str, str]) -> Dict[str, Any]:
+    body = {
+        "items": [
+            {"prompt": PROMPTS[i % len(PROMPTS)], "num_inference_steps": args.steps,
+             "width": args.width, "height": args.height}
+            for i in range(args.bench_items)
+        ],
+        "start_seed": 0,
+        "micro_batch_size": args.micro_batch_size,
+    }
+    with httpx.Client(base_url=url, headers=headers, timeout=60.0) as client:
+        started = time.perf_counter()
+        job_id = client.post("/api/image/generate-batch-async", json=body).raise_for_status().json()["job_id"]
+        while True:
+            time.sleep(0.5)
+            job = client.get(f"/api/image/job/{job_id}").json()
+            if job["status"] in ("done", "error", "cancelled"):
+                break
+        elapsed = time.perf_counter() - started
+        return {
+            "status": job["status"],
+            "error": job.get("error"),
+            "items": args.bench_items,
+            "elapsed_s": round(elapsed, 2),
+            "images_per_s": round(args.bench_items / elapsed, 2),
+            "cluster": (job.get("result") or {}).get("cluster"),
+            "nodes": client.get("/api/cluster/nodes").json()["nodes"],
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a coordinator and N worker instances on this machine.")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8000, help="Coordinator port; workers take the ports after it")
+    parser.add_argument("--backend", default="stub", help="MODEL_BACKEND for the workers")
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY"))
+    parser.add_argument("--ready-timeout", type=float, default=120.0)
+    parser.add_argument("--bench-items", type=int, default=0, help="Submit one batch of this size, report and exit")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--micro-batch-size", type=int, default=4)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="emberglow-cluster-")
+    coordinator_url = f"http://127.0.0.1:{args.port}"
+    # Node registration always needs a key, so a throwaway one is minted when none is given.
+    api_key = args.api_key or secrets.token_urlsafe(24)
+    common = {"API_KEY": api_key, "CLUSTER_POLL_INTERVAL": "0.25"}
+    procs: List[subprocess.Popen] = []
+    headers = {"Authorization": f"Bearer {api_key}"}
+    try:
+        procs.append(_spawn(args.port, {
+            **common,
+            "MODEL_BACKEND": "stub",
+            "AUTO_WARMUP": "true",
+            "OUTPUT_DIR": os.path.join(root, "coordinator"),
+        }, root, "coordinator"))
+        _wait_ready(coordinator_url, args.ready_timeout)
+
+        worker_urls = []
+        for i in range(args.workers):
+            port = args.port + 1 + i
+            url = f"http://127.0.0.1:{port}"
+            worker_urls.append(url)
+            # Workers announce themselves, the same way remote machines join a coordinator.
+            procs.append(_spawn(port, {
+                **common,
+                "MODEL_BACKEND": args.backend,
+                "AUTO_WARMUP": "true",
+                "OUTPUT_DIR": os.path.join(root, f"worker{i}"),
+                "COORDINATOR_URL": coordinator_url,
+                "NODE_URL": url,
+            }, root, f"worker{i}"))
+        for url in worker_urls:
+            _wait_ready(url, args.ready_timeout)
+        while len(httpx.get(f"{coordinator_url}/api/cluster/nodes", headers=headers).json()["nodes"]) < args.workers:
+            time.sleep(0.5)
+        print(f"Coordinator {coordinator_url} with {args.workers} workers; logs in {root}", flush=True)
+
+        if args.bench_items:
+            print(json.dumps(_bench(coordinator_url, args, headers), indent=2))
+            return
+        while all(p.poll() is None for p in procs):
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+if __name__ == "__main__":
+    main()